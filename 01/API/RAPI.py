@@ -2,7 +2,7 @@
 import urllib
 from http import HTTPStatus
 from multiprocessing.pool import ThreadPool
-from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 from urllib.parse import parse_qs
 
 # third party
@@ -16,7 +16,8 @@ from Middleware.DCModel import (Account, ChannelLink, Customer, Location,
 from Model.enums import POS, RequestType
 from Model.integration import IntegrationInfo, POSHealthCheckResult
 from Model.operationReport import OperationReportStatus
-from Model.product import ProductSyncInfo, ProductSyncSettings
+from Model.product import (Product, ProductCategory, ProductSyncInfo,
+                           ProductSyncSettings)
 from Model.settings import (AppStoreActionSettingsResponse, GenericSetting,
                             ValidateSettingsResponse)
 from POSSystems.BasePOS.BasePOSAPI import BasePOSAPI
@@ -35,6 +36,7 @@ from POSSystems.R.RModel import (RAPICustomPaymentType, RAPIObject, RAPIUser,
                                  RProductTaxGroup, RServiceFee, RTable, RUser,
                                  RWebOrder)
 from POSSystems.R.RParser import RParser
+from POSSystems.R.RSyncStore import RStoredResources, RSyncStore
 from POSSystems.R.setup import (VALIDATE_REQUIRED_SETTINGS_MAPPING, RSettings,
                                 getCallNameTemplateSetting,
                                 getConnectionSettings, getCountrySetting,
@@ -117,6 +119,9 @@ class RAPI(BasePOSAPI):
         self.serviceChargeAlias: str = self.settings.serviceChargeAlias
         self.customMenuUri: str = self.settings.customMenuUri
         self.useSlowSync: bool = self.settings.useSlowSync
+        # keep fetched products and modifiers in a local store instead of memory,
+        # off for settings saved before the option existed
+        self.useDiskSync: bool = getattr(self.settings, "useDiskSync", False)
         # need to get id from resourceUri (eg. /resources/Establishment/1/) to filter by establishmentId
         self.establishmentId = None
         if self.establishment:
@@ -273,62 +278,77 @@ class RAPI(BasePOSAPI):
             operationReport.properties = reportProperties
             products = productCategories = []
             callback = True
+        elif self.useDiskSync:
+            with RSyncStore() as store:
+                products, productCategories = self._syncProducts(store)
         else:
-            if self.customMenuUri:
-                self.logger.info(
-                    f"Start Product sync for Custom Menu: {self.customMenuUri}"
-                )
-                products = self._getPOSProductsWithCategoryCustomMenu()
-            else:
-                self.logger.info(f"Start Product sync for {self.channelLink}")
-                products = self._getPOSProductsWithCategory()
-            self.logger.info(f"Got {len(products)} R products")
+            products, productCategories = self._syncProducts()
 
-            # TODO: speedup this step.
-            productModifiers = self._getPOSProductModifiers()
-            self.logger.info(f"Got {len(productModifiers)} R product modifiers")
+        return ProductSyncInfo(
+            categories=productCategories,
+            products=products,
+            syncOverloads=self.settings.useOverloads,
+            callback=callback,
+        )
+
+    def _syncProducts(
+        self, store: Optional[RSyncStore] = None
+    ) -> Tuple[List[Product], List[ProductCategory]]:
+        """
+        Fetch all resources needed for the product sync and parse them
+        :param store: when passed, products, product modifiers and modifiers are written to the store
+        as they arrive and the parser reads them back from it, the product modifiers by lookups
+        of the stored product uris
+        :return: a tuple with a list of Products and a list of productCategories
+        """
+        if self.customMenuUri:
+            self.logger.info(
+                f"Start Product sync for Custom Menu: {self.customMenuUri}"
+            )
+            products = self._getPOSProductsWithCategoryCustomMenu(store)
+        else:
+            self.logger.info(f"Start Product sync for {self.channelLink}")
+            products = self._getPOSProductsWithCategory(store)
+        self.logger.info(f"Got {len(products)} R products")
 
-            productTaxGroups = self._getPOSProductTaxGroups()
-            self.logger.info(f"Got {len(productTaxGroups)} R tax groups")
+        # TODO: speedup this step.
+        productModifiers = self._getPOSProductModifiers(store)
+        self.logger.info(f"Got {len(productModifiers)} R product modifiers")
 
-            # getting prevailing tax
-            prevailingTax = self._getPOSPrevailingTax()
-            self.logger.info(f"Got prevailing tax")
+        productTaxGroups = self._getPOSProductTaxGroups()
+        self.logger.info(f"Got {len(productTaxGroups)} R tax groups")
 
-            modifierGroups = self._getPOSModifierGroups()
-            self.logger.info(f"Got {len(modifierGroups)} R modifier groups")
+        # getting prevailing tax
+        prevailingTax = self._getPOSPrevailingTax()
+        self.logger.info(f"Got prevailing tax")
 
-            modifiers = self._getPOSModifiers()
-            self.logger.info(f"Got {len(modifiers)} R modifiers")
+        modifierGroups = self._getPOSModifierGroups()
+        self.logger.info(f"Got {len(modifierGroups)} R modifier groups")
 
-            dynamicCombos = self._getPOSDynamicComboItems()
-            self.logger.info(f"Got {len(dynamicCombos)} R DynamicCombos")
+        modifiers = self._getPOSModifiers(store)
+        self.logger.info(f"Got {len(modifiers)} R modifiers")
 
-            productAttributes = self._getProductAttrs()
-            self.logger.info(f"Got {len(productAttributes)} R Product Attributes")
+        dynamicCombos = self._getPOSDynamicComboItems(products)
+        self.logger.info(f"Got {len(dynamicCombos)} R DynamicCombos")
 
-            productAttributeValues = self._getProductAttrValues()
-            self.logger.info(
-                f"Got {len(productAttributeValues)} R Product Attribute Values"
-            )
+        productAttributes = self._getProductAttrs()
+        self.logger.info(f"Got {len(productAttributes)} R Product Attributes")
 
-            products, productCategories = self.parser.parseProducts(
-                products,
-                productModifiers,
-                productTaxGroups,
-                prevailingTax,
-                modifierGroups,
-                modifiers,
-                dynamicCombos,
-                productAttributes,
-                productAttributeValues,
-            )
+        productAttributeValues = self._getProductAttrValues()
+        self.logger.info(
+            f"Got {len(productAttributeValues)} R Product Attribute Values"
+        )
 
-        return ProductSyncInfo(
-            categories=productCategories,
-            products=products,
-            syncOverloads=self.settings.useOverloads,
-            callback=callback,
+        return self.parser.parseProducts(
+            products,
+            productModifiers,
+            productTaxGroups,
+            prevailingTax,
+            modifierGroups,
+            modifiers,
+            dynamicCombos,
+            productAttributes,
+            productAttributeValues,
         )
 
     def _getPOSCustomMenu(self) -> RCustomMenu:
@@ -372,13 +392,16 @@ class RAPI(BasePOSAPI):
         rCustomMenuProduct = RProduct.importDict(rawCustomMenuProduct)
         return rCustomMenuProduct
 
-    def _getPOSProductsWithCategoryCustomMenu(self) -> List[RProduct]:
+    def _getPOSProductsWithCategoryCustomMenu(
+        self, store: Optional[RSyncStore] = None
+    ) -> Union[List[RProduct], RStoredResources]:
         """
         R allows compose custom menu with a set of products
         We use custom menu uri to retrieve product groups with the list of uri of the products included
         Call for every product with expand on category info
         Since no info on modifier groups or modifiers provided,
         we still need to retrieve all of them in basic sync products flow
+        :param store: store to write the products to instead of loading them in memory
         :return
         """
         rCustomMenu: RCustomMenu = self._getPOSCustomMenu()
@@ -404,7 +427,17 @@ class RAPI(BasePOSAPI):
                 "establishment": self.establishmentId,
                 "id__in": ",".join(chunk),
             }
-            rawRProducts.extend(self._getAllPOSResults(route, params))
+            if store:
+                self._storeAllPOSResults(route, params, store, kind="product")
+            else:
+                rawRProducts.extend(self._getAllPOSResults(route, params))
+
+        if store:
+            if not store.count("product"):
+                raise InvalidPOSAPIResult(
+                    message=f"No products found for {rProductGroup.name}"
+                )
+            return store.view("product", RProduct)
 
         # load them in the model
         rCustomMenuProducts: List = [
@@ -417,11 +450,14 @@ class RAPI(BasePOSAPI):
             )
         return rCustomMenuProducts
 
-    def _getPOSProductsWithCategory(self) -> List[RProduct]:
+    def _getPOSProductsWithCategory(
+        self, store: Optional[RSyncStore] = None
+    ) -> Union[List[RProduct], RStoredResources]:
         """
         Get a list of all products with categories.
         By default, R doesn't provide information about the product category,
         but with the help of the query parameter we expand the response.
+        :param store: store to write the products to instead of loading them in memory
         :return: the list of all products with categories
         """
         route: str = RApiMethods.PRODUCT
@@ -432,15 +468,22 @@ class RAPI(BasePOSAPI):
             "establishment": self.establishmentId,
         }
 
+        if store:
+            self._storeAllPOSResults(route, params, store, kind="product")
+            return store.view("product", RProduct)
+
         # get all product objects from R
         totalRProductResults = self._getAllPOSResults(route, params)
 
         rProducts = [RProduct.importDict(product) for product in totalRProductResults]
         return rProducts
 
-    def _getPOSModifiers(self) -> List[RProductModifier]:
+    def _getPOSModifiers(
+        self, store: Optional[RSyncStore] = None
+    ) -> Union[List[RProductModifier], RStoredResources]:
         """
         Get a list of all R modifiers. The query is needed to create standard modifier groups.
+        :param store: store to write the modifiers to instead of loading them in memory
         :return: the list of all R modifiers
         """
         route: str = RApiMethods.MODIFIER
@@ -451,6 +494,10 @@ class RAPI(BasePOSAPI):
             "establishment": self.establishmentId,
         }
 
+        if store:
+            self._storeAllPOSResults(route, params, store, kind="modifier")
+            return store.view("modifier", RProductModifier)
+
         # get all modifier objects from R
         totalRModifierResults = self._getAllPOSResults(route, params)
 
@@ -461,10 +508,14 @@ class RAPI(BasePOSAPI):
 
         return rModifiers
 
-    def _getPOSProductModifiers(self) -> List[RProductModifierInfo]:
+    def _getPOSProductModifiers(
+        self, store: Optional[RSyncStore] = None
+    ) -> Union[List[RProductModifierInfo], RStoredResources]:
         """
         Get a list of R product modifiers.
         The query is needed to obtain a product link with a modifier.
+        :param store: store to write the product modifiers to instead of loading them in memory,
+        they are stored under their product uri and only the ones of the stored products are read back
         :return: the list of R product modifiers
         """
         route: str = RApiMethods.PRODUCT_MODIFIER
@@ -476,6 +527,12 @@ class RAPI(BasePOSAPI):
             "modifier__establishment": self.establishmentId,
         }
 
+        if store:
+            self._storeAllPOSResults(
+                route, params, store, kind="productModifier", keyField="product"
+            )
+            return store.view("productModifier", RProductModifierInfo, keysOf="product")
+
         # get all modifier objects from R
         totalRModifierResults = self._getAllPOSResults(route, params)
 
@@ -505,21 +562,34 @@ class RAPI(BasePOSAPI):
 
         return rModifierGroups
 
-    def _getPOSDynamicComboItems(self) -> List[RDynamicCombo]:
+    def _getPOSDynamicComboItems(
+        self, rProducts: Iterable[RProduct]
+    ) -> List[RDynamicCombo]:
         """
-        Get a list of all dynamic combos.
-        :return: the list of all dynamic combos
+        Get a list of all active dynamic combos.
+        Upsells with their slots and combo items are only imported for combos
+        referenced by one of the synced products, other combos are imported without them.
+        :param rProducts: the synced R products
+        :return: the list of all active dynamic combos
         """
         route: str = RApiMethods.DYNAMIC_COMBO
 
-        params = {"establishment": self.establishmentId}
+        params = {"active": True, "establishment": self.establishmentId}
 
         totalRDynamicCombosResults = self._getAllPOSResults(route, params)
 
-        rDynamicCombos = [
-            RDynamicCombo.importDict(product) for product in totalRDynamicCombosResults
-        ]
-        return [combo for combo in rDynamicCombos if combo.active]
+        referencedComboUris = {
+            rProduct.dynamicCombo for rProduct in rProducts if rProduct.dynamicCombo
+        }
+        rDynamicCombos: List[RDynamicCombo] = []
+        for rawCombo in totalRDynamicCombosResults:
+            # R may ignore the active filter, so inactive combos are still skipped here
+            if not rawCombo.get("active"):
+                continue
+            if rawCombo.get("resource_uri") not in referencedComboUris:
+                rawCombo = {**rawCombo, "upsells": []}
+            rDynamicCombos.append(RDynamicCombo.importDict(rawCombo))
+        return rDynamicCombos
 
     def _getPOSPrevailingTax(self) -> RPrevailingTax:
         """Get prevailing tax from POS settings"""
@@ -623,11 +693,13 @@ class RAPI(BasePOSAPI):
 
         return rProductAttrs
 
-    def _getAllPOSResults(self, route: str, params: Dict) -> List[Dict]:
+    def _iterPOSPages(self, route: str, params: Dict) -> Iterator[List[Dict]]:
         """
-        Get a list of all objects from R.
+        Get all objects of R API method page by page.
+        With slow sync pages are fetched one after another, otherwise the pages after the first one
+        are fetched in parallel and yielded in order as soon as they are received.
         :param params: dictionary of method params
-        :return:  returns the list of all objects for R API method
+        :return: iterator over the pages of objects
         """
         params["limit"] = R_LIMIT
 
@@ -635,7 +707,7 @@ class RAPI(BasePOSAPI):
 
         rawResultJson = rawResult.json()
 
-        totalRObjectResults = rawResultJson.get("objects")
+        yield rawResultJson.get("objects")
 
         totalCount = rawResultJson.get("meta", {}).get("total_count", 0)
 
@@ -649,35 +721,56 @@ class RAPI(BasePOSAPI):
                     method=RequestType.GET, route=route, params=params
                 )
                 rawResultJson = rawResult.json()
-                totalRObjectResults.extend(rawResultJson.get("objects"))
+                yield rawResultJson.get("objects")
                 nextPage = rawResultJson.get("meta", {}).get("next", None)
-        else:
-            if totalCount > R_LIMIT:
-                callParams = []
-                for offset in range(R_LIMIT, totalCount, R_LIMIT):
-                    # extend call params with offset
-                    extParams = dict(params)
-                    extParams["offset"] = offset
-                    callParams.append((route, extParams))
-                # get all results in parallel
-                totalResult = self._parallelMap(self._getPOSObjects, callParams)
-
-                for result in totalResult:
-                    totalRObjectResults.extend(result)
+        elif totalCount > R_LIMIT:
+            callParams = []
+            for offset in range(R_LIMIT, totalCount, R_LIMIT):
+                # extend call params with offset
+                extParams = dict(params)
+                extParams["offset"] = offset
+                callParams.append((route, extParams))
+            # get pages in parallel
+            with ThreadPool(2) as threadPool:
+                yield from threadPool.imap(
+                    lambda args: self._getPOSObjects(*args), callParams
+                )
+
+    def _getAllPOSResults(self, route: str, params: Dict) -> List[Dict]:
+        """
+        Get a list of all objects from R.
+        :param params: dictionary of method params
+        :return:  returns the list of all objects for R API method
+        """
+        totalRObjectResults: List[Dict] = []
+        for objects in self._iterPOSPages(route, params):
+            totalRObjectResults.extend(objects)
 
         return totalRObjectResults
 
+    def _storeAllPOSResults(
+        self,
+        route: str,
+        params: Dict,
+        store: RSyncStore,
+        kind: str,
+        keyField: str = "resource_uri",
+    ) -> None:
+        """
+        Write all objects of R API method to the store, page by page as they are fetched.
+        :param params: dictionary of method params
+        :param store: the sync store
+        :param kind: the name the objects are stored under
+        :param keyField: field of the objects they are looked up by
+        """
+        for objects in self._iterPOSPages(route, params):
+            store.extend(kind, objects, keyField)
+
     def _getPOSObjects(self, route, params) -> List[Dict]:
         """Get objects from POS with offset"""
         response = self._callPOSAPI(method=RequestType.GET, route=route, params=params)
         return response.json().get("objects")
 
-    @staticmethod
-    def _parallelMap(executable: Callable, iterable: Iterable) -> List:
-        with ThreadPool(2) as threadPool:
-            result = threadPool.starmap(executable, iterable)
-        return result
-
     def healthCheck(self) -> POSHealthCheckResult:
         result: POSHealthCheckResult = POSHealthCheckResult()
         if self._validateConnectionSettings() is None:
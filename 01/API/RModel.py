@@ -1,3 +1,4 @@
+from decimal import Decimal
 from typing import Any, Dict, List, Optional
 
 from POSSystems.BasePOS.POSModel import POSModel, posfield, posmodel
@@ -121,8 +122,10 @@ class RCustomMenu(POSModel):
 @posmodel
 class RUpsellComboDetail(POSModel):
     upsellCombo: str = posfield(property="upsell_combo")
-    upsellComboPrice: float = posfield(
-        property="upsell_combo_price", importFunc=lambda x: float(x), default=0.0
+    upsellComboPrice: Decimal = posfield(
+        property="upsell_combo_price",
+        importFunc=lambda x: Decimal(str(x)),
+        default=Decimal(0),
     )
     sorting: int = posfield(property="sorting")
 
@@ -144,11 +147,15 @@ class RProduct(POSModel):
     dynamicCombo: str = posfield(property="dynamic_combo")
     productGroup: List[str] = posfield(property="product_group")
     tax: RProductTax = posfield(property="tax")
-    combo_upcharge: float = posfield(
-        property="combo_upcharge", importFunc=lambda x: float(x), default=0.0
+    combo_upcharge: Decimal = posfield(
+        property="combo_upcharge",
+        importFunc=lambda x: Decimal(str(x)),
+        default=Decimal(0),
     )
-    upsell_combo_price: float = posfield(
-        property="upsell_combo_price", importFunc=lambda x: float(x), default=0.0
+    upsell_combo_price: Decimal = posfield(
+        property="upsell_combo_price",
+        importFunc=lambda x: Decimal(str(x)),
+        default=Decimal(0),
     )
     sold_by_weight: bool = posfield(property="sold_by_weight")
     attribute_type: str = posfield(property="attribute_type")
@@ -462,7 +469,7 @@ class RUpsell(POSModel):
     id: int = posfield(property="id", required=True, importFunc=lambda x: str(x))
     active: bool = posfield(property="active")
     name: str = posfield(property="name", default="")
-    price: float = posfield(property="price", importFunc=lambda x: float(x))
+    price: Decimal = posfield(property="price", importFunc=lambda x: Decimal(str(x)))
     resourceUri: str = posfield(property="resource_uri")
     slots: List[RSlot] = posfield(property="slots")
 
@@ -472,14 +479,16 @@ class RDynamicCombo(POSModel):
     id: int = posfield(property="id", required=True, importFunc=lambda x: str(x))
     active: bool = posfield(property="active")
     name: str = posfield(property="name")
-    price: float = posfield(property="price", importFunc=lambda x: float(x))
+    price: Decimal = posfield(property="price", importFunc=lambda x: Decimal(str(x)))
     resourceUri: str = posfield(property="resource_uri")
     upsells: List[RUpsell] = posfield(property="upsells")
 
 
 class RWebMenuProductModifierClassModifiers(BaseModel):
     sort: int
-    price: int
+    price: Decimal
+    # price in integer minor units, set by RProductParserV2.normalizePrices
+    minorPrice: int = 0
     barcode: Optional[str]
     cost: str
     active: bool
@@ -539,7 +548,9 @@ class RWebMenuProduct(BaseModel):
     # point_value: null,
     # course_number: null,
     # created_date: 06/08/2016 11:34,
-    price: int
+    price: Decimal
+    # price in integer minor units, set by RProductParserV2.normalizePrices
+    minorPrice: int = 0
     uom: str
 
 
@@ -1,4 +1,6 @@
-from typing import Dict, List, Tuple
+from array import array
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Dict, List, Tuple, Union
 
 from bson import ObjectId
 from Model.enums import Channel, ItemType
@@ -25,6 +27,7 @@ class RProductParserV2(POSParser):
         self, rawMenu: Dict
     ) -> Tuple[List[Product], List[ProductCategory]]:
         rMenu: RWebMenu = RWebMenu.parse_obj(rawMenu)
+        self.normalizePrices(rMenu)
         for rCategory in rMenu.categories:
             self.createCategory(rCategory)
             for rProduct in rCategory.products:
@@ -35,6 +38,45 @@ class RProductParserV2(POSParser):
         products.extend(self.overloadedProducts)
         return products, list(self.categoryById.values())
 
+    def normalizePrices(self, rMenu: RWebMenu) -> None:
+        """
+        Convert all product and modifier prices of the menu to integer minor units in one columnar pass
+        before any Product is built. Prices are parsed as Decimal and scaled per type like getPriceFromPos
+        does, so the modifier overload check compares exact integers without float drift.
+        """
+        rProducts: List[RWebMenuProduct] = [
+            rProduct
+            for rCategory in rMenu.categories
+            for rProduct in rCategory.products
+        ]
+        rModifiers: List[RWebMenuProductModifierClassModifiers] = [
+            rModifier
+            for rProduct in rProducts
+            for rModGroup in rProduct.modifier_classes
+            for rModifier in rModGroup.modifiers
+        ]
+        for rItems, minorPrices in (
+            (rProducts, self.toMinorUnits(rProducts, r_PRICE_DECIMALS)),
+            (rModifiers, self.toMinorUnits(rModifiers)),
+        ):
+            for rItem, minorPrice in zip(rItems, minorPrices):
+                rItem.minorPrice = minorPrice
+
+    def toMinorUnits(
+        self,
+        rItems: List[Union[RWebMenuProduct, RWebMenuProductModifierClassModifiers]],
+        *decimals: int,
+    ) -> array:
+        # minor units of one major unit, the same scale getPriceFromPos applies with these decimals
+        scale: Decimal = Decimal(self.getPriceFromPos(1, *decimals))
+        return array(
+            "q",
+            (
+                int((rItem.price * scale).to_integral_value(ROUND_HALF_UP))
+                for rItem in rItems
+            ),
+        )
+
     def createCategory(self, rCategory: RWebMenuCategory) -> ProductCategory:
         category: ProductCategory = ProductCategory()
         category.name = rCategory.name
@@ -62,7 +104,7 @@ class RProductParserV2(POSParser):
             product.imageUrl = rProduct.image
         product.productType = ItemType.PRODUCT
         product.deliveryTax = product.takeawayTax = product.eatInTax = self.defaultTax
-        product.price = self.getPriceFromPos(rProduct.price, r_PRICE_DECIMALS)
+        product.price = rProduct.minorPrice
 
         product.setPosProp(RProps.RESOURCE_URI, f"/resources/Product/{rProduct.id}")
 
@@ -105,12 +147,10 @@ class RProductParserV2(POSParser):
         self, rModifier: RWebMenuProductModifierClassModifiers
     ) -> Product:
         if existingModifier := self.modifierByPLU.get(f"{rModifier.id}-M"):
-            if self.getPriceFromPos(existingModifier.price) != self.getPriceFromPos(
-                rModifier.price
-            ):
+            if existingModifier.price != rModifier.minorPrice:
                 modifier = existingModifier.copy()
                 modifier._id = ObjectId()
-                modifier.price = self.getPriceFromPos(rModifier.price)
+                modifier.price = rModifier.minorPrice
                 self.overloadedProducts.append(modifier)
                 return modifier
             return existingModifier
@@ -119,6 +159,6 @@ class RProductParserV2(POSParser):
         modifier.name = rModifier.name
         modifier.posProductId = rModifier.id
         modifier.productType = ItemType.MODIFIER
-        modifier.price = self.getPriceFromPos(rModifier.price)
+        modifier.price = rModifier.minorPrice
         self.modifierByPLU[modifier.plu] = modifier
         return modifier
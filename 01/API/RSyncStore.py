@@ -0,0 +1,171 @@
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+from typing import (Dict, Generic, Iterable, Iterator, List, Optional, Type,
+                    TypeVar)
+
+from POSSystems.BasePOS.POSModel import POSModel
+
+RModelType = TypeVar("RModelType", bound=POSModel)
+
+# rows read from the store per round trip while iterating over a resource
+FETCH_SIZE = 500
+
+
+class RSyncStore:
+    """
+    Disk backed store for raw R resources fetched during the product sync.
+    Every page is written to an embedded sqlite database as soon as it arrives
+    and resources are read back one by one, so the sync never keeps the whole catalog in memory.
+    Every resource is stored under a key, its resource uri by default, which is indexed for lookups.
+    The database file is removed on close.
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        fileDescriptor, self.path = tempfile.mkstemp(
+            prefix="r-sync-", suffix=".sqlite", dir=directory
+        )
+        os.close(fileDescriptor)
+        # pages can be written from the thread pool used for the parallel pagination
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        # the store only lives for one sync, durability is not needed
+        self.connection.execute("PRAGMA journal_mode=OFF")
+        self.connection.execute("PRAGMA synchronous=OFF")
+        self.connection.execute(
+            "CREATE TABLE resource (kind TEXT NOT NULL, key TEXT, data TEXT NOT NULL)"
+        )
+        # also serves the queries filtering by kind only
+        self.connection.execute(
+            "CREATE INDEX resource_kind_key ON resource (kind, key)"
+        )
+
+    def __enter__(self) -> "RSyncStore":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.connection.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def extend(
+        self, kind: str, rawObjects: Iterable[Dict], keyField: str = "resource_uri"
+    ) -> None:
+        """
+        Write a page of raw R objects of one resource kind
+        :param keyField: field of the raw objects they are stored and looked up under
+        """
+        rows = [
+            (kind, rawObject.get(keyField), json.dumps(rawObject))
+            for rawObject in rawObjects
+        ]
+        with self.lock:
+            self.connection.executemany(
+                "INSERT INTO resource (kind, key, data) VALUES (?, ?, ?)", rows
+            )
+            self.connection.commit()
+
+    def count(self, kind: str) -> int:
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT COUNT(*) FROM resource WHERE kind = ?", (kind,)
+            ).fetchone()
+        return row[0]
+
+    def iterate(self, kind: str) -> Iterator[Dict]:
+        """Iterate over the raw R objects of one resource kind in the order they were fetched"""
+        cursor = self.connection.execute(
+            "SELECT data FROM resource WHERE kind = ? ORDER BY rowid", (kind,)
+        )
+        try:
+            while rows := cursor.fetchmany(FETCH_SIZE):
+                for (data,) in rows:
+                    yield json.loads(data)
+        finally:
+            cursor.close()
+
+    def keys(self, kind: str) -> Iterator[str]:
+        """Iterate over the keys of one resource kind in the order they were fetched"""
+        cursor = self.connection.execute(
+            "SELECT key FROM resource WHERE kind = ? ORDER BY rowid", (kind,)
+        )
+        try:
+            while rows := cursor.fetchmany(FETCH_SIZE):
+                for (key,) in rows:
+                    yield key
+        finally:
+            cursor.close()
+
+    def lookup(self, kind: str, key: str) -> List[Dict]:
+        """Get the raw R objects of one resource kind stored under the key"""
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT data FROM resource WHERE kind = ? AND key = ? ORDER BY rowid",
+                (kind, key),
+            ).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def countJoined(self, kind: str, keysOf: str) -> int:
+        """Count the objects of one resource kind stored under the keys of another kind"""
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT COUNT(*) FROM resource WHERE kind = ? AND key IN "
+                "(SELECT key FROM resource WHERE kind = ?)",
+                (kind, keysOf),
+            ).fetchone()
+        return row[0]
+
+    def view(
+        self, kind: str, modelType: Type[RModelType], keysOf: Optional[str] = None
+    ) -> "RStoredResources":
+        return RStoredResources(self, kind, modelType, keysOf)
+
+
+class RStoredResources(Generic[RModelType]):
+    """
+    Read only collection of stored R resources.
+    Objects are imported into the R model lazily, while iterating or on lookup by key.
+    With keysOf, the collection only holds the objects stored under the keys of that other kind,
+    e.g. the product modifiers of the stored products, read by index lookups key by key.
+    """
+
+    def __init__(
+        self,
+        store: RSyncStore,
+        kind: str,
+        modelType: Type[RModelType],
+        keysOf: Optional[str] = None,
+    ):
+        self.store = store
+        self.kind = kind
+        self.modelType = modelType
+        self.keysOf = keysOf
+
+    def __len__(self) -> int:
+        if self.keysOf:
+            return self.store.countJoined(self.kind, self.keysOf)
+        return self.store.count(self.kind)
+
+    def __iter__(self) -> Iterator[RModelType]:
+        if self.keysOf:
+            for key in self.store.keys(self.keysOf):
+                yield from self.lookup(key)
+            return
+        for rawObject in self.store.iterate(self.kind):
+            yield self.modelType.importDict(rawObject)
+
+    def lookup(self, key: str) -> List[RModelType]:
+        """Get the objects stored under the key, e.g. the product modifiers of a product uri"""
+        return [
+            self.modelType.importDict(rawObject)
+            for rawObject in self.store.lookup(self.kind, key)
+        ]
+
+    def getByUri(self, resourceUri: str) -> Optional[RModelType]:
+        rawObjects = self.store.lookup(self.kind, resourceUri)
+        return self.modelType.importDict(rawObjects[0]) if rawObjects else None
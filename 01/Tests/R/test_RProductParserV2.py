@@ -9,6 +9,7 @@ from Model.enums import POS
 from Model.operationReport import OperationReport, OperationReportStatus
 from Model.product import ProductSyncSettings
 from POSSystems.R.RAPI import RAPI
+from POSSystems.R.RProductParserV2 import RProductParserV2
 from Tests.DataGenerator import BaseDataGenerator
 from Tests.integration.utils import getlogger
 
@@ -81,3 +82,39 @@ def test_parseWeMenu(testApp, testClient, database):
         assert operationReport.operationStatus == OperationReportStatus.SUCCESS
 
         assert operationReport.productSync
+
+
+def test_parseWebMenuPrices():
+    currentDir = os.path.dirname(os.path.abspath(__file__))
+    with open(os.path.join(currentDir, "mockData/webordersMenu.json")) as f:
+        rawMenu = json.load(f)
+    parser = RProductParserV2(logger, defaultTax=0)
+    parser.parseProductsToDc(rawMenu["body"]["data"])
+
+    # 0.5 and 1.5 must not be truncated while converting to minor units
+    assert parser.modifierByPLU["1077-M"].price == 50
+    assert parser.modifierByPLU["1080-M"].price == 150
+    assert all(isinstance(m.price, int) for m in parser.modifierByPLU.values())
+    # the same modifier has the same price in every product, so there are no overloads
+    assert parser.overloadedProducts == []
+
+
+def test_webMenuModifierOverloadsWithoutDrift():
+    currentDir = os.path.dirname(os.path.abspath(__file__))
+    with open(os.path.join(currentDir, "mockData/webordersMenu.json")) as f:
+        rawMenu = json.load(f)
+    # 0.29 * 100 is 28.999999999999996 in float, the string price is the same amount
+    pricesByProduct = {2977: 0.29, 2979: "0.290", 2980: 0.29, 2981: 0.3}
+    for rawCategory in rawMenu["body"]["data"]["categories"]:
+        for rawProduct in rawCategory["products"]:
+            for rawModGroup in rawProduct["modifier_classes"]:
+                for rawModifier in rawModGroup["modifiers"]:
+                    if rawModifier["id"] == 1077:
+                        rawModifier["price"] = pricesByProduct[rawProduct["id"]]
+
+    parser = RProductParserV2(logger, defaultTax=0)
+    parser.parseProductsToDc(rawMenu["body"]["data"])
+
+    assert parser.modifierByPLU["1077-M"].price == 29
+    # only the modifier with a different price in minor units is overloaded
+    assert [m.price for m in parser.overloadedProducts] == [30]
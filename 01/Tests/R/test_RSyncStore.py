@@ -0,0 +1,272 @@
+import os
+from unittest.mock import MagicMock, call, patch
+
+from bson import ObjectId
+from Model.enums import POS
+from Model.product import ProductSyncSettings
+from POSSystems.R.RAPI import RAPI
+from POSSystems.R.RConstants import R_LIMIT, RApiMethods
+from POSSystems.R.RModel import (RCustomMenu, RProduct, RProductGroup,
+                                 RProductModifierInfo)
+from POSSystems.R.RSyncStore import RStoredResources, RSyncStore
+from Tests.DataGenerator import BaseDataGenerator
+from Tests.integration.utils import getlogger
+
+logger = getlogger(__name__, "ERROR")
+
+
+def createRawProducts(count):
+    return [
+        {
+            "id": productId,
+            "name": f"Product {productId}",
+            "price": 1.5,
+            "resource_uri": f"/resources/Product/{productId}/",
+        }
+        for productId in range(count)
+    ]
+
+
+def createRawProductModifiers(productIds):
+    """one product modifier of the same modifier for every product id"""
+    modifierClass = {
+        "id": 1,
+        "active": True,
+        "name": "Sauce",
+        "resource_uri": "/resources/ModifierClass/1/",
+    }
+    return [
+        {
+            "id": 100 + productId,
+            "active": True,
+            "product": f"/resources/Product/{productId}/",
+            "modifier": {
+                "id": 1,
+                "active": True,
+                "name": "Ketchup",
+                "price": 0.5,
+                "resource_uri": "/resources/Modifier/1/",
+                "modifierClass": modifierClass,
+            },
+            "product_modifier_class": {
+                "id": 200 + productId,
+                "active": True,
+                "name": "Sauce",
+                "resource_uri": f"/resources/ProductModifierClass/{200 + productId}/",
+                "product": f"/resources/Product/{productId}/",
+                "forced": 0,
+                "lock_amount": 1,
+                "modifierclass": modifierClass["resource_uri"],
+            },
+            "default_modifier_qty": 0,
+        }
+        for productId in productIds
+    ]
+
+
+def createSyncObjects(productCount, modifierProductIds):
+    """raw objects of every R API method called by the product sync"""
+    rawProducts = createRawProducts(productCount)
+    for rawProduct in rawProducts:
+        rawProduct.update(
+            active=True,
+            sku=f"SKU{rawProduct['id']}",
+            category={"id": 1, "active": True, "name": "Food"},
+        )
+    rawProductModifiers = createRawProductModifiers(modifierProductIds)
+    return {
+        RApiMethods.PRODUCT: rawProducts,
+        RApiMethods.PRODUCT_MODIFIER: rawProductModifiers,
+        RApiMethods.MODIFIER: [rawProductModifiers[0]["modifier"]],
+        RApiMethods.MODIFIER_CLASS: [
+            rawProductModifiers[0]["modifier"]["modifierClass"]
+        ],
+        RApiMethods.SYSTEM_SETTING: [{"resource_uri": "/resources/SystemSetting/1/"}],
+        RApiMethods.SYSTEM_SETTING_OPTION: [{"parameter_value": "0.1"}],
+    }
+
+
+def callPOSAPIFrom(rawObjectsByRoute):
+    """_callPOSAPI answering paginated calls from the raw objects of the route"""
+
+    def callPOSAPI(method, route, params):
+        rawObjects = rawObjectsByRoute.get(route, [])
+        if "id__in" in params:
+            ids = params["id__in"].split(",")
+            rawObjects = [o for o in rawObjects if str(o["id"]) in ids]
+        offset = int(params.get("offset", 0))
+        nextOffset = offset + R_LIMIT
+        response = MagicMock()
+        response.json.return_value = {
+            "meta": {
+                "total_count": len(rawObjects),
+                "next": (
+                    f"limit={R_LIMIT}&offset={nextOffset}"
+                    if nextOffset < len(rawObjects)
+                    else None
+                ),
+            },
+            "objects": rawObjects[offset:nextOffset],
+        }
+        return response
+
+    return MagicMock(side_effect=callPOSAPI)
+
+
+def createApi(rawProducts, useSlowSync=False):
+    """RAPI answering paginated product calls from rawProducts"""
+    api = RAPI.__new__(RAPI)
+    api.logger = logger
+    api.useSlowSync = useSlowSync
+    api._callPOSAPI = callPOSAPIFrom({"product": rawProducts})
+    return api
+
+
+def test_syncStore():
+    with RSyncStore() as store:
+        path = store.path
+        store.extend("product", createRawProducts(3))
+        store.extend("modifier", [{"id": 1, "name": "Modifier"}])
+        store.extend("product", createRawProducts(5)[3:])
+
+        assert store.count("product") == 5
+        assert store.count("modifier") == 1
+        productIds = [rawObject["id"] for rawObject in store.iterate("product")]
+        assert productIds == list(range(5))
+
+        rProducts = store.view("product", RProduct)
+        assert len(rProducts) == 5
+        assert [rProduct.id for rProduct in rProducts] == ["0", "1", "2", "3", "4"]
+        assert all(isinstance(rProduct, RProduct) for rProduct in rProducts)
+    # the database file only lives for one sync
+    assert not os.path.exists(path)
+
+
+def test_syncStoreLookup():
+    with RSyncStore() as store:
+        store.extend("product", createRawProducts(3))
+        store.extend(
+            "productModifier", createRawProductModifiers([2, 0, 2, 7]), "product"
+        )
+
+        rProducts = store.view("product", RProduct)
+        assert rProducts.getByUri("/resources/Product/1/").id == "1"
+        assert rProducts.getByUri("/resources/Product/9/") is None
+
+        rProductModifiers = store.view("productModifier", RProductModifierInfo)
+        assert len(rProductModifiers) == 4
+        assert [m.id for m in rProductModifiers.lookup("/resources/Product/2/")] == [
+            "102",
+            "102",
+        ]
+        assert rProductModifiers.lookup("/resources/Product/1/") == []
+
+        # only the product modifiers of stored products, in the product order
+        rProductModifiers = store.view(
+            "productModifier", RProductModifierInfo, keysOf="product"
+        )
+        assert len(rProductModifiers) == 3
+        assert [m.id for m in rProductModifiers] == ["100", "102", "102"]
+        assert all(isinstance(m, RProductModifierInfo) for m in rProductModifiers)
+
+
+def test_storeAllPOSResults():
+    rawProducts = createRawProducts(R_LIMIT * 2 + 1)
+    for useSlowSync in (False, True):
+        api = createApi(rawProducts, useSlowSync=useSlowSync)
+        with RSyncStore() as store:
+            api._storeAllPOSResults("product", {}, store, kind="product")
+            assert list(store.iterate("product")) == rawProducts
+        assert api._callPOSAPI.call_count == 3
+
+        # the in memory mode reads the same pages
+        api = createApi(rawProducts, useSlowSync=useSlowSync)
+        assert api._getAllPOSResults("product", {}) == rawProducts
+
+
+def test_syncProductsCustomMenu():
+    rawObjectsByRoute = createSyncObjects(5, modifierProductIds=[0, 1, 3, 4])
+    api = createApi([])
+    api._callPOSAPI = callPOSAPIFrom(rawObjectsByRoute)
+    api.customMenuUri = "/resources/CustomMenu/1/"
+    api.establishment = "/resources/Establishment/1/"
+    api.establishmentId = 1
+    api._getPOSCustomMenu = MagicMock(
+        return_value=RCustomMenu.importDict(
+            {
+                "id": 1,
+                "resource_uri": api.customMenuUri,
+                "product_group": {"resource_uri": "/resources/ProductGroup/1/"},
+            }
+        )
+    )
+    api._getPOSProductGroup = MagicMock(
+        return_value=RProductGroup.importDict(
+            {
+                "id": 1,
+                "name": "Lunch",
+                "establishment": api.establishment,
+                "products": ["/resources/Product/1/", "/resources/Product/2/"],
+            }
+        )
+    )
+    api.parser = MagicMock()
+
+    def parseProducts(products, productModifiers, *args):
+        # the parser gets the stored products and reads their modifiers by lookups
+        assert isinstance(products, RStoredResources)
+        assert [rProduct.id for rProduct in products] == ["1", "2"]
+        assert isinstance(productModifiers, RStoredResources)
+        assert [m.product for m in productModifiers] == ["/resources/Product/1/"]
+        return [], []
+
+    api.parser.parseProducts.side_effect = parseProducts
+    with RSyncStore() as store:
+        with patch.object(RSyncStore, "lookup", wraps=store.lookup) as lookup:
+            api._syncProducts(store)
+        assert store.count("product") == 2
+        assert lookup.call_args_list == [
+            call("productModifier", "/resources/Product/1/"),
+            call("productModifier", "/resources/Product/2/"),
+        ]
+    api.parser.parseProducts.assert_called_once()
+
+
+def test_diskSyncThroughParser(testApp, database):
+    dataGenerator = BaseDataGenerator()
+    settings = dict(
+        r=dict(establishment="/resources/Establishment/1/", clientId="someClientId")
+    )
+    rawObjectsByRoute = createSyncObjects(R_LIMIT + 1, modifierProductIds=[0, R_LIMIT])
+    with testApp.test_request_context():
+        account = dataGenerator.createAccount()
+        database.insertAccount(account)
+        location = dataGenerator.createLocation(
+            _id=ObjectId(),
+            name="R location",
+            account=account.oid,
+            posSystemId=POS.r,
+            posSettings=settings,
+        )
+        database.insertLocations([location])
+
+        productSyncInfos = []
+        for useDiskSync in (False, True):
+            api = RAPI(location)
+            api.useDiskSync = useDiskSync
+            api._callPOSAPI = callPOSAPIFrom(rawObjectsByRoute)
+            with patch.object(
+                RSyncStore, "lookup", autospec=True, side_effect=RSyncStore.lookup
+            ) as lookup:
+                productSyncInfos.append(api.getProductSyncInfo(ProductSyncSettings()))
+            # in disk mode the parser reads the product modifiers by product uri lookups
+            assert lookup.called == useDiskSync
+
+    memorySyncInfo, diskSyncInfo = productSyncInfos
+    assert diskSyncInfo.products
+    assert sorted((p.name, p.price) for p in diskSyncInfo.products) == sorted(
+        (p.name, p.price) for p in memorySyncInfo.products
+    )
+    assert sorted(c.name for c in diskSyncInfo.categories) == sorted(
+        c.name for c in memorySyncInfo.categories
+    )
@@ -0,0 +1,139 @@
+import os
+import random
+
+import pytest
+
+import address_index
+import base58check
+import bech32
+from address_index import (BLOOM_HEADROOM, AddressIndex, BloomFilter, main,
+                           program_from_address)
+
+
+@pytest.fixture
+def programs():
+    generator = random.Random(7)
+    return [generator.randbytes(20) for _ in range(2000)]
+
+
+def test_build_and_query(tmp_path, programs):
+    # small runs, so the external merge sort uses several runs
+    with AddressIndex.build(
+        str(tmp_path), programs + programs[:10], run_size=300
+    ) as index:
+        assert len(index) == len(programs)
+        assert all(program in index for program in programs)
+
+        others = [os.urandom(20) for _ in range(500)]
+        queries = others + programs[::7]
+        expected = [program in programs for program in queries]
+        assert index.contains_many(queries) == expected
+
+
+def test_append_and_compact(tmp_path, programs):
+    index = AddressIndex.build(str(tmp_path), programs[:1000])
+    assert index.append(programs[500:]) == 1000
+    assert len(index) == len(programs)
+    assert AddressIndex(str(tmp_path)).contains_many(programs) == [True] * 2000
+    index.close()
+
+    with AddressIndex(str(tmp_path)).compact() as index:
+        assert not index.delta
+        assert len(index.records) == len(programs)
+        assert list(index.records) == sorted(programs)
+
+
+def test_append_rebuilds_bloom_filter(tmp_path, programs):
+    with AddressIndex.build(
+        str(tmp_path), programs[:500], false_positive_rate=0.01
+    ) as index:
+        assert index.bloom_capacity == 500 * BLOOM_HEADROOM
+        # within the headroom the filter is kept
+        index.append(programs[500:1000])
+        assert index.bloom_capacity == 500 * BLOOM_HEADROOM
+
+        # over the capacity the filter is resized for the new size
+        index.append(programs[1000:])
+        assert index.bloom_capacity == len(programs) * BLOOM_HEADROOM
+
+    with AddressIndex(str(tmp_path)) as index:
+        assert index.contains_many(programs) == [True] * len(programs)
+        false_positives = sum(os.urandom(20) in index.bloom for _ in range(10000))
+        assert false_positives < 300
+
+
+def test_bloom_filter_false_positive_rate(programs):
+    bloom = BloomFilter.create(len(programs), 0.01)
+    for program in programs:
+        bloom.add(program)
+    assert all(program in bloom for program in programs)
+    false_positives = sum(os.urandom(20) in bloom for _ in range(10000))
+    assert false_positives < 300
+
+
+def test_program_from_address(programs):
+    address = bech32.encode("bc", 0, programs[0])
+    assert program_from_address(address) == programs[0]
+    assert program_from_address("1BvBMSEYstWetqTFn5Au4m4GFg7xJaNVN2") == bytes.fromhex(
+        "77bff20c60e522dfaa3350c39b030a5d004e839a"
+    )
+    assert program_from_address(address[:-1]) is None
+    assert program_from_address("not an address") is None
+
+
+def test_program_from_address_versions(programs):
+    for version in (0x00, 0x6F):
+        address = base58check.encode_check(bytes([version]) + programs[0])
+        assert program_from_address(address) == programs[0]
+    # P2SH hashes a script, not a public key
+    for version in (0x05, 0xC4):
+        address = base58check.encode_check(bytes([version]) + programs[0])
+        assert program_from_address(address) is None
+    assert program_from_address("3J98t1WpEZ73CNmQviecrnyiWrnqRhWNLy") is None
+
+
+def write_addresses(path, programs):
+    with open(path, "w") as addresses_file:
+        for program in programs:
+            addresses_file.write(bech32.encode("bc", 0, program) + "\n")
+
+
+def test_main(tmp_path, programs, capsys, monkeypatch):
+    index_dir = str(tmp_path / "index")
+    write_addresses(tmp_path / "first.txt", programs[:1000])
+    write_addresses(tmp_path / "second.txt", programs[1000:1500])
+    main(["build", index_dir, str(tmp_path / "first.txt")])
+    main(["append", index_dir, str(tmp_path / "second.txt")])
+    with AddressIndex(index_dir) as index:
+        assert len(index.delta) == 500
+
+    main(["compact", index_dir])
+    with AddressIndex(index_dir) as index:
+        assert not index.delta
+        assert list(index.records) == sorted(programs[:1500])
+
+    # the append command compacts once the delta is over DELTA_COMPACT_SIZE
+    monkeypatch.setattr(address_index, "DELTA_COMPACT_SIZE", 100)
+    write_addresses(tmp_path / "third.txt", programs[1500:])
+    main(["append", index_dir, str(tmp_path / "third.txt")])
+    with AddressIndex(index_dir) as index:
+        assert not index.delta
+        assert len(index.records) == len(programs)
+
+    # the query input is read and checked in chunks
+    monkeypatch.setattr(address_index, "QUERY_CHUNK_SIZE", 7)
+    queries = programs[::100] + [os.urandom(20) for _ in range(10)]
+    write_addresses(tmp_path / "queries.txt", queries)
+    capsys.readouterr()
+    main(["query", index_dir, str(tmp_path / "queries.txt")])
+    lines = capsys.readouterr().out.splitlines()
+    assert lines == [
+        f"{bech32.encode('bc', 0, program)},{int(program in programs)}"
+        for program in queries
+    ]
+
+
+def test_parse_args():
+    assert address_index.parse_args(["compact", "index"]).input is None
+    with pytest.raises(SystemExit):
+        address_index.parse_args(["query", "index"])
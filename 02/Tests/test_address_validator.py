@@ -0,0 +1,36 @@
+from address_validator import (INVALID, P2PKH, P2WPKH, P2WSH, classify,
+                               validate_addresses)
+
+ADDRESSES = [
+    ("bc1qw508d6qejxtdg4y5r3zarvary0c5xw7kv8f3t4", P2WPKH),
+    ("bc1qrp33g0q5c5txsp9arysrx4k6zdkfs4nce4xj0gdcccefvpysxf3qccfmv3", P2WSH),
+    ("1A1zP1eP5QGefi2DMPTfTL5SLmv7DivfNa", P2PKH),
+    ("1A1zP1eP5QGefi2DMPTfTL5SLmv7DivfNb", INVALID),
+    ("bc1qw508d6qejxtdg4y5r3zarvary0c5xw7kv8f3t5", INVALID),
+    ("tb1qw508d6qejxtdg4y5r3zarvary0c5xw7kxpjzsx", INVALID),
+    ("", INVALID),
+]
+
+
+def test_classify():
+    for address, address_type in ADDRESSES:
+        result_type, reason = classify(address)
+        assert result_type == address_type, address
+        assert bool(reason) == (address_type == INVALID)
+
+
+def test_classify_testnet():
+    assert classify("tb1qw508d6qejxtdg4y5r3zarvary0c5xw7kxpjzsx", "testnet") == (
+        P2WPKH,
+        "",
+    )
+    assert classify("1A1zP1eP5QGefi2DMPTfTL5SLmv7DivfNa", "testnet")[0] == INVALID
+
+
+def test_validate_addresses_keeps_order():
+    lines = [f"{address}\n" for address, _ in ADDRESSES] * 50
+    results = list(validate_addresses(lines, workers=2, chunk_size=7))
+    assert [address for address, _, _ in results] == [line.strip() for line in lines]
+    assert [address_type for _, address_type, _ in results] == [
+        address_type for _, address_type in ADDRESSES
+    ] * 50
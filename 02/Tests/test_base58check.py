@@ -0,0 +1,67 @@
+import os
+import random
+
+import pytest
+
+import base58check
+
+# bitcoin core base58_encode_decode.json
+VECTORS = [
+    ("", ""),
+    ("61", "2g"),
+    ("626262", "a3gV"),
+    ("636363", "aPEr"),
+    ("73696d706c792061206c6f6e6720737472696e67", "2cFupjhnEsSn59qHXstmK2ffpLv2"),
+    (
+        "00eb15231dfceb60925886b67d065299925915aeb172c06647",
+        "1NS17iag9jJgTHD1VXjvLCEnZuQ3rJDE9L",
+    ),
+    ("516b6fcd0f", "ABnLTmg"),
+    ("bf4f89001e670274dd", "3SEo3LWLoPntC"),
+    ("572e4794", "3EFU7m"),
+    ("ecac89cad93923c02321", "EJDM8drfXA6uyA"),
+    ("10c8511e", "Rt5zm"),
+    ("00000000000000000000", "1111111111"),
+]
+
+
+@pytest.mark.parametrize("data, string", VECTORS)
+def test_vectors(data, string):
+    assert base58check.encode(bytes.fromhex(data)) == string
+    assert base58check.decode(string) == bytes.fromhex(data)
+
+
+def test_round_trip():
+    generator = random.Random(58)
+    for _ in range(500):
+        data = b"\x00" * generator.randrange(3) + generator.randbytes(
+            generator.randrange(80)
+        )
+        assert base58check.decode(base58check.encode(data)) == data
+
+
+def test_check():
+    # P2PKH address of the private key 1
+    payload = bytes.fromhex("0091b24bf9f5288532960ac687abb035127b1d28a5")
+    address = "1EHNa6Q4Jz2uvNExL497mE43ikXhwF6kZm"
+    assert base58check.encode_check(payload) == address
+    assert base58check.decode_check(address) == payload
+
+    payloads = [b"\x00" + os.urandom(20) for _ in range(100)] + [payload]
+    assert base58check.encode_check_batch(payloads) == [
+        base58check.encode_check(item) for item in payloads
+    ]
+
+
+@pytest.mark.parametrize(
+    "string",
+    [
+        "1EHNa6Q4Jz2uvNExL497mE43ikXhwF6kZn",
+        "1EHNa6Q4Jz2uvNExL497mE43ikXhwF6kZ0",
+        "1",
+        "é",
+    ],
+)
+def test_decode_check_invalid(string):
+    with pytest.raises(ValueError):
+        base58check.decode_check(string)
@@ -0,0 +1,118 @@
+import random
+
+import pytest
+
+import bech32
+from bech32 import (Bech32DecodeError, bech32_create_checksum, bech32_decode,
+                    bech32_encode, bech32_hrp_expand, bech32_polymod,
+                    bech32_polymod_update, bech32_verify_checksum, convertbits,
+                    convertbits_5to8, convertbits_8to5, decode, encode)
+
+HRPS = ["bc", "tb", "bcrt", "a", "an83characterlonghumanreadablepart"]
+ITERATIONS = 2000
+
+
+def reference_create_checksum(hrp, data):
+    values = bech32_hrp_expand(hrp) + data
+    polymod = bech32_polymod(values + [0, 0, 0, 0, 0, 0]) ^ 1
+    return [(polymod >> 5 * (5 - i)) & 31 for i in range(6)]
+
+
+def reference_verify_checksum(hrp, data):
+    return bech32_polymod(bech32_hrp_expand(hrp) + data) == 1
+
+
+def reference_encode(hrp, witver, witprog):
+    data = [witver] + convertbits(witprog, 8, 5)
+    combined = data + reference_create_checksum(hrp, data)
+    return hrp + "1" + "".join([bech32.CHARSET[d] for d in combined])
+
+
+@pytest.fixture
+def rng():
+    return random.Random(54)
+
+
+def random_data(rng, max_length=60):
+    return [rng.randrange(32) for _ in range(rng.randrange(max_length))]
+
+
+def test_polymod_table_matches_reference(rng):
+    for _ in range(ITERATIONS):
+        values = random_data(rng)
+        assert bech32_polymod_update(1, values) == bech32_polymod(values)
+
+
+def test_create_checksum_matches_reference(rng):
+    for _ in range(ITERATIONS):
+        hrp = rng.choice(HRPS)
+        data = random_data(rng)
+        assert bech32_create_checksum(hrp, data) == reference_create_checksum(hrp, data)
+
+
+def test_verify_checksum_matches_reference(rng):
+    for _ in range(ITERATIONS):
+        hrp = rng.choice(HRPS)
+        data = random_data(rng)
+        data += bech32_create_checksum(hrp, data)
+        # flip one value in half of the cases
+        if rng.random() < 0.5:
+            position = rng.randrange(len(data))
+            data[position] ^= rng.randrange(1, 32)
+        assert bech32_verify_checksum(hrp, data) == reference_verify_checksum(hrp, data)
+
+
+def test_encode_decode_round_trip(rng):
+    for _ in range(ITERATIONS):
+        hrp = rng.choice(["bc", "tb"])
+        witprog = [rng.randrange(256) for _ in range(rng.choice([20, 32]))]
+        address = encode(hrp, 0, witprog)
+        assert address == reference_encode(hrp, 0, witprog)
+        assert decode(hrp, address) == (0, witprog)
+
+
+def test_bech32_encode_does_not_change_data(rng):
+    data = random_data(rng)
+    copy = list(data)
+    hrp, decoded = bech32_decode(bech32_encode("bc", data))
+    assert hrp == "bc"
+    assert decoded == copy == data
+
+
+def test_known_vectors():
+    address = "bc1qw508d6qejxtdg4y5r3zarvary0c5xw7kv8f3t4"
+    witver, witprog = decode("bc", address)
+    assert witver == 0
+    assert bytes(witprog).hex() == "751e76e8199196d454941c45d1b3a323f1433bd6"
+    assert encode("bc", witver, witprog) == address
+
+    with pytest.raises(Bech32DecodeError):
+        decode("bc", "bc1qw508d6qejxtdg4y5r3zarvary0c5xw7kv8f3t5")
+    with pytest.raises(Bech32DecodeError):
+        decode("tb", address)
+
+
+def test_convertbits_fast_paths_match_generic(rng):
+    for _ in range(ITERATIONS):
+        data = bytes(rng.randrange(256) for _ in range(rng.randrange(50)))
+        assert convertbits_8to5(data) == convertbits(data, 8, 5)
+        assert convertbits_8to5(bytearray(data)) == convertbits(data, 8, 5)
+        assert convertbits_8to5(list(data)) == convertbits(data, 8, 5)
+
+        five_bit = random_data(rng)
+        try:
+            expected = convertbits(five_bit, 5, 8, False)
+        except Bech32DecodeError:
+            with pytest.raises(Bech32DecodeError):
+                convertbits_5to8(five_bit)
+        else:
+            assert convertbits_5to8(five_bit) == expected
+
+
+@pytest.mark.parametrize("data", [[32], [-1], [1, 2, 300]])
+def test_convertbits_fast_paths_invalid_values(data):
+    with pytest.raises(Bech32DecodeError):
+        convertbits_5to8(data)
+    if max(data) > 255 or min(data) < 0:
+        with pytest.raises(Bech32DecodeError):
+            convertbits_8to5(data)
@@ -0,0 +1,46 @@
+import json
+
+from benchmark import main, run
+
+
+def test_run():
+    results = run(20, [1, 10], [1])
+    names = [result["name"] for result in results]
+    assert names[:9] == [
+        "private_key",
+        "pub_key",
+        "hash160",
+        "convertbits",
+        "convertbits_8to5",
+        "bech32_encode",
+        "base58check_encode",
+        "p2wpkh",
+        "p2pkh",
+    ]
+    assert [result.get("batch_size") for result in results[9:11]] == [1, 10]
+    assert results[-1]["workers"] == 1
+    assert all(result["count"] == 20 and result["per_second"] > 0 for result in results)
+
+
+def test_main_output(tmp_path):
+    output = tmp_path / "results.jsonl"
+    profile = tmp_path / "keygen.prof"
+    for _ in range(2):
+        main(
+            [
+                "-n",
+                "5",
+                "--batch-sizes",
+                "5",
+                "-w",
+                "1",
+                "-o",
+                str(output),
+                "--profile",
+                str(profile),
+            ]
+        )
+    runs = [json.loads(line) for line in output.read_text().splitlines()]
+    assert len(runs) == 2
+    assert runs[0]["count"] == 5
+    assert profile.stat().st_size > 0
@@ -0,0 +1,81 @@
+import pytest
+
+import bip32
+
+# BIP32 test vector 1
+SEED = bytes.fromhex("000102030405060708090a0b0c0d0e0f")
+MASTER_XPRV = (
+    "xprv9s21ZrQH143K3QTDL4LXw2F7HEK3wJUD2nW2nRk4stbPy6cq3jPPqjiChkVvvNKmPGJxWUtg6Ln"
+    "F5kejMRNNU3TGtRBeJgk33yuGBxrMPHi"
+)
+MASTER_XPUB = (
+    "xpub661MyMwAqRbcFtXgS5sYJABqqG9YLmC4Q1Rdap9gSE8NqtwybGhePY2gZ29ESFjqJoCu1Rupje8"
+    "YtGqsefD265TMg7usUDFdp6W1EGMcet8"
+)
+HARDENED_CHILD_XPUB = (
+    "xpub68Gmy5EdvgibQVfPdqkBBCHxA5htiqg55crXYuXoQRKfDBFA1WEjWgP6LHhwBZeNK1VTsfTFUHC"
+    "drfp1bgwQ9xv5ski8PX9rL2dZXvgGDnw"
+)
+CHILD_XPUB = (
+    "xpub6ASuArnXKPbfEwhqN6e3mwBcDTgzisQN1wXN9BJcM47sSikHjJf3UFHKkNAWbWMiGj7Wf5uMash"
+    "7SyYq527Hqck2AxYysAA7xmALppuCkwQ"
+)
+
+
+def test_master_key():
+    master = bip32.from_seed(SEED)
+    assert bip32.serialize(master) == MASTER_XPRV
+    assert bip32.serialize(bip32.neuter(master)) == MASTER_XPUB
+    assert bip32.parse(MASTER_XPRV) == master
+    assert bip32.parse(MASTER_XPUB) == bip32.neuter(master)
+
+
+def test_derive_path():
+    master = bip32.from_seed(SEED)
+    assert bip32.serialize(bip32.neuter(bip32.derive_path(master, "m/0'"))) == (
+        HARDENED_CHILD_XPUB
+    )
+    assert bip32.serialize(bip32.neuter(bip32.derive_path(master, "m/0'/1"))) == (
+        CHILD_XPUB
+    )
+    # the non-hardened child can be derived from the public key only
+    public_parent = bip32.parse(HARDENED_CHILD_XPUB)
+    assert bip32.serialize(bip32.derive_path(public_parent, "1")) == CHILD_XPUB
+
+
+def test_hardened_child_of_public_key():
+    with pytest.raises(ValueError):
+        bip32.derive_path(bip32.parse(MASTER_XPUB), "0'")
+
+
+def test_derive_addresses_matches_single_derivation():
+    account = bip32.derive_path(bip32.from_seed(SEED), "m/84'/0'/0'/0")
+    expected = [
+        (index, bip32.address(bip32.derive_child(account, index)))
+        for index in range(10, 40)
+    ]
+    assert bip32.derive_range(bip32.neuter(account), 10, 40) == expected
+    assert list(bip32.derive_addresses(account, 10, 40, workers=2, chunk_size=7)) == (
+        expected
+    )
+
+
+def test_only_public_children_are_cached():
+    bip32._derive_public_child.cache_clear()
+    master = bip32.from_seed(SEED)
+    bip32.derive_path(master, "m/0'/1")
+    assert bip32._derive_public_child.cache_info().currsize == 0
+
+    public_parent = bip32.parse(HARDENED_CHILD_XPUB)
+    child = bip32.derive_child(public_parent, 1)
+    assert bip32.derive_child(public_parent, 1) is child
+    assert bip32._derive_public_child.cache_info().hits == 1
+    bip32._derive_public_child.cache_clear()
+
+
+@pytest.mark.parametrize("size", [0, 15, 65])
+def test_seed_size(size):
+    with pytest.raises(ValueError):
+        bip32.from_seed(bytes(size))
+    bip32.from_seed(bytes(16))
+    bip32.from_seed(bytes(64))
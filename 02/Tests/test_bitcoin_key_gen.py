@@ -0,0 +1,34 @@
+from bitcoin_key_gen import (get_addresses, get_bitcoin_address,
+                             get_bitcoin_address_P2PKH, private_key, pub_key)
+
+# well known addresses of the private key 1
+KEY_ONE_P2PKH = "1EHNa6Q4Jz2uvNExL497mE43ikXhwF6kZm"
+KEY_ONE_P2WPKH = "bc1qw508d6qejxtdg4y5r3zarvary0c5xw7kv8f3t4"
+
+
+def test_get_addresses_known_key():
+    addresses = get_addresses(1)
+    assert addresses.p2pkh_address == KEY_ONE_P2PKH
+    assert addresses.p2wpkh_address == KEY_ONE_P2WPKH
+    assert addresses.compressed_public_key.hex() == (
+        "0279be667ef9dcbbac55a06295ce870b07029bfcdb2dce28d959f2815b16f81798"
+    )
+    assert len(addresses.public_key) == 65
+
+
+def test_get_addresses_key_types():
+    priv_key = private_key()
+    addresses = get_addresses(priv_key)
+    assert get_addresses(int(priv_key, 16)) == addresses
+    assert get_addresses(int(priv_key, 16).to_bytes(32, "big")) == addresses
+    assert addresses.p2wpkh_address == get_bitcoin_address(priv_key)
+    assert addresses.public_key == b"\x04" + pub_key(priv_key)
+
+
+def test_get_bitcoin_address_P2PKH_matches_get_addresses():
+    assert get_bitcoin_address_P2PKH(1) == KEY_ONE_P2PKH
+    for _ in range(5):
+        priv_key = private_key()
+        assert get_bitcoin_address_P2PKH(priv_key) == (
+            get_addresses(priv_key).p2pkh_address
+        )
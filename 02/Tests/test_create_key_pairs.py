@@ -0,0 +1,84 @@
+import json
+import struct
+
+import pytest
+
+from bitcoin_key_gen import get_bitcoin_address
+from create_key_pairs import (CHUNK_SIZE, FORMATS, KeyPairWriter, chunk_sizes,
+                              generate, generate_chunk, parse_args)
+
+
+def read_key_pairs(path, output_format):
+    """key pairs of a KeyPairWriter output file"""
+    if output_format == "bin":
+        key_pairs = []
+        with open(path, "rb") as input_file:
+            while header := input_file.read(33):
+                key, length = struct.unpack(">32sB", header)
+                address = input_file.read(length).decode()
+                key_pairs.append((key.hex().lstrip("0"), address))
+        return key_pairs
+
+    with open(path) as input_file:
+        if output_format == "csv":
+            assert next(input_file) == "private_key,address\n"
+            return [tuple(line.rstrip("\n").split(",")) for line in input_file]
+        return [
+            (row["private_key"], row["address"]) for row in map(json.loads, input_file)
+        ]
+
+
+@pytest.mark.parametrize("output_format", FORMATS)
+def test_key_pair_writer(tmp_path, output_format):
+    key_pairs = generate_chunk(10)
+    path = str(tmp_path / f"keys.{output_format}")
+    with KeyPairWriter(path, output_format) as writer:
+        writer.write(key_pairs[:4])
+        writer.write(key_pairs[4:])
+    assert read_key_pairs(path, output_format) == key_pairs
+    for key, address in key_pairs:
+        assert address == get_bitcoin_address(key)
+
+
+def test_key_pair_writer_unknown_format(tmp_path):
+    with pytest.raises(ValueError):
+        KeyPairWriter(str(tmp_path / "keys.txt"), "txt")
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+@pytest.mark.parametrize("output_format", FORMATS)
+def test_generate(tmp_path, output_format, workers):
+    count = CHUNK_SIZE + 5
+    path = str(tmp_path / f"keys.{output_format}")
+    assert generate(count, workers, path, output_format) > 0
+
+    key_pairs = read_key_pairs(path, output_format)
+    assert len(key_pairs) == count
+    assert len({key for key, _ in key_pairs}) == count
+    for key, address in key_pairs[:: CHUNK_SIZE // 10]:
+        assert address == get_bitcoin_address(key)
+
+
+def test_chunk_sizes():
+    assert list(chunk_sizes(CHUNK_SIZE * 2 + 5)) == [CHUNK_SIZE, CHUNK_SIZE, 5]
+    assert list(chunk_sizes(CHUNK_SIZE)) == [CHUNK_SIZE]
+
+
+def test_parse_args():
+    parsed = parse_args(["-n", "10", "-w", "2", "-o", "keys.bin", "-f", "bin"])
+    assert (parsed.count, parsed.workers, parsed.output, parsed.format) == (
+        10,
+        2,
+        "keys.bin",
+        "bin",
+    )
+    assert parse_args(["--output", "keys.csv"]).format == "csv"
+
+    for args in (
+        [],
+        ["-o", "keys.csv", "--count", "0"],
+        ["-o", "keys.csv", "--workers", "0"],
+        ["-o", "keys.txt", "--format", "txt"],
+    ):
+        with pytest.raises(SystemExit):
+            parse_args(args)
@@ -0,0 +1,76 @@
+import multiprocessing
+import threading
+from unittest import mock
+
+import bech32
+from create_key_pairs import generate_chunk
+from key_pool import KeyPool
+
+get_start_context = multiprocessing.get_context
+
+
+def test_key_pool_refill():
+    with KeyPool(capacity=200, low_water=100, batch_size=50, processes=0) as pool:
+        assert pool.wait_full(timeout=30)
+        pairs = [pool.get() for _ in range(150)]
+        assert len(set(pairs)) == 150
+        for priv_key, address in pairs[:5]:
+            assert int(priv_key, 16)
+            assert bech32.decode("bc", address)[0] == 0
+
+        # dropped below the low-water mark, the refill thread fills the pool again
+        assert pool.wait_full(timeout=30)
+        stats = pool.stats()
+        assert stats.size == stats.capacity == 200
+        assert stats.fill_level == 1.0
+        assert stats.generated == 350
+        assert stats.served == 150
+        assert stats.empty_hits == 0
+        assert stats.refill_errors == 0
+        assert stats.refill_rate > 0
+
+
+def test_key_pool_empty():
+    pool = KeyPool(capacity=10, processes=0)
+    # not started, every request is served synchronously
+    priv_key, address = pool.get()
+    assert address.startswith("bc1q")
+    assert pool.stats().empty_hits == 1
+    pool.close()
+
+
+def test_key_pool_processes():
+    contexts = []
+
+    def get_context(method):
+        contexts.append((method, threading.current_thread()))
+        return get_start_context(method)
+
+    with mock.patch.object(multiprocessing, "get_context", get_context):
+        pool = KeyPool(capacity=20, batch_size=10, processes=1)
+        pool.start()
+    # workers are spawned by the thread starting the pool, not forked by the refill thread
+    assert contexts == [("spawn", threading.current_thread())]
+    with pool:
+        assert pool.wait_full(timeout=60)
+        assert pool.get()[1].startswith("bc1q")
+    assert pool.process_pool is None
+
+
+def test_key_pool_refill_error(caplog):
+    calls = []
+
+    def generate(size):
+        calls.append(size)
+        if len(calls) == 1:
+            raise RuntimeError("generation failed")
+        return generate_chunk(size)
+
+    with KeyPool(
+        capacity=20, batch_size=10, processes=0, generate=generate, retry_delay=0.01
+    ) as pool:
+        # the first batch fails, the thread logs it and keeps refilling
+        assert pool.wait_full(timeout=30)
+        assert pool.thread.is_alive()
+        assert pool.stats().refill_errors == 1
+    assert "Key pool refill failed" in caplog.text
@@ -0,0 +1,33 @@
+import secrets
+
+import pytest
+from fastecdsa import curve, keys
+
+from secp256k1_batch import N, FixedBaseTable, derive_public_points
+
+
+def reference_points(secret_exponents):
+    points = [keys.get_public_key(k, curve.secp256k1) for k in secret_exponents]
+    return [(point.x, point.y) for point in points]
+
+
+def test_derive_public_points_matches_fastecdsa():
+    secret_exponents = [secrets.randbelow(N - 1) + 1 for _ in range(200)]
+    # edge cases: single window digits, top bits and the end of the range
+    secret_exponents += [1, 2, 255, 256, 2**255, N - 2, N - 1]
+    assert derive_public_points(secret_exponents) == reference_points(secret_exponents)
+
+
+def test_derive_public_points_other_window():
+    secret_exponents = [secrets.randbelow(N - 1) + 1 for _ in range(20)]
+    table = FixedBaseTable(window=4)
+    assert derive_public_points(secret_exponents, table) == reference_points(
+        secret_exponents
+    )
+
+
+def test_derive_public_points_out_of_range():
+    with pytest.raises(ValueError):
+        derive_public_points([0])
+    with pytest.raises(ValueError):
+        derive_public_points([N])
@@ -0,0 +1,40 @@
+import pytest
+
+import secp256k1_batch
+import vanity
+from bitcoin_key_gen import get_addresses
+
+
+def test_parse_prefix():
+    target = vanity.parse_prefix("BC1QCA")
+    # c = 24, a = 29
+    assert (target.value, target.size, target.shift) == (24 << 5 | 29, 2, 6)
+    assert target.expected_keys == 1024
+    assert vanity.parse_prefix("tb1q", "tb").expected_keys == 1
+
+    for prefix in ("bc1pca", "bc1qcab", "bc1q" + "q" * 33):
+        with pytest.raises(ValueError):
+            vanity.parse_prefix(prefix)
+
+
+def test_scan_matches_encoded_addresses():
+    secret = 123456789
+    point = secp256k1_batch.get_table().multiply(secret)
+    address = get_addresses(secret + 37).p2wpkh_address
+    target = vanity.parse_prefix(address[:12])
+
+    match, next_point = vanity.scan(secret, point, 64, target)
+    assert get_addresses(match).p2wpkh_address.startswith(address[:12])
+    assert match <= secret + 37
+
+    _, next_point = vanity.scan(secret, point, 64, target._replace(value=-1))
+    assert secp256k1_batch.batch_normalize([next_point]) == (
+        secp256k1_batch.derive_public_points([secret + 64])
+    )
+
+
+def test_find():
+    result = vanity.find("bc1qq", workers=2, batch_size=64, timeout=60)
+    assert result.address.startswith("bc1qq")
+    assert get_addresses(result.private_key).p2wpkh_address == result.address
+    assert result.keys >= 1
@@ -0,0 +1,420 @@
+"""
+Membership index of generated addresses, keyed by their 20 bytes hash160 program.
+A Bloom filter answers most negative lookups, the rest are checked in a memory-mapped sorted
+array of programs on disk, plus a small unsorted delta of appended programs.
+Usage:
+    python address_index.py build index_dir keys.csv --format csv
+    python address_index.py append index_dir more_keys.bin --format bin
+    python address_index.py query index_dir addresses.txt
+    python address_index.py compact index_dir
+"""
+
+import argparse
+import heapq
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from bisect import bisect_left
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Set
+
+import base58check
+import bech32
+
+PROGRAM_SIZE = 20
+
+PROGRAMS_FILE = "programs.bin"
+DELTA_FILE = "delta.bin"
+BLOOM_FILE = "bloom.bin"
+META_FILE = "meta.json"
+
+# programs sorted in memory at once while building the index
+RUN_SIZE = 1_000_000
+DEFAULT_FALSE_POSITIVE_RATE = 0.001
+# filter capacity per indexed program, appends fit in until the filter is rebuilt
+BLOOM_HEADROOM = 2
+# appended programs held in memory in the delta before the append command compacts the index
+DELTA_COMPACT_SIZE = 1_000_000
+# addresses checked per contains_many call by the query command
+QUERY_CHUNK_SIZE = 100_000
+# base58check version bytes of mainnet and testnet P2PKH addresses, P2SH hashes a script instead
+P2PKH_VERSIONS = (0x00, 0x6F)
+
+
+def program_from_address(address: str) -> Optional[bytes]:
+    """hash160 program of a P2WPKH or P2PKH address, None for other addresses"""
+    address = address.strip()
+    if address[:3].lower() in ("bc1", "tb1"):
+        witver, witprog, error = bech32.validate(address[:2].lower(), address)
+        if error or witver != 0 or len(witprog) != PROGRAM_SIZE:
+            return None
+        return bytes(witprog)
+    try:
+        payload = base58check.decode_check(address)
+    except ValueError:
+        return None
+    if len(payload) != PROGRAM_SIZE + 1 or payload[0] not in P2PKH_VERSIONS:
+        return None
+    return payload[1:]
+
+
+def addresses_from_file(path: str, file_format: str) -> Iterator[str]:
+    """Addresses of a create_key_pairs.py output file or a plain file with one address per line"""
+    if file_format == "bin":
+        with open(path, "rb") as input_file:
+            while header := input_file.read(33):
+                (length,) = struct.unpack(">B", header[32:])
+                yield input_file.read(length).decode()
+        return
+
+    with open(path) as input_file:
+        if file_format == "csv":
+            next(input_file, None)
+        for line in input_file:
+            if file_format == "csv":
+                yield line.rstrip("\n").rsplit(",", 1)[-1]
+            elif file_format == "jsonl":
+                yield json.loads(line)["address"]
+            else:
+                yield line.strip()
+
+
+def programs_from_file(path: str, file_format: str) -> Iterator[bytes]:
+    for address in addresses_from_file(path, file_format):
+        program = program_from_address(address)
+        if program is not None:
+            yield program
+
+
+class BloomFilter:
+    """
+    Bloom filter over hash160 programs. The programs are uniformly distributed already,
+    so bit positions are taken from the program bytes with double hashing instead of rehashing.
+    """
+
+    def __init__(self, bits: bytearray, size: int, hashes: int):
+        self.bits = bits
+        self.size = size
+        self.hashes = hashes
+
+    @classmethod
+    def create(cls, capacity: int, false_positive_rate: float) -> "BloomFilter":
+        capacity = max(capacity, 1)
+        size = max(
+            8,
+            int(-capacity * math.log(false_positive_rate) / (math.log(2) ** 2)),
+        )
+        hashes = max(1, round(size / capacity * math.log(2)))
+        return cls(bytearray((size + 7) // 8), size, hashes)
+
+    def _positions(self, program: bytes) -> Iterator[int]:
+        first = int.from_bytes(program[:8], "little")
+        second = int.from_bytes(program[8:16], "little") | 1
+        size = self.size
+        for i in range(self.hashes):
+            yield (first + i * second) % size
+
+    def add(self, program: bytes) -> None:
+        bits = self.bits
+        for position in self._positions(program):
+            bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, program: bytes) -> bool:
+        bits = self.bits
+        for position in self._positions(program):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+
+class _Records:
+    """Fixed size records of a memory-mapped file as a sequence for bisect"""
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.length = len(buffer) // PROGRAM_SIZE
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __getitem__(self, index: int) -> bytes:
+        if not 0 <= index < self.length:
+            raise IndexError(index)
+        offset = index * PROGRAM_SIZE
+        return self.buffer[offset : offset + PROGRAM_SIZE]
+
+
+def _chunks(programs: Iterable[bytes], size: int) -> Iterator[List[bytes]]:
+    iterator = iter(programs)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _read_run(path: str) -> Iterator[bytes]:
+    with open(path, "rb") as run_file:
+        while record := run_file.read(PROGRAM_SIZE):
+            yield record
+
+
+class AddressIndex:
+    """
+    Exact membership index with a Bloom filter front end.
+    The index is a directory with the sorted programs, appended programs, the filter and metadata.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, META_FILE)) as meta_file:
+            self.meta = json.load(meta_file)
+        with open(os.path.join(path, BLOOM_FILE), "rb") as bloom_file:
+            self.bloom = BloomFilter(
+                bytearray(bloom_file.read()),
+                self.meta["bloomSize"],
+                self.meta["hashes"],
+            )
+
+        self.programs_file = open(os.path.join(path, PROGRAMS_FILE), "rb")
+        self.mmap = (
+            mmap.mmap(self.programs_file.fileno(), 0, access=mmap.ACCESS_READ)
+            if self.meta["count"]
+            else b""
+        )
+        self.records = _Records(self.mmap)
+
+        self.delta: Set[bytes] = set(_read_run(os.path.join(path, DELTA_FILE)))
+
+    def __enter__(self) -> "AddressIndex":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if isinstance(self.mmap, mmap.mmap):
+            self.mmap.close()
+        self.programs_file.close()
+
+    def __len__(self) -> int:
+        return self.meta["count"] + len(self.delta)
+
+    @staticmethod
+    def _write_meta(path: str, meta: dict) -> None:
+        with open(os.path.join(path, META_FILE), "w") as meta_file:
+            json.dump(meta, meta_file)
+
+    @classmethod
+    def _write(
+        cls,
+        path: str,
+        programs: Iterable[bytes],
+        capacity: int,
+        false_positive_rate: float,
+    ) -> None:
+        """Write the sorted programs without duplicates, their filter and metadata"""
+        bloom = BloomFilter.create(capacity, false_positive_rate)
+        fd, tmp_path = tempfile.mkstemp(dir=path, suffix=".tmp")
+        written = 0
+        previous = None
+        with os.fdopen(fd, "wb", buffering=1 << 20) as out:
+            for program in programs:
+                if program == previous:
+                    continue
+                out.write(program)
+                bloom.add(program)
+                previous = program
+                written += 1
+        os.replace(tmp_path, os.path.join(path, PROGRAMS_FILE))
+
+        with open(os.path.join(path, BLOOM_FILE), "wb") as bloom_file:
+            bloom_file.write(bloom.bits)
+        open(os.path.join(path, DELTA_FILE), "wb").close()
+        cls._write_meta(
+            path,
+            {
+                "count": written,
+                "bloomSize": bloom.size,
+                "hashes": bloom.hashes,
+                "bloomCapacity": max(capacity, 1),
+                "falsePositiveRate": false_positive_rate,
+            },
+        )
+
+    @classmethod
+    def build(
+        cls,
+        path: str,
+        programs: Iterable[bytes],
+        capacity: Optional[int] = None,
+        false_positive_rate: float = DEFAULT_FALSE_POSITIVE_RATE,
+        run_size: int = RUN_SIZE,
+    ) -> "AddressIndex":
+        """
+        Build the index from programs with an external merge sort, so memory is bounded by run_size.
+        :param capacity: expected number of programs including future appends, sizes the filter,
+            BLOOM_HEADROOM times the number of programs by default
+        """
+        os.makedirs(path, exist_ok=True)
+        runs: List[str] = []
+        try:
+            for chunk in _chunks(programs, run_size):
+                chunk.sort()
+                fd, run_path = tempfile.mkstemp(dir=path, suffix=".run")
+                with os.fdopen(fd, "wb", buffering=1 << 20) as run_file:
+                    run_file.writelines(chunk)
+                runs.append(run_path)
+
+            count = sum(os.path.getsize(run) for run in runs) // PROGRAM_SIZE
+            cls._write(
+                path,
+                heapq.merge(*(_read_run(run) for run in runs)),
+                capacity if capacity and capacity >= count else count * BLOOM_HEADROOM,
+                false_positive_rate,
+            )
+        finally:
+            for run in runs:
+                os.remove(run)
+        return cls(path)
+
+    def append(self, programs: Iterable[bytes]) -> int:
+        """
+        Add programs to the unsorted delta, they are merged into the sorted array by compact().
+        The filter is rebuilt when the index outgrows its capacity.
+        :return: number of new programs
+        """
+        added = 0
+        with open(os.path.join(self.path, DELTA_FILE), "ab") as delta_file:
+            for program in programs:
+                if program in self:
+                    continue
+                delta_file.write(program)
+                self.delta.add(program)
+                self.bloom.add(program)
+                added += 1
+        if len(self) > self.bloom_capacity:
+            self._rebuild_bloom()
+        with open(os.path.join(self.path, BLOOM_FILE), "wb") as bloom_file:
+            bloom_file.write(self.bloom.bits)
+        self._write_meta(self.path, self.meta)
+        return added
+
+    @property
+    def bloom_capacity(self) -> int:
+        # indexes built before bloomCapacity was stored were sized for the programs they had
+        return self.meta.get("bloomCapacity", self.meta["count"])
+
+    def _rebuild_bloom(self) -> None:
+        """Size the filter with headroom for the current programs, so it stays at its false positive rate"""
+        capacity = len(self) * BLOOM_HEADROOM
+        bloom = BloomFilter.create(capacity, self.meta["falsePositiveRate"])
+        for program in self.records:
+            bloom.add(program)
+        for program in self.delta:
+            bloom.add(program)
+        self.bloom = bloom
+        self.meta.update(
+            bloomSize=bloom.size, hashes=bloom.hashes, bloomCapacity=capacity
+        )
+
+    def compact(self) -> "AddressIndex":
+        """
+        Merge the delta into the sorted array and resize the filter for the new size.
+        The index is closed, use the returned one.
+        """
+        self._write(
+            self.path,
+            heapq.merge(iter(self.records), sorted(self.delta)),
+            max(self.bloom_capacity, len(self) * BLOOM_HEADROOM),
+            self.meta["falsePositiveRate"],
+        )
+        self.close()
+        return AddressIndex(self.path)
+
+    def _contains_sorted(self, program: bytes) -> bool:
+        index = bisect_left(self.records, program)
+        return index < len(self.records) and self.records[index] == program
+
+    def __contains__(self, program: bytes) -> bool:
+        if program not in self.bloom:
+            return False
+        return program in self.delta or self._contains_sorted(program)
+
+    def contains_many(self, programs: List[bytes]) -> List[bool]:
+        """
+        Batch membership query. Candidates passing the filter are looked up in sorted order,
+        every search starts where the previous one ended.
+        """
+        result = [False] * len(programs)
+        candidates = []
+        for position, program in enumerate(programs):
+            if program not in self.bloom:
+                continue
+            if program in self.delta:
+                result[position] = True
+            else:
+                candidates.append((program, position))
+
+        records, lower = self.records, 0
+        for program, position in sorted(candidates):
+            lower = bisect_left(records, program, lower)
+            result[position] = lower < len(records) and records[lower] == program
+        return result
+
+
+def parse_args(args=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Address membership index")
+    parser.add_argument("command", choices=("build", "append", "query", "compact"))
+    parser.add_argument("index", help="Index directory")
+    parser.add_argument("input", nargs="?", help="Addresses file, not used by compact")
+    parser.add_argument(
+        "--format",
+        "-f",
+        choices=("csv", "jsonl", "bin", "lines"),
+        default="lines",
+        help="Input format, create_key_pairs.py output or one address per line",
+    )
+    parser.add_argument(
+        "--capacity", type=int, help="Expected number of addresses, sizes the filter"
+    )
+    parsed = parser.parse_args(args)
+    if parsed.command != "compact" and not parsed.input:
+        parser.error(f"{parsed.command} needs an addresses file")
+    return parsed
+
+
+def main(args=None) -> None:
+    parsed = parse_args(args)
+    if parsed.command == "compact":
+        with AddressIndex(parsed.index) as index:
+            merged = len(index.delta)
+            index.compact().close()
+        print(f"Merged {merged} appended addresses", file=sys.stderr)
+        return
+
+    programs = programs_from_file(parsed.input, parsed.format)
+    if parsed.command == "build":
+        with AddressIndex.build(parsed.index, programs, parsed.capacity) as index:
+            print(f"Indexed {len(index)} addresses", file=sys.stderr)
+    elif parsed.command == "append":
+        with AddressIndex(parsed.index) as index:
+            added = index.append(programs)
+            print(f"Appended {added} addresses", file=sys.stderr)
+            if len(index.delta) > DELTA_COMPACT_SIZE:
+                index.compact().close()
+                print("Compacted the index", file=sys.stderr)
+    else:
+        with AddressIndex(parsed.index) as index:
+            addresses = addresses_from_file(parsed.input, parsed.format)
+            for chunk in _chunks(addresses, QUERY_CHUNK_SIZE):
+                found = index.contains_many(
+                    [program_from_address(address) or b"" for address in chunk]
+                )
+                for address, is_member in zip(chunk, found):
+                    print(f"{address},{int(is_member)}")
+
+
+if __name__ == "__main__":
+    main()
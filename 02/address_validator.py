@@ -0,0 +1,168 @@
+"""
+Bulk validator of bitcoin addresses.
+Every address is classified as p2wpkh, p2wsh, p2pkh or invalid with the reason.
+Usage: python address_validator.py addresses.txt --output results.csv --workers 8
+"""
+
+import argparse
+import csv
+import os
+import sys
+import time
+from collections import deque
+from functools import partial
+from itertools import islice
+from multiprocessing import Pool
+from typing import Deque, Iterable, Iterator, List, Tuple
+
+import base58check
+import bech32
+
+P2WPKH = "p2wpkh"
+P2WSH = "p2wsh"
+P2PKH = "p2pkh"
+INVALID = "invalid"
+
+# network name: (bech32 human readable part, P2PKH version byte)
+NETWORKS = {"mainnet": ("bc", 0x00), "testnet": ("tb", 0x6F)}
+
+# addresses classified by a worker per task
+CHUNK_SIZE = 10000
+# output buffer size in bytes
+BUFFER_SIZE = 1 << 20
+
+Result = Tuple[str, str, str]
+
+
+def classify(address: str, network: str = "mainnet") -> Tuple[str, str]:
+    """
+    Classify a single address without raising
+    :return: address type, reason why the address is invalid or empty string
+    """
+    hrp, p2pkh_version = NETWORKS[network]
+    if not address:
+        return INVALID, "Empty address"
+
+    if address[: len(hrp) + 1].lower() == hrp + "1":
+        witver, witprog, error = bech32.validate(hrp, address)
+        if error:
+            return INVALID, error
+        if witver != 0:
+            return INVALID, f"Unsupported witness version {witver}"
+        return (P2WPKH if len(witprog) == 20 else P2WSH), ""
+
+    try:
+        payload = base58check.decode_check(address)
+    except ValueError as e:
+        return INVALID, str(e) or "Invalid base58 string"
+    if len(payload) != 21:
+        return INVALID, "Invalid base58 payload length"
+    if payload[0] != p2pkh_version:
+        return INVALID, f"Unsupported version byte {payload[0]}"
+    return P2PKH, ""
+
+
+def classify_chunk(addresses: List[str], network: str = "mainnet") -> List[Result]:
+    results = []
+    for address in addresses:
+        address = address.strip()
+        results.append((address, *classify(address, network)))
+    return results
+
+
+def chunked(items: Iterable[str], size: int) -> Iterator[List[str]]:
+    iterator = iter(items)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def validate_addresses(
+    addresses: Iterable[str],
+    workers: int = 1,
+    network: str = "mainnet",
+    chunk_size: int = CHUNK_SIZE,
+) -> Iterator[Result]:
+    """
+    Classify addresses in parallel chunks, results are yielded in input order.
+    Only a bounded number of chunks is in flight, so memory does not depend on the input size.
+    """
+    classify_network_chunk = partial(classify_chunk, network=network)
+    if workers == 1:
+        for chunk in chunked(addresses, chunk_size):
+            yield from classify_network_chunk(chunk)
+        return
+
+    with Pool(workers) as pool:
+        pending: Deque = deque()
+        for chunk in chunked(addresses, chunk_size):
+            pending.append(pool.apply_async(classify_network_chunk, (chunk,)))
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().get()
+        while pending:
+            yield from pending.popleft().get()
+
+
+def validate_file(
+    input_path: str,
+    output_path: str,
+    workers: int = 1,
+    network: str = "mainnet",
+    chunk_size: int = CHUNK_SIZE,
+) -> int:
+    """
+    Stream addresses from the input file, one per line, and write address, type, reason CSV rows
+    :return: number of validated addresses
+    """
+    count = 0
+    with open(input_path, buffering=BUFFER_SIZE) as input_file, open(
+        output_path, "w", buffering=BUFFER_SIZE
+    ) as output_file:
+        writer = csv.writer(output_file)
+        writer.writerow(("address", "type", "reason"))
+        for result in validate_addresses(input_file, workers, network, chunk_size):
+            writer.writerow(result)
+            count += 1
+    return count
+
+
+def parse_args(args=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Validate bitcoin addresses")
+    parser.add_argument("input", help="File with one address per line")
+    parser.add_argument("--output", "-o", required=True, help="Output CSV file")
+    parser.add_argument(
+        "--workers",
+        "-w",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of worker processes. By default number of CPUs",
+    )
+    parser.add_argument(
+        "--network", "-n", choices=NETWORKS, default="mainnet", help="Bitcoin network"
+    )
+    parser.add_argument(
+        "--chunk-size", type=int, default=CHUNK_SIZE, help="Addresses per task"
+    )
+    parsed = parser.parse_args(args)
+    if parsed.workers < 1:
+        parser.error("--workers should be positive")
+    if parsed.chunk_size < 1:
+        parser.error("--chunk-size should be positive")
+    return parsed
+
+
+def main(args=None) -> None:
+    parsed = parse_args(args)
+    start = time.perf_counter()
+    count = validate_file(
+        parsed.input, parsed.output, parsed.workers, parsed.network, parsed.chunk_size
+    )
+    elapsed = time.perf_counter() - start
+    print(
+        f"Validated {count} addresses in {elapsed:.2f}s "
+        f"({count / elapsed:.0f} addresses/s, {parsed.workers} workers)",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Base58 and Base58Check encoding. https://en.bitcoin.it/wiki/Base58Check_encoding
+Big integers are converted in chunks of 10 base58 digits, so most of the work is done
+with machine sized integers, and two digits are looked up at once while encoding.
+"""
+
+import hashlib
+from typing import Iterable, List
+
+ALPHABET = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+
+# base58 digits converted per big integer operation, 58^10 < 2^63
+CHUNK_DIGITS = 10
+CHUNK_BASE = 58**CHUNK_DIGITS
+# all two digit strings, PAIRS[i] is the base58 representation of i < 58^2
+PAIR_BASE = 58**2
+PAIRS = [first + second for first in ALPHABET for second in ALPHABET]
+# value of a base58 character, -1 for characters outside of the alphabet
+INDEXES = [ALPHABET.find(chr(code)) for code in range(128)]
+
+CHECKSUM_SIZE = 4
+
+
+def checksum(payload: bytes) -> bytes:
+    """First 4 bytes of double SHA-256 of the payload"""
+    return hashlib.sha256(hashlib.sha256(payload).digest()).digest()[:CHECKSUM_SIZE]
+
+
+def encode(data: bytes) -> str:
+    """Base58 string of the data, every leading zero byte is encoded as 1"""
+    stripped = data.lstrip(b"\x00")
+    zeros = len(data) - len(stripped)
+    number = int.from_bytes(stripped, "big")
+
+    chunks = []
+    while number:
+        number, chunk = divmod(number, CHUNK_BASE)
+        chunks.append(chunk)
+
+    pairs, pair_base = PAIRS, PAIR_BASE
+    digits = []
+    for chunk in reversed(chunks):
+        chunk, fifth = divmod(chunk, pair_base)
+        chunk, fourth = divmod(chunk, pair_base)
+        chunk, third = divmod(chunk, pair_base)
+        first, second = divmod(chunk, pair_base)
+        digits += (
+            pairs[first],
+            pairs[second],
+            pairs[third],
+            pairs[fourth],
+            pairs[fifth],
+        )
+    # the most significant chunk is padded with zero digits
+    return "1" * zeros + "".join(digits).lstrip("1")
+
+
+def decode(string: str) -> bytes:
+    """Bytes of a base58 string, raises ValueError for characters outside of the alphabet"""
+    stripped = string.lstrip("1")
+    zeros = len(string) - len(stripped)
+
+    indexes = INDEXES
+    number = 0
+    for start in range(0, len(stripped), CHUNK_DIGITS):
+        chunk = stripped[start : start + CHUNK_DIGITS]
+        value = 0
+        for character in chunk:
+            code = ord(character)
+            digit = indexes[code] if code < 128 else -1
+            if digit < 0:
+                raise ValueError(f"Invalid base58 character {character!r}")
+            value = value * 58 + digit
+        number = number * 58 ** len(chunk) + value
+
+    return b"\x00" * zeros + number.to_bytes((number.bit_length() + 7) // 8, "big")
+
+
+def encode_check(payload: bytes) -> str:
+    return encode(payload + checksum(payload))
+
+
+def decode_check(string: str) -> bytes:
+    """Payload of a Base58Check string without the checksum"""
+    data = decode(string)
+    if len(data) < CHECKSUM_SIZE:
+        raise ValueError("Base58Check string is too short")
+    payload, check = data[:-CHECKSUM_SIZE], data[-CHECKSUM_SIZE:]
+    if checksum(payload) != check:
+        raise ValueError("Invalid checksum")
+    return payload
+
+
+def encode_check_batch(payloads: Iterable[bytes]) -> List[str]:
+    """
+    Base58Check strings of many payloads, like the 21 bytes version and hash160 of P2PKH
+    addresses, which give 25 bytes with the checksum
+    """
+    sha256 = hashlib.sha256
+    return [
+        encode(payload + sha256(sha256(payload).digest()).digest()[:CHECKSUM_SIZE])
+        for payload in payloads
+    ]
@@ -1,6 +1,7 @@
 """Reference implementation for Bech32 and segwit addresses - tweaked to provide descriptive errors"""
 
-from typing import List, Tuple
+from functools import lru_cache
+from typing import List, Optional, Tuple, Union
 
 
 class Bech32DecodeError(Exception):
@@ -11,10 +12,27 @@ Bytes = List[int]
 
 CHARSET = "qpzry9x8gf2tvdw0s3jn54khce6mua7l"
 
+GENERATOR = [0x3B6A57B2, 0x26508E6D, 0x1EA119FA, 0x3D4233DD, 0x2A1462B3]
+
+
+def _polymod_table() -> List[int]:
+    """Precompute the generator xor for every possible value of the top 5 bits of the checksum."""
+    table = []
+    for top in range(32):
+        value = 0
+        for i in range(5):
+            if (top >> i) & 1:
+                value ^= GENERATOR[i]
+        table.append(value)
+    return table
+
+
+POLYMOD_TABLE = _polymod_table()
+
 
 def bech32_polymod(values: Bytes) -> int:
     """Internal function that computes the Bech32 checksum."""
-    generator = [0x3B6A57B2, 0x26508E6D, 0x1EA119FA, 0x3D4233DD, 0x2A1462B3]
+    generator = GENERATOR
     chk = 1
     for value in values:
         top = chk >> 25
@@ -24,60 +42,91 @@ def bech32_polymod(values: Bytes) -> int:
     return chk
 
 
+def bech32_polymod_update(chk: int, values: Bytes) -> int:
+    """Continue the Bech32 checksum computation from state chk, one table lookup per value."""
+    table = POLYMOD_TABLE
+    for value in values:
+        chk = ((chk & 0x1FFFFFF) << 5 ^ value) ^ table[chk >> 25]
+    return chk
+
+
 def bech32_hrp_expand(hrp: str) -> Bytes:
     """Expand the HRP into values for checksum computation."""
     return [ord(x) >> 5 for x in hrp] + [0] + [ord(x) & 31 for x in hrp]
 
 
+@lru_cache(maxsize=32)
+def bech32_hrp_state(hrp: str) -> int:
+    """Checksum state after the expanded HRP, computed once per HRP."""
+    return bech32_polymod_update(1, bech32_hrp_expand(hrp))
+
+
 def bech32_verify_checksum(hrp: str, data: Bytes) -> bool:
     """Verify a checksum given HRP and converted data characters."""
-    return bech32_polymod(bech32_hrp_expand(hrp) + data) == 1
+    return bech32_polymod_update(bech32_hrp_state(hrp), data) == 1
 
 
 def bech32_create_checksum(hrp: str, data: Bytes) -> Bytes:
     """Compute the checksum values given HRP and data."""
-    values = bech32_hrp_expand(hrp) + data
-    polymod = bech32_polymod(values + [0, 0, 0, 0, 0, 0]) ^ 1
+    chk = bech32_polymod_update(bech32_hrp_state(hrp), data)
+    # six zero values appended to the data
+    table = POLYMOD_TABLE
+    for _ in range(6):
+        chk = ((chk & 0x1FFFFFF) << 5) ^ table[chk >> 25]
+    polymod = chk ^ 1
     return [(polymod >> 5 * (5 - i)) & 31 for i in range(6)]
 
 
 def bech32_encode(hrp: str, data: Bytes) -> str:
     """Compute a Bech32 string given HRP and data values."""
-    combined = data + bech32_create_checksum(hrp, data)
-    return hrp + "1" + "".join([CHARSET[d] for d in combined])
+    return (
+        hrp
+        + "1"
+        + "".join([CHARSET[d] for d in data])
+        + "".join([CHARSET[d] for d in bech32_create_checksum(hrp, data)])
+    )
 
 
-def bech32_decode(bech: str) -> Tuple[str, Bytes]:
-    """Validate a Bech32 string, and determine HRP and data."""
+def bech32_validate(bech: str) -> Tuple[str, Bytes, Optional[str]]:
+    """Validate a Bech32 string without raising, return HRP, data and error or None."""
     if any(ord(x) < 33 or ord(x) > 126 for x in bech):
-        raise Bech32DecodeError("Character outside the US-ASCII [33-126] range")
+        return "", [], "Character outside the US-ASCII [33-126] range"
 
     if (bech.lower() != bech) and (bech.upper() != bech):
-        raise Bech32DecodeError("Mixed upper and lower case")
+        return "", [], "Mixed upper and lower case"
 
     bech = bech.lower()
     pos = bech.rfind("1")
 
     if pos == 0:
-        raise Bech32DecodeError("Empty human readable part")
+        return "", [], "Empty human readable part"
     elif pos == -1:
-        raise Bech32DecodeError("No seperator character")
+        return "", [], "No seperator character"
     elif pos + 7 > len(bech):
-        raise Bech32DecodeError("Checksum too short")
+        return "", [], "Checksum too short"
 
     if len(bech) > 90:
-        raise Bech32DecodeError("Max string length exceeded")
+        return "", [], "Max string length exceeded"
 
     if not all(x in CHARSET for x in bech[pos + 1 :]):
-        raise Bech32DecodeError("Character not in charset")
+        return "", [], "Character not in charset"
 
     hrp = bech[:pos]
     data = [CHARSET.find(x) for x in bech[pos + 1 :]]
 
     if not bech32_verify_checksum(hrp, data):
-        raise Bech32DecodeError("Invalid checksum")
+        return "", [], "Invalid checksum"
+
+    del data[-6:]
+    return hrp, data, None
+
 
-    return hrp, data[:-6]
+def bech32_decode(bech: str) -> Tuple[str, Bytes]:
+    """Validate a Bech32 string, and determine HRP and data."""
+    hrp, data, error = bech32_validate(bech)
+    if error:
+        raise Bech32DecodeError(error)
+    return hrp, data
 
 
 def convertbits(data: Bytes, frombits: int, tobits: int, pad=True) -> Bytes:
@@ -103,27 +152,74 @@ def convertbits(data: Bytes, frombits: int, tobits: int, pad=True) -> Bytes:
     return ret
 
 
-def decode(hrp: str, addr: str) -> Tuple[int, Bytes]:
-    """Decode a segwit address."""
-    hrpgot, data = bech32_decode(addr)
-    if hrpgot != hrp:
-        raise Bech32DecodeError("Human readable part mismatch")
+# 5-bit values as base 32 digits for int(), bytes above 31 become an invalid digit
+BASE32_DIGITS = bytes(b"0123456789abcdefghijklmnopqrstuv".ljust(256, b"!"))
+
+
+def convertbits_8to5(data: Union[bytes, Bytes]) -> Bytes:
+    """convertbits(data, 8, 5) with padding, regrouped through one big integer."""
+    try:
+        data = bytes(data)
+    except (TypeError, ValueError):
+        raise Bech32DecodeError
+    bits = len(data) * 8
+    groups = (bits + 4) // 5
+    number = int.from_bytes(data, "big") << (groups * 5 - bits)
+    return [(number >> shift) & 31 for shift in range(groups * 5 - 5, -5, -5)]
+
+
+def convertbits_5to8(data: Union[bytes, Bytes]) -> Bytes:
+    """convertbits(data, 5, 8, False), the 5-bit values are parsed as one base 32 number."""
+    try:
+        digits = bytes(data).translate(BASE32_DIGITS)
+        number = int(digits, 32) if digits else 0
+    except (TypeError, ValueError):
+        raise Bech32DecodeError
+    bits = len(digits) * 5
+    padding = bits % 8
+    if padding >= 5 or number & ((1 << padding) - 1):
+        raise Bech32DecodeError
+    return list((number >> padding).to_bytes(bits // 8, "big"))
 
-    decoded = convertbits(data[1:], 5, 8, False)
-    if decoded is None or len(decoded) < 2:
-        raise Bech32DecodeError("Witness programm too short")
+
+def validate(hrp: str, addr: str) -> Tuple[int, Bytes, Optional[str]]:
+    """Validate a segwit address without raising, return witness version, program and error or None."""
+    hrpgot, data, error = bech32_validate(addr)
+    if error:
+        return 0, [], error
+    if hrpgot != hrp:
+        return 0, [], "Human readable part mismatch"
+    if not data:
+        return 0, [], "Witness programm too short"
+
+    try:
+        decoded = convertbits_5to8(data[1:])
+    except Bech32DecodeError:
+        return 0, [], "Invalid witness programm padding"
+    if len(decoded) < 2:
+        return 0, [], "Witness programm too short"
     elif len(decoded) > 40:
-        raise Bech32DecodeError("Witness programm too long")
+        return 0, [], "Witness programm too long"
 
     if data[0] > 16:
-        raise Bech32DecodeError("Invalid witness version")
+        return 0, [], "Invalid witness version"
 
     if data[0] == 0 and (len(decoded) not in (20, 32)):
-        raise Bech32DecodeError("Could not interpret witness programm")
+        return 0, [], "Could not interpret witness programm"
 
-    return data[0], decoded
+    return data[0], decoded, None
+
+
+def decode(hrp: str, addr: str) -> Tuple[int, Bytes]:
+    """Decode a segwit address."""
+    witver, decoded, error = validate(hrp, addr)
+    if error:
+        raise Bech32DecodeError(error)
+    return witver, decoded
 
 
 def encode(hrp: str, witver: int, witprog: Bytes) -> str:
     """Encode a segwit address."""
-    return bech32_encode(hrp, [witver] + convertbits(witprog, 8, 5))
+    data = convertbits_8to5(witprog)
+    data.insert(0, witver)
+    return bech32_encode(hrp, data)
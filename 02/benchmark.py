@@ -0,0 +1,201 @@
+"""
+Throughput benchmark of the key generation stages, on their own and end to end.
+Every run is appended to the results file as one JSON line, so runs can be compared over time.
+Usage:
+    python benchmark.py --count 10000 --batch-sizes 1,100,1000 --workers 1,2,4 \
+        --output results.jsonl --profile keygen.prof
+"""
+
+import argparse
+import cProfile
+import json
+import os
+import platform
+import secrets
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Sequence
+
+import base58check
+import bech32
+import secp256k1_batch
+from bitcoin_key_gen import (get_addresses_batch, get_bitcoin_address,
+                             get_bitcoin_address_P2PKH, hash160, private_key,
+                             pub_key)
+from create_key_pairs import generate
+
+Result = Dict[str, object]
+
+
+def time_calls(name: str, function: Callable, inputs: Sequence, **extra) -> Result:
+    """Call the function with every input and measure the throughput"""
+    start = time.perf_counter()
+    for item in inputs:
+        function(item)
+    elapsed = time.perf_counter() - start
+    return {
+        "name": name,
+        "count": len(inputs),
+        "seconds": elapsed,
+        "per_second": len(inputs) / elapsed if elapsed else 0.0,
+        **extra,
+    }
+
+
+def stage_results(count: int) -> List[Result]:
+    """Every stage on its own, with the inputs prepared by the previous stages beforehand"""
+    priv_keys = [private_key() for _ in range(count)]
+    public_keys = [b"\x04" + pub_key(priv_key) for priv_key in priv_keys]
+    hashes = [hash160(public_key) for public_key in public_keys]
+    five_bit_data = [[0] + bech32.convertbits(program, 8, 5) for program in hashes]
+    payloads = [b"\x00" + program for program in hashes]
+
+    return [
+        time_calls("private_key", lambda _: private_key(), range(count)),
+        time_calls("pub_key", pub_key, priv_keys),
+        time_calls("hash160", hash160, public_keys),
+        time_calls("convertbits", lambda data: bech32.convertbits(data, 8, 5), hashes),
+        time_calls("convertbits_8to5", bech32.convertbits_8to5, hashes),
+        time_calls(
+            "bech32_encode",
+            lambda data: bech32.bech32_encode("bc", data),
+            five_bit_data,
+        ),
+        time_calls("base58check_encode", base58check.encode_check, payloads),
+    ]
+
+
+def end_to_end_results(count: int) -> List[Result]:
+    priv_keys = [private_key() for _ in range(count)]
+    return [
+        time_calls("p2wpkh", get_bitcoin_address, priv_keys),
+        time_calls("p2pkh", get_bitcoin_address_P2PKH, priv_keys),
+    ]
+
+
+def batch_results(count: int, batch_sizes: Sequence[int]) -> List[Result]:
+    """get_addresses_batch, both address formats of every key, at several batch sizes"""
+    results = []
+    secret_exponents = [
+        secrets.randbelow(secp256k1_batch.N - 1) + 1 for _ in range(count)
+    ]
+    # the fixed-base table is built once per process, keep it out of the timings
+    secp256k1_batch.get_table()
+    for batch_size in batch_sizes:
+        batches = [
+            secret_exponents[start : start + batch_size]
+            for start in range(0, count, batch_size)
+        ]
+        result = time_calls(
+            "batch", get_addresses_batch, batches, batch_size=batch_size
+        )
+        result["count"] = count
+        result["per_second"] = count / result["seconds"]
+        results.append(result)
+    return results
+
+
+def worker_results(count: int, workers: Sequence[int]) -> List[Result]:
+    """create_key_pairs generation of count pairs with several numbers of worker processes"""
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "keys.bin")
+        for worker_count in workers:
+            elapsed = generate(count, worker_count, path, "bin")
+            results.append(
+                {
+                    "name": "create_key_pairs",
+                    "count": count,
+                    "seconds": elapsed,
+                    "per_second": count / elapsed,
+                    "workers": worker_count,
+                }
+            )
+    return results
+
+
+def run(count: int, batch_sizes: Sequence[int], workers: Sequence[int]) -> List[Result]:
+    return (
+        stage_results(count)
+        + end_to_end_results(count)
+        + batch_results(count, batch_sizes)
+        + worker_results(count, workers)
+    )
+
+
+def print_results(results: List[Result]) -> None:
+    for result in results:
+        details = ", ".join(
+            f"{key}={value}"
+            for key, value in result.items()
+            if key not in ("name", "count", "seconds", "per_second")
+        )
+        print(
+            f"{result['name']:<20} {result['per_second']:>12.0f}/s "
+            f"{result['seconds']:>8.3f}s {details}"
+        )
+
+
+def parse_sizes(value: str) -> List[int]:
+    sizes = [int(size) for size in value.split(",")]
+    if any(size < 1 for size in sizes):
+        raise argparse.ArgumentTypeError("sizes should be positive")
+    return sizes
+
+
+def parse_args(args=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark key generation stages")
+    parser.add_argument(
+        "--count", "-n", type=int, default=10000, help="Number of keys per measurement"
+    )
+    parser.add_argument(
+        "--batch-sizes",
+        type=parse_sizes,
+        default=[1, 100, 1000],
+        help="Comma separated batch sizes of get_addresses_batch",
+    )
+    parser.add_argument(
+        "--workers",
+        "-w",
+        type=parse_sizes,
+        default=[1, os.cpu_count() or 1],
+        help="Comma separated numbers of worker processes of create_key_pairs",
+    )
+    parser.add_argument("--output", "-o", help="JSON lines file the run is appended to")
+    parser.add_argument(
+        "--profile", help="Write a cProfile trace of the run to the file"
+    )
+    parsed = parser.parse_args(args)
+    if parsed.count < 1:
+        parser.error("--count should be positive")
+    return parsed
+
+
+def main(args=None) -> None:
+    parsed = parse_args(args)
+    profiler = cProfile.Profile() if parsed.profile else None
+    if profiler:
+        profiler.enable()
+    results = run(parsed.count, parsed.batch_sizes, parsed.workers)
+    if profiler:
+        profiler.disable()
+        profiler.dump_stats(parsed.profile)
+        print(f"Profile written to {parsed.profile}", file=sys.stderr)
+
+    print_results(results)
+    if parsed.output:
+        with open(parsed.output, "a") as output_file:
+            run_record = {
+                "timestamp": time.time(),
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "cpus": os.cpu_count(),
+                "count": parsed.count,
+                "results": results,
+            }
+            output_file.write(json.dumps(run_record) + "\n")
+
+
+if __name__ == "__main__":
+    main()
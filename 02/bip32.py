@@ -0,0 +1,329 @@
+"""
+BIP32 hierarchical deterministic keys. https://github.com/bitcoin/bips/blob/master/bip-0032.mediawiki
+Receive addresses can be derived from an xpub alone, so watch-only servers never hold private keys.
+Usage: python bip32.py xpub... --start 0 --count 1000000 --workers 8 --output addresses.txt
+"""
+
+import argparse
+import hashlib
+import hmac
+import os
+import sys
+import time
+from functools import lru_cache
+from multiprocessing import Pool
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+
+import base58check
+import bech32
+import secp256k1_batch
+from bitcoin_key_gen import compress, hash160, number_to_string
+from secp256k1_batch import N, P
+
+HARDENED = 0x80000000
+
+# version bytes of serialized keys: (private, public)
+MAINNET_VERSIONS = (bytes.fromhex("0488ade4"), bytes.fromhex("0488b21e"))
+TESTNET_VERSIONS = (bytes.fromhex("04358394"), bytes.fromhex("043587cf"))
+
+# addresses derived by a worker per task
+CHUNK_SIZE = 1000
+
+
+class ExtendedKey(NamedTuple):
+    chain_code: bytes
+    # affine (x, y) public point, set for private keys too
+    public_key: Tuple[int, int]
+    # None for public (watch-only) keys
+    private_key: Optional[int] = None
+    depth: int = 0
+    parent_fingerprint: bytes = b"\x00\x00\x00\x00"
+    child_number: int = 0
+    testnet: bool = False
+
+    @property
+    def is_private(self) -> bool:
+        return self.private_key is not None
+
+
+def decompress(data: bytes) -> Tuple[int, int]:
+    if len(data) != 33 or data[0] not in (2, 3):
+        raise ValueError("Invalid compressed public key")
+    x = int.from_bytes(data[1:], "big")
+    # p % 4 == 3, so the square root is a single exponentiation
+    y = pow((x * x * x + 7) % P, (P + 1) // 4, P)
+    if (y * y - x * x * x - 7) % P:
+        raise ValueError("Public key is not on the secp256k1 curve")
+    if y & 1 != data[0] & 1:
+        y = P - y
+    return x, y
+
+
+def fingerprint(node: ExtendedKey) -> bytes:
+    return hash160(compress(*node.public_key))[:4]
+
+
+def from_seed(seed: bytes, testnet: bool = False) -> ExtendedKey:
+    """Master key from a 16-64 bytes seed"""
+    if not 16 <= len(seed) <= 64:
+        raise ValueError(f"Seed should be 16-64 bytes, got {len(seed)}")
+    digest = hmac.new(b"Bitcoin seed", seed, hashlib.sha512).digest()
+    secret = int.from_bytes(digest[:32], "big")
+    if not 0 < secret < N:
+        raise ValueError("Invalid master key, use another seed")
+    return ExtendedKey(
+        chain_code=digest[32:],
+        public_key=secp256k1_batch.derive_public_points([secret])[0],
+        private_key=secret,
+        testnet=testnet,
+    )
+
+
+def neuter(node: ExtendedKey) -> ExtendedKey:
+    """Public (watch-only) version of the key"""
+    return node._replace(private_key=None)
+
+
+def _child_tweak(node: ExtendedKey, index: int) -> Tuple[int, bytes]:
+    if index & HARDENED:
+        if not node.is_private:
+            raise ValueError("Hardened child of a public key can not be derived")
+        data = b"\x00" + number_to_string(node.private_key)
+    else:
+        data = compress(*node.public_key)
+    digest = hmac.new(
+        node.chain_code, data + index.to_bytes(4, "big"), hashlib.sha512
+    ).digest()
+    tweak = int.from_bytes(digest[:32], "big")
+    if tweak >= N:
+        raise ValueError(f"Invalid child key {index}, use the next index")
+    return tweak, digest[32:]
+
+
+def _tweak_points(
+    tweaks: List[int], point: Tuple[int, int]
+) -> List[Optional[Tuple[int, int]]]:
+    """tweak * G + point for every tweak, with the fixed-base table and one inversion"""
+    table = secp256k1_batch.get_table()
+    return secp256k1_batch.batch_normalize(
+        [
+            secp256k1_batch.jacobian_add_affine(table.multiply(tweak), point)
+            for tweak in tweaks
+        ]
+    )
+
+
+def derive_child(node: ExtendedKey, index: int) -> ExtendedKey:
+    """
+    Child key number index, hardened if index >= HARDENED.
+    Children of public keys are cached, so the intermediate nodes of watch-only paths
+    sharing a prefix are derived once. Private keys are never cached, they live only
+    as long as the caller keeps the nodes.
+    """
+    if node.is_private:
+        return _derive_child(node, index)
+    return _derive_public_child(node, index)
+
+
+def _derive_child(node: ExtendedKey, index: int) -> ExtendedKey:
+    tweak, chain_code = _child_tweak(node, index)
+    if node.is_private:
+        secret = (tweak + node.private_key) % N
+        if not secret:
+            raise ValueError(f"Invalid child key {index}, use the next index")
+        public_key = secp256k1_batch.derive_public_points([secret])[0]
+    else:
+        secret = None
+        public_key = _tweak_points([tweak], node.public_key)[0]
+        if public_key is None:
+            raise ValueError(f"Invalid child key {index}, use the next index")
+    return ExtendedKey(
+        chain_code=chain_code,
+        public_key=public_key,
+        private_key=secret,
+        depth=node.depth + 1,
+        parent_fingerprint=fingerprint(node),
+        child_number=index,
+        testnet=node.testnet,
+    )
+
+
+_derive_public_child = lru_cache(maxsize=4096)(_derive_child)
+
+
+def derive_path(node: ExtendedKey, path: str) -> ExtendedKey:
+    """Derive a path like m/84'/0'/0'/0 or 0/5, relative to the node"""
+    for element in path.split("/"):
+        if element in ("m", "M", ""):
+            continue
+        if element[-1] in ("'", "h", "H"):
+            index = int(element[:-1]) | HARDENED
+        else:
+            index = int(element)
+        node = derive_child(node, index)
+    return node
+
+
+def serialize(node: ExtendedKey) -> str:
+    """xprv/xpub (tprv/tpub on testnet) string"""
+    private_version, public_version = (
+        TESTNET_VERSIONS if node.testnet else MAINNET_VERSIONS
+    )
+    if node.is_private:
+        version, key = private_version, b"\x00" + number_to_string(node.private_key)
+    else:
+        version, key = public_version, compress(*node.public_key)
+    payload = (
+        version
+        + bytes([node.depth])
+        + node.parent_fingerprint
+        + node.child_number.to_bytes(4, "big")
+        + node.chain_code
+        + key
+    )
+    return base58check.encode_check(payload)
+
+
+def parse(extended_key: str) -> ExtendedKey:
+    payload = base58check.decode_check(extended_key)
+    if len(payload) != 78:
+        raise ValueError("Invalid extended key length")
+    version, key = payload[:4], payload[45:]
+    testnet = version in TESTNET_VERSIONS
+    if version not in MAINNET_VERSIONS + TESTNET_VERSIONS:
+        raise ValueError("Unknown extended key version")
+    if version in (MAINNET_VERSIONS[0], TESTNET_VERSIONS[0]):
+        if key[0] != 0:
+            raise ValueError("Invalid private key prefix")
+        secret = int.from_bytes(key[1:], "big")
+        if not 0 < secret < N:
+            raise ValueError("Private key is out of the secp256k1 range")
+        public_key = secp256k1_batch.derive_public_points([secret])[0]
+    else:
+        secret = None
+        public_key = decompress(key)
+    return ExtendedKey(
+        chain_code=payload[13:45],
+        public_key=public_key,
+        private_key=secret,
+        depth=payload[4],
+        parent_fingerprint=payload[5:9],
+        child_number=int.from_bytes(payload[9:13], "big"),
+        testnet=testnet,
+    )
+
+
+def address(node: ExtendedKey) -> str:
+    """P2WPKH address of the key"""
+    hrp = "tb" if node.testnet else "bc"
+    return bech32.encode(hrp, 0x00, hash160(compress(*node.public_key)))
+
+
+def derive_range(node: ExtendedKey, start: int, stop: int) -> List[Tuple[int, str]]:
+    """
+    P2WPKH addresses of the non-hardened children start..stop-1 of the node.
+    All child public keys are computed together: tweak * G with the fixed-base table,
+    plus the parent key, and one inversion for the whole range.
+    Indexes without a valid child key (probability below 2^-127) are skipped as BIP32 requires.
+    """
+    if not 0 <= start <= stop <= HARDENED:
+        raise ValueError("Only non-hardened children can be derived in a range")
+    hrp = "tb" if node.testnet else "bc"
+    parent_key = compress(*node.public_key)
+
+    indexes, tweaks = [], []
+    for index in range(start, stop):
+        digest = hmac.new(
+            node.chain_code, parent_key + index.to_bytes(4, "big"), hashlib.sha512
+        ).digest()
+        tweak = int.from_bytes(digest[:32], "big")
+        if tweak < N:
+            indexes.append(index)
+            tweaks.append(tweak)
+
+    result = []
+    for index, point in zip(indexes, _tweak_points(tweaks, node.public_key)):
+        if point is not None:
+            result.append((index, bech32.encode(hrp, 0x00, hash160(compress(*point)))))
+    return result
+
+
+def _derive_chunk(args: Tuple[ExtendedKey, int, int]) -> List[Tuple[int, str]]:
+    return derive_range(*args)
+
+
+def derive_addresses(
+    node: ExtendedKey,
+    start: int,
+    stop: int,
+    workers: int = 1,
+    chunk_size: int = CHUNK_SIZE,
+) -> Iterator[Tuple[int, str]]:
+    """
+    Same as derive_range, split in chunks derived in parallel worker processes.
+    Yields (index, address) in index order, only the public part of the node is sent to workers.
+    """
+    public_node = neuter(node)
+    chunks = (
+        (public_node, chunk_start, min(chunk_start + chunk_size, stop))
+        for chunk_start in range(start, stop, chunk_size)
+    )
+    if workers == 1:
+        for chunk in chunks:
+            yield from _derive_chunk(chunk)
+        return
+
+    with Pool(workers) as pool:
+        for addresses in pool.imap(_derive_chunk, chunks):
+            yield from addresses
+
+
+def parse_args(args=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Derive receive addresses from an xpub"
+    )
+    parser.add_argument("extended_key", help="xpub/tpub (or xprv/tprv) of the account")
+    parser.add_argument(
+        "--path",
+        default="0",
+        help="Path of the chain relative to the key, 0 by default",
+    )
+    parser.add_argument("--start", type=int, default=0, help="First child index")
+    parser.add_argument(
+        "--count", "-n", type=int, default=100, help="Number of addresses"
+    )
+    parser.add_argument(
+        "--workers",
+        "-w",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of worker processes. By default number of CPUs",
+    )
+    parser.add_argument("--output", "-o", required=True, help="Output file")
+    parsed = parser.parse_args(args)
+    if parsed.count < 1 or parsed.start < 0:
+        parser.error("--count should be positive and --start not negative")
+    if parsed.workers < 1:
+        parser.error("--workers should be positive")
+    return parsed
+
+
+def main(args=None) -> None:
+    parsed = parse_args(args)
+    node = derive_path(parse(parsed.extended_key), parsed.path)
+    start = time.perf_counter()
+    with open(parsed.output, "w", buffering=1 << 20) as output_file:
+        for index, child_address in derive_addresses(
+            node, parsed.start, parsed.start + parsed.count, parsed.workers
+        ):
+            output_file.write(f"{index},{child_address}\n")
+    elapsed = time.perf_counter() - start
+    print(
+        f"Derived {parsed.count} addresses in {elapsed:.2f}s "
+        f"({parsed.count / elapsed:.0f} addresses/s, {parsed.workers} workers)",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
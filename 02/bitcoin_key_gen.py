@@ -1,9 +1,12 @@
 import binascii
 import hashlib
+from typing import Iterable, List, NamedTuple, Union
 
-import base58
+import base58check
 import bech32
+import secp256k1_batch
 from fastecdsa import curve, keys
+from fastecdsa.point import Point
 
 sha256 = lambda x: hashlib.sha256(x).digest()
 ripemd160 = lambda x: hashlib.new("ripemd160", x).digest()
@@ -24,47 +27,91 @@ def number_to_string(num):
     return string
 
 
+def secret_exponent(priv_key: Union[int, bytes, str]) -> int:
+    """Private key as integer, accepts integer, 32 bytes or hex string keys"""
+    if isinstance(priv_key, int):
+        return priv_key
+    if isinstance(priv_key, (bytes, bytearray)):
+        return int.from_bytes(priv_key, "big")
+    return int(priv_key, 16)
+
+
+def public_point(priv_key: Union[int, bytes, str]) -> Point:
+    return keys.get_public_key(secret_exponent(priv_key), curve.secp256k1)
+
+
+def compress(x: int, y: int) -> bytes:
+    # SEC1 compressed public key, add prefix b'\x03' if y is odd, b'\x02' if even
+    return (b"\x03" if y & 1 else b"\x02") + number_to_string(x)
+
+
 def pub_key(priv_key):
-    public_key = keys.get_public_key(int(priv_key, 16), curve.secp256k1)
+    public_key = public_point(priv_key)
     return number_to_string(public_key.x) + number_to_string(public_key.y)
 
 
-def get_bitcoin_address_P2PKH(priv_key):
+class KeyAddresses(NamedTuple):
+    private_key: int
+    # 65 bytes, 0x04 prefix, X and Y coordinates
+    public_key: bytes
+    # 33 bytes, 0x02/0x03 prefix and X coordinate
+    compressed_public_key: bytes
+    p2pkh_address: str
+    p2wpkh_address: str
+
+
+def _key_addresses(secret: int, x: int, y: int, hrp: str) -> KeyAddresses:
+    public_key = b"\x04" + number_to_string(x) + number_to_string(y)
+    compressed_key = compress(x, y)
+    # version byte 0x00 for main network, 0x6f for test network
+    version = b"\x00" if hrp == "bc" else b"\x6f"
+    return KeyAddresses(
+        private_key=secret,
+        public_key=public_key,
+        compressed_public_key=compressed_key,
+        p2pkh_address=base58check.encode_check(version + hash160(public_key)),
+        p2wpkh_address=bech32.encode(hrp, 0x00, hash160(compressed_key)),
+    )
+
+
+def get_addresses(priv_key: Union[int, bytes, str], hrp: str = "bc") -> KeyAddresses:
+    """
+    Derive the public key once and build all address formats from it
+    :param priv_key: private key as integer, 32 bytes or hex string
+    :param hrp: the human-readable part of the bech32 address, bc for mainnet and tb for testnet
+    :return: KeyAddresses
+    """
+    secret = secret_exponent(priv_key)
+    point = keys.get_public_key(secret, curve.secp256k1)
+    return _key_addresses(secret, point.x, point.y, hrp)
+
+
+def get_addresses_batch(
+    priv_keys: Iterable[Union[int, bytes, str]], hrp: str = "bc"
+) -> List[KeyAddresses]:
+    """
+    Same as get_addresses for a batch of keys, public keys are derived with the fixed-base
+    table of secp256k1_batch, which is several times faster than one scalar multiplication per key
+    """
+    secrets = [secret_exponent(priv_key) for priv_key in priv_keys]
+    points = secp256k1_batch.derive_public_points(secrets)
+    return [
+        _key_addresses(secret, x, y, hrp) for secret, (x, y) in zip(secrets, points)
+    ]
+
+
+def get_bitcoin_address_P2PKH(priv_key) -> str:
     """
     https://en.bitcoin.it/wiki/Technical_background_of_version_1_Bitcoin_addresses
+    Base58Check of version byte 0x00 and hash160 of the 65 bytes uncompressed public key,
+    same as the p2pkh_address of get_addresses
     """
-    # 0 - Having a private ECDSA key
-    verifying_key = pub_key(priv_key)
-    # 1 - Take the corresponding public key generated with it
-    # (33 bytes, 1 byte 0x02 (y-coord is even), and 32 bytes corresponding to X coordinate)
-    public_key = "\04" + verifying_key.hex()
-    # 2 - Perform SHA-256 hashing on the public key
-    hash_public_key = hashlib.sha256(public_key.encode())
-    # 3 - Perform RIPEMD-160 hashing on the result of SHA-256
-    ripemd160 = hashlib.new("ripemd160")
-    ripemd160.update(hash_public_key.digest())
-    # 4 - Add version byte in front of RIPEMD-160 hash (0x00 for Main Network)
-    rip_hash_public_key = "\00".encode() + ripemd160.digest()
-    # 5 - Perform SHA-256 hash on the extended RIPEMD-160 result
-    hash_rip_hash_public_key = hashlib.sha256(rip_hash_public_key).digest()
-    # 6 - Perform SHA-256 hash on the result of the previous SHA-256 hash
-    hash_hash_rip_hash_public_key = hashlib.sha256(hash_rip_hash_public_key).digest()
-    # 7 - Take the first 4 bytes of the second SHA-256 hash. This is the address checksum
-    four_symb = hash_hash_rip_hash_public_key[:4]
-    # 8 - Add the 4 checksum bytes from stage 7 at the end of extended RIPEMD-160 hash from stage 4.
-    # This is the 25-byte binary Bitcoin Address.
-    binary_addr = rip_hash_public_key + four_symb
-    # 9 - Convert the result from a byte string into a base58 string using Base58Check encoding.
-    # This is the most commonly used Bitcoin Address format
-    addr = base58.b58encode(binary_addr)
-    return addr
+    return get_addresses(priv_key).p2pkh_address
 
 
 def get_bitcoin_address(priv_key):  # get_bech32_address
-    public_key = keys.get_public_key(int(priv_key, 16), curve.secp256k1)
-    # compress public key, add prefix b'\x03' if odd, b'\x02' if even
-    start_bytes = b"\x03" if public_key.y & 1 else b"\x02"
-    compressed_key = start_bytes + number_to_string(public_key.x)
+    point = public_point(priv_key)
+    compressed_key = compress(point.x, point.y)
     # the witness version. This is 0 at the moment represented by the byte 0x00
     witver = 0x00
     # the witness program. https://github.com/bitcoin/bips/blob/master/bip-0141.mediawiki#witness-program
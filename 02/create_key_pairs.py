@@ -1,4 +1,28 @@
-from bitcoin_key_gen import get_bitcoin_address, private_key
+"""
+Batch generator of bitcoin key pairs.
+Usage: python create_key_pairs.py --count 1000000 --workers 8 --output keys.csv --format csv
+"""
+
+import argparse
+import json
+import os
+import secrets
+import struct
+import sys
+import time
+from multiprocessing import Pool
+from typing import BinaryIO, Iterator, List, TextIO, Tuple, Union
+
+import secp256k1_batch
+from bitcoin_key_gen import (get_addresses_batch, get_bitcoin_address,
+                             private_key)
+
+# key pairs generated by a worker per task
+CHUNK_SIZE = 1000
+# output buffer size in bytes
+BUFFER_SIZE = 1 << 20
+
+FORMATS = ("csv", "jsonl", "bin")
 
 
 def get_key_pairs():
@@ -11,6 +35,121 @@ def get_key_pairs():
     return priv_key, bitcoin_address
 
 
-for i in range(100):
-    priv_key, bitcoin_address = get_key_pairs()
-    print(bitcoin_address)
+def generate_chunk(size: int) -> List[Tuple[str, str]]:
+    """
+    Create a chunk of key pairs in a worker process.
+    Private keys come from the secrets module, which reads the OS CSPRNG in every process,
+    so forked workers never share random state.
+    Public keys of the chunk are derived together with the fixed-base table.
+    """
+    priv_keys = [secrets.randbelow(secp256k1_batch.N - 1) + 1 for _ in range(size)]
+    return [
+        (hex(addresses.private_key)[2:], addresses.p2wpkh_address)
+        for addresses in get_addresses_batch(priv_keys)
+    ]
+
+
+def chunk_sizes(count: int, chunk_size: int = CHUNK_SIZE) -> Iterator[int]:
+    full_chunks, rest = divmod(count, chunk_size)
+    for _ in range(full_chunks):
+        yield chunk_size
+    if rest:
+        yield rest
+
+
+class KeyPairWriter:
+    """
+    Buffered streaming writer of key pairs.
+    csv - "private_key,address" lines
+    jsonl - {"private_key": ..., "address": ...} lines
+    bin - records of 32 bytes private key, 1 byte address length and the address in ascii
+    """
+
+    def __init__(self, path: str, output_format: str):
+        if output_format not in FORMATS:
+            raise ValueError(f"Unknown output format {output_format}")
+        self.output_format = output_format
+        mode = "wb" if output_format == "bin" else "w"
+        self.file: Union[BinaryIO, TextIO] = open(path, mode, buffering=BUFFER_SIZE)
+        if output_format == "csv":
+            self.file.write("private_key,address\n")
+
+    def __enter__(self) -> "KeyPairWriter":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.file.close()
+
+    def write(self, key_pairs: List[Tuple[str, str]]) -> None:
+        if self.output_format == "csv":
+            self.file.writelines(f"{key},{address}\n" for key, address in key_pairs)
+        elif self.output_format == "jsonl":
+            self.file.writelines(
+                json.dumps({"private_key": key, "address": address}) + "\n"
+                for key, address in key_pairs
+            )
+        else:
+            self.file.write(
+                b"".join(
+                    struct.pack(">32sB", int(key, 16).to_bytes(32, "big"), len(address))
+                    + address.encode()
+                    for key, address in key_pairs
+                )
+            )
+
+
+def generate(count: int, workers: int, path: str, output_format: str) -> float:
+    """
+    Generate key pairs in parallel and stream them to the output file
+    :return: generation time in seconds
+    """
+    start = time.perf_counter()
+    with KeyPairWriter(path, output_format) as writer:
+        if workers == 1:
+            for size in chunk_sizes(count):
+                writer.write(generate_chunk(size))
+        else:
+            with Pool(workers) as pool:
+                for key_pairs in pool.imap_unordered(
+                    generate_chunk, chunk_sizes(count)
+                ):
+                    writer.write(key_pairs)
+    return time.perf_counter() - start
+
+
+def parse_args(args=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Generate bitcoin key pairs")
+    parser.add_argument(
+        "--count", "-n", type=int, default=100, help="Number of key pairs"
+    )
+    parser.add_argument(
+        "--workers",
+        "-w",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of worker processes. By default number of CPUs",
+    )
+    parser.add_argument("--output", "-o", required=True, help="Output file")
+    parser.add_argument(
+        "--format", "-f", choices=FORMATS, default="csv", help="Output format"
+    )
+    parsed = parser.parse_args(args)
+    if parsed.count < 1:
+        parser.error("--count should be positive")
+    if parsed.workers < 1:
+        parser.error("--workers should be positive")
+    return parsed
+
+
+def main(args=None) -> None:
+    parsed = parse_args(args)
+    elapsed = generate(parsed.count, parsed.workers, parsed.output, parsed.format)
+    print(
+        f"Generated {parsed.count} key pairs in {elapsed:.2f}s "
+        f"({parsed.count / elapsed:.0f} pairs/s, {parsed.workers} workers)",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
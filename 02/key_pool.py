@@ -0,0 +1,185 @@
+"""
+Pool of ready key pairs for on-demand address issuance.
+A background thread keeps the pool above the low-water mark, so requests only pop a ready pair.
+Usage:
+    with KeyPool(capacity=10000, low_water=2000) as pool:
+        priv_key, address = pool.get()
+"""
+
+import logging
+import multiprocessing
+import threading
+import time
+from collections import deque
+from multiprocessing.pool import Pool
+from typing import Callable, Deque, List, NamedTuple, Optional, Tuple
+
+from create_key_pairs import generate_chunk, get_key_pairs
+
+logger = logging.getLogger(__name__)
+
+KeyPair = Tuple[str, str]
+
+
+class KeyPoolStats(NamedTuple):
+    size: int
+    capacity: int
+    # size / capacity
+    fill_level: float
+    # key pairs generated per second of refill work
+    refill_rate: float
+    generated: int
+    served: int
+    # requests served synchronously because the pool was empty
+    empty_hits: int
+    # refill batches failed with an exception
+    refill_errors: int
+
+
+class KeyPool:
+    """
+    Bounded pool of (private key, P2WPKH address) pairs, the same pairs get_key_pairs() returns.
+    The refill thread generates them in batches of batch_size with generate_chunk, in worker
+    processes if processes > 0, so the generation doesn't hold the GIL of the service.
+    The worker processes are started with spawn by start(), on the calling thread, so they are
+    never forked from a process already running the refill or other service threads.
+    When the pool is empty get() falls back to get_key_pairs().
+    If a refill batch fails, the error is logged and the thread retries after retry_delay seconds.
+    """
+
+    def __init__(
+        self,
+        capacity: int = 10000,
+        low_water: Optional[int] = None,
+        batch_size: int = 500,
+        processes: int = 1,
+        generate: Callable[[int], List[KeyPair]] = generate_chunk,
+        retry_delay: float = 1.0,
+    ):
+        if capacity < 1:
+            raise ValueError("capacity should be positive")
+        self.capacity = capacity
+        self.low_water = capacity // 2 if low_water is None else low_water
+        if not 0 <= self.low_water < capacity:
+            raise ValueError("low_water should be in range [0, capacity)")
+        self.batch_size = batch_size
+        self.processes = processes
+        self.generate = generate
+        self.retry_delay = retry_delay
+
+        # append and popleft of a deque are atomic, the pool itself needs no lock
+        self.pairs: Deque[KeyPair] = deque()
+        self.refill_needed = threading.Event()
+        self.stopped = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+        self.process_pool: Optional[Pool] = None
+
+        self.stats_lock = threading.Lock()
+        self.generated = 0
+        self.served = 0
+        self.empty_hits = 0
+        self.refill_errors = 0
+        self.refill_time = 0.0
+
+    def __enter__(self) -> "KeyPool":
+        self.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def start(self) -> None:
+        if self.thread is not None:
+            return
+        self.stopped.clear()
+        self.refill_needed.set()
+        if self.processes > 0:
+            self.process_pool = multiprocessing.get_context("spawn").Pool(
+                self.processes
+            )
+        self.thread = threading.Thread(
+            target=self._refill_loop, name="key-pool-refill", daemon=True
+        )
+        self.thread.start()
+
+    def close(self) -> None:
+        self.stopped.set()
+        self.refill_needed.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        if self.process_pool is not None:
+            self.process_pool.terminate()
+            self.process_pool = None
+
+    def _refill_loop(self) -> None:
+        while not self.stopped.is_set():
+            self.refill_needed.wait()
+            self.refill_needed.clear()
+            try:
+                self._refill(self.process_pool)
+            except Exception:
+                logger.exception("Key pool refill failed")
+                with self.stats_lock:
+                    self.refill_errors += 1
+                # keep the thread alive and try again, get() serves synchronously meanwhile
+                self.stopped.wait(self.retry_delay)
+                self.refill_needed.set()
+
+    def _refill(self, process_pool: Optional[Pool]) -> None:
+        while not self.stopped.is_set():
+            missing = self.capacity - len(self.pairs)
+            if missing <= 0:
+                return
+            size = min(missing, self.batch_size)
+            start = time.perf_counter()
+            if process_pool is not None:
+                pairs = process_pool.apply(self.generate, (size,))
+            else:
+                pairs = self.generate(size)
+            self.pairs.extend(pairs)
+            with self.stats_lock:
+                self.generated += len(pairs)
+                self.refill_time += time.perf_counter() - start
+
+    def get(self) -> KeyPair:
+        """Pop a ready key pair, O(1) unless the pool is empty"""
+        try:
+            pair = self.pairs.popleft()
+        except IndexError:
+            with self.stats_lock:
+                self.empty_hits += 1
+                self.served += 1
+            self.refill_needed.set()
+            return get_key_pairs()
+
+        with self.stats_lock:
+            self.served += 1
+        if len(self.pairs) < self.low_water:
+            self.refill_needed.set()
+        return pair
+
+    def wait_full(self, timeout: Optional[float] = None) -> bool:
+        """Wait until the pool is full, for warm up at the start of the service"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while len(self.pairs) < self.capacity:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def stats(self) -> KeyPoolStats:
+        size = len(self.pairs)
+        with self.stats_lock:
+            return KeyPoolStats(
+                size=size,
+                capacity=self.capacity,
+                fill_level=size / self.capacity,
+                refill_rate=(
+                    self.generated / self.refill_time if self.refill_time else 0.0
+                ),
+                generated=self.generated,
+                served=self.served,
+                empty_hits=self.empty_hits,
+                refill_errors=self.refill_errors,
+            )
@@ -0,0 +1,176 @@
+"""
+Batch public key derivation for secp256k1 with a fixed-base table of the generator.
+k*G is computed as a sum of precomputed window multiples of G, so every key costs one mixed
+point addition per window instead of a full double-and-add, and the Jacobian results of a
+batch are converted to affine with a single modular inversion.
+Usage: python secp256k1_batch.py --count 100000
+"""
+
+import argparse
+import secrets
+import time
+from functools import lru_cache
+from typing import List, Optional, Sequence, Tuple
+
+from fastecdsa import curve, keys
+
+P = curve.secp256k1.p
+N = curve.secp256k1.q
+G = (curve.secp256k1.gx, curve.secp256k1.gy)
+
+Affine = Tuple[int, int]
+# (X, Y, Z) with x = X/Z^2, y = Y/Z^3, Z == 0 is the point at infinity
+Jacobian = Tuple[int, int, int]
+
+INFINITY: Jacobian = (1, 1, 0)
+
+
+def jacobian_double(point: Jacobian) -> Jacobian:
+    x1, y1, z1 = point
+    if not z1 or not y1:
+        return INFINITY
+    a = x1 * x1 % P
+    b = y1 * y1 % P
+    c = b * b % P
+    d = 2 * ((x1 + b) * (x1 + b) - a - c) % P
+    e = 3 * a % P
+    x3 = (e * e - 2 * d) % P
+    y3 = (e * (d - x3) - 8 * c) % P
+    z3 = 2 * y1 * z1 % P
+    return x3, y3, z3
+
+
+def jacobian_add_affine(point: Jacobian, other: Affine) -> Jacobian:
+    """Mixed addition of a Jacobian and an affine point"""
+    x1, y1, z1 = point
+    x2, y2 = other
+    if not z1:
+        return x2, y2, 1
+    z1z1 = z1 * z1 % P
+    h = (x2 * z1z1 - x1) % P
+    r = (y2 * z1 * z1z1 - y1) % P
+    if not h:
+        # same x coordinate, the points are either equal or opposite
+        return jacobian_double(point) if not r else INFINITY
+    hh = h * h % P
+    hhh = h * hh % P
+    v = x1 * hh % P
+    x3 = (r * r - hhh - 2 * v) % P
+    y3 = (r * (v - x3) - y1 * hhh) % P
+    z3 = z1 * h % P
+    return x3, y3, z3
+
+
+def batch_normalize(points: Sequence[Jacobian]) -> List[Optional[Affine]]:
+    """
+    Convert Jacobian points to affine with one modular inversion for the whole batch
+    (Montgomery's trick). The point at infinity is returned as None.
+    """
+    prefix = []
+    accumulator = 1
+    for _, _, z in points:
+        prefix.append(accumulator)
+        if z:
+            accumulator = accumulator * z % P
+
+    inverse = pow(accumulator, -1, P)
+    result: List[Optional[Affine]] = [None] * len(points)
+    for index in range(len(points) - 1, -1, -1):
+        x, y, z = points[index]
+        if not z:
+            continue
+        z_inverse = inverse * prefix[index] % P
+        inverse = inverse * z % P
+        z_inverse_square = z_inverse * z_inverse % P
+        result[index] = (x * z_inverse_square % P, y * z_inverse_square * z_inverse % P)
+    return result
+
+
+class FixedBaseTable:
+    """
+    Table of j * 2^(window * i) * G for every window i and digit j,
+    k*G is the sum of the table entries selected by the base 2^window digits of k.
+    """
+
+    def __init__(self, window: int = 8):
+        self.window = window
+        self.mask = (1 << window) - 1
+        self.windows = (N.bit_length() + window - 1) // window
+        self.rows: List[List[Optional[Affine]]] = []
+
+        base: Jacobian = (G[0], G[1], 1)
+        for _ in range(self.windows):
+            base_affine = batch_normalize([base])[0]
+            multiples: List[Jacobian] = [base]
+            for _ in range(self.mask - 1):
+                multiples.append(jacobian_add_affine(multiples[-1], base_affine))
+            # index 0 stands for the digit 0 and is never added
+            self.rows.append([None] + batch_normalize(multiples))
+            for _ in range(window):
+                base = jacobian_double(base)
+
+    def multiply(self, secret: int) -> Jacobian:
+        point = INFINITY
+        window, mask = self.window, self.mask
+        for row in self.rows:
+            digit = secret & mask
+            if digit:
+                point = jacobian_add_affine(point, row[digit])
+            secret >>= window
+        return point
+
+
+@lru_cache(maxsize=4)
+def get_table(window: int = 8) -> FixedBaseTable:
+    """Fixed-base table shared by all batches of the process, built on the first use"""
+    return FixedBaseTable(window)
+
+
+def derive_public_points(
+    secret_exponents: Sequence[int], table: Optional[FixedBaseTable] = None
+) -> List[Affine]:
+    """
+    Derive the public points of a batch of private keys
+    :param secret_exponents: private keys in range [1, N - 1]
+    :param table: fixed-base table, the shared default one if not set
+    :return: affine (x, y) public points in the order of the keys
+    """
+    table = table or get_table()
+    for secret in secret_exponents:
+        if not 0 < secret < N:
+            raise ValueError("Private key is out of the secp256k1 range")
+    return batch_normalize([table.multiply(secret) for secret in secret_exponents])
+
+
+def benchmark(count: int) -> None:
+    secret_exponents = [secrets.randbelow(N - 1) + 1 for _ in range(count)]
+
+    start = time.perf_counter()
+    table = get_table()
+    table_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch_points = derive_public_points(secret_exponents, table)
+    batch_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    single_points = [
+        keys.get_public_key(secret, curve.secp256k1) for secret in secret_exponents
+    ]
+    single_time = time.perf_counter() - start
+
+    assert batch_points == [(point.x, point.y) for point in single_points]
+    print(f"table precomputation: {table_time:.2f}s")
+    print(f"per key:    {single_time:.2f}s ({count / single_time:.0f} keys/s)")
+    print(f"batch:      {batch_time:.2f}s ({count / batch_time:.0f} keys/s)")
+    print(f"speedup:    {single_time / batch_time:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare per key and batch public key derivation"
+    )
+    parser.add_argument(
+        "--count", "-n", type=int, default=100000, help="Number of keys"
+    )
+    benchmark(parser.parse_args().count)
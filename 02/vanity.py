@@ -0,0 +1,240 @@
+"""
+Parallel search of P2WPKH addresses with a chosen prefix, like bc1qcafe...
+Every worker process starts from a random key k and steps k+1, k+2, ... so each candidate
+costs one point addition P+G, public keys of a batch are normalized with one inversion
+and the prefix is compared on the 5-bit groups of the hash160 before anything is encoded.
+Every prefix character multiplies the expected number of keys by 32.
+Usage: python vanity.py bc1qcafe --workers 8
+"""
+
+import argparse
+import multiprocessing
+import os
+import queue
+import secrets
+import sys
+import time
+from typing import NamedTuple, Optional, Tuple
+
+import bech32
+import secp256k1_batch
+from bitcoin_key_gen import get_addresses, hash160
+from secp256k1_batch import G, Jacobian, N
+
+# candidates normalized together with one inversion
+BATCH_SIZE = 1024
+# seconds between progress reports
+REPORT_INTERVAL = 5.0
+
+
+class Target(NamedTuple):
+    prefix: str
+    hrp: str
+    # first 5-bit groups of the program as one integer
+    value: int
+    # bytes of the program covering the groups and the extra low bits to drop
+    size: int
+    shift: int
+
+    @property
+    def expected_keys(self) -> int:
+        return 32 ** (len(self.prefix) - len(self.hrp) - 2)
+
+
+class VanityResult(NamedTuple):
+    private_key: int
+    address: str
+    keys: int
+    seconds: float
+
+
+def parse_prefix(prefix: str, hrp: str = "bc") -> Target:
+    """Target of an address prefix, which starts with the hrp and 1q of witness version 0"""
+    prefix = prefix.lower()
+    start = hrp + "1q"
+    if not prefix.startswith(start):
+        raise ValueError(f"Prefix should start with {start}")
+    groups = [bech32.CHARSET.find(character) for character in prefix[len(start) :]]
+    if -1 in groups:
+        raise ValueError(f"Prefix may only contain characters of {bech32.CHARSET}")
+    # 32 groups of 5 bits cover the 20 bytes program
+    if len(groups) > 32:
+        raise ValueError("Prefix is longer than the address")
+
+    value = 0
+    for group in groups:
+        value = value << 5 | group
+    bits = 5 * len(groups)
+    size = (bits + 7) // 8
+    return Target(prefix, hrp, value, size, size * 8 - bits)
+
+
+def scan(
+    secret: int, point: Jacobian, count: int, target: Target
+) -> Tuple[Optional[int], Jacobian]:
+    """
+    Check the keys secret..secret+count-1, point is secret*G
+    :return: matching private key or None, and the point of the next key
+    """
+    points = []
+    for _ in range(count):
+        points.append(point)
+        point = secp256k1_batch.jacobian_add_affine(point, G)
+
+    value, size, shift = target.value, target.size, target.shift
+    from_bytes = int.from_bytes
+    for offset, affine in enumerate(secp256k1_batch.batch_normalize(points)):
+        if affine is None:
+            continue
+        x, y = affine
+        program = hash160((b"\x03" if y & 1 else b"\x02") + x.to_bytes(32, "big"))
+        if from_bytes(program[:size], "big") >> shift == value:
+            return (secret + offset) % N, point
+    return None, point
+
+
+def search(
+    target: Target,
+    stop: multiprocessing.Event,
+    counter: multiprocessing.Value,
+    results: multiprocessing.Queue,
+    batch_size: int = BATCH_SIZE,
+) -> None:
+    """Worker process, scans from a random key until a match is found by any worker"""
+    secret = secrets.randbelow(N - 1) + 1
+    point = secp256k1_batch.get_table().multiply(secret)
+    while not stop.is_set():
+        match, point = scan(secret, point, batch_size, target)
+        secret = (secret + batch_size) % N
+        with counter.get_lock():
+            counter.value += batch_size
+        if match is not None:
+            results.put(match)
+            stop.set()
+
+
+def available_cpus() -> int:
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def expected_rate(target: Target, batch_size: int = BATCH_SIZE) -> float:
+    """Keys per second of one process, measured on one batch"""
+    secret = secrets.randbelow(N - 1) + 1
+    point = secp256k1_batch.get_table().multiply(secret)
+    start = time.perf_counter()
+    # a target no key matches, so the whole batch is checked
+    scan(secret, point, batch_size, target._replace(value=-1))
+    return batch_size / (time.perf_counter() - start)
+
+
+def find(
+    prefix: str,
+    workers: int = 1,
+    hrp: str = "bc",
+    batch_size: int = BATCH_SIZE,
+    timeout: Optional[float] = None,
+    verbose: bool = False,
+) -> Optional[VanityResult]:
+    """
+    Search a key with a P2WPKH address starting with prefix in worker processes
+    :return: the first match, None on timeout
+    """
+    target = parse_prefix(prefix, hrp)
+    if verbose:
+        # workers beyond the available CPUs only share them
+        expected = expected_rate(target, batch_size) * min(workers, available_cpus())
+        print(
+            f"Expected {target.expected_keys} keys at {expected:.0f} keys/s "
+            f"({target.expected_keys / expected:.0f}s on average)",
+            file=sys.stderr,
+        )
+
+    stop = multiprocessing.Event()
+    counter = multiprocessing.Value("Q", 0)
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(
+            target=search, args=(target, stop, counter, results, batch_size)
+        )
+        for _ in range(workers)
+    ]
+    start = time.perf_counter()
+    for process in processes:
+        process.start()
+
+    match = None
+    deadline = None if timeout is None else start + timeout
+    try:
+        while match is None:
+            wait = REPORT_INTERVAL
+            if deadline is not None:
+                wait = min(wait, deadline - time.perf_counter())
+                if wait <= 0:
+                    break
+            try:
+                match = results.get(timeout=wait)
+            except queue.Empty:
+                if verbose:
+                    elapsed = time.perf_counter() - start
+                    print(
+                        f"{counter.value} keys, {counter.value / elapsed:.0f} keys/s",
+                        file=sys.stderr,
+                    )
+    finally:
+        stop.set()
+        for process in processes:
+            process.join()
+
+    elapsed = time.perf_counter() - start
+    if verbose:
+        print(
+            f"Checked {counter.value} keys in {elapsed:.2f}s "
+            f"({counter.value / elapsed:.0f} keys/s achieved, {workers} workers)",
+            file=sys.stderr,
+        )
+    if match is None:
+        return None
+
+    address = get_addresses(match, hrp).p2wpkh_address
+    assert address.startswith(target.prefix)
+    return VanityResult(match, address, counter.value, elapsed)
+
+
+def parse_args(args=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Search a vanity P2WPKH address")
+    parser.add_argument("prefix", help="Address prefix, like bc1qcafe")
+    parser.add_argument(
+        "--workers",
+        "-w",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of worker processes. By default number of CPUs",
+    )
+    parser.add_argument(
+        "--testnet", action="store_true", help="Search a testnet (tb1q) address"
+    )
+    parser.add_argument("--timeout", type=float, help="Give up after the seconds")
+    parsed = parser.parse_args(args)
+    if parsed.workers < 1:
+        parser.error("--workers should be positive")
+    return parsed
+
+
+def main(args=None) -> None:
+    parsed = parse_args(args)
+    hrp = "tb" if parsed.testnet else "bc"
+    try:
+        result = find(
+            parsed.prefix, parsed.workers, hrp, timeout=parsed.timeout, verbose=True
+        )
+    except ValueError as e:
+        sys.exit(str(e))
+    if result is None:
+        sys.exit("No match found")
+    print(f"{hex(result.private_key)[2:]},{result.address}")
+
+
+if __name__ == "__main__":
+    main()
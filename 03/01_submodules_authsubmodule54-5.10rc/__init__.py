@@ -5,8 +5,10 @@ from flask_babel import Babel
 from flask_babel import gettext as _
 
 from .core.actor import Actor, ActorNotFound
+from .core.db_stats_view import DatabaseStatsView
 from .core.exceptions import AuthPermsDataError, BaseArgumentsError
-from .core.managers import DatabaseManager
+from .core.instrumentation import QueryInstrumentation
+from .core.managers import AsyncDatabaseManager, DatabaseManager
 from .core.routes import auth_submodule as auth_submodule
 from .core.utils import get_session_token
 
@@ -87,6 +89,7 @@ class AuthPerms:
         self.app.register_blueprint(auth_submodule)
         self.set_before_request_functions(app=app)
         self.add_jinja_extensions(app=app)
+        self.configure_instrumentation(app=app)
 
     def parse_variables(self):
         """
@@ -107,6 +110,18 @@ class AuthPerms:
         LANGUAGES_INFORMATION - list of dicts with language information like name, code, block.
         DB_MINIMUM_CONNECTIONS - count of minimum connections in pool
         DB_MAXIMUM_CONNECTIONS - count of maximum connections in pool
+        DB_MAXIMUM_OVERFLOW - count of extra connections opened when all pool connections are in use
+        DB_POOL_TIMEOUT - seconds to wait for a free connection before PoolTimeout error
+        DB_CONNECTION_MAX_AGE - seconds after which pool connection is reopened, None to keep it open
+        DB_INSTRUMENTATION - count queries and DB time of every request and log slow queries
+        DB_SLOW_QUERY_MS - queries running longer are logged, 100 by default
+        DB_STATS_ENDPOINT - add /db_stats/ endpoint with query statistics for admins
+        DB_PREPARED_STATEMENTS - run hot auth queries as prepared statements, True by default. Disable when
+            connections go through pgbouncer in transaction mode
+        DB_REPLICAS - list of read replica DSNs, plain SELECTs of requests are spread over them
+        DB_REPLICA_COOLDOWN - seconds a failed replica is out of rotation, 30 by default
+        DB_FETCH_SIZE - rows per round trip of server-side cursors of iterate(), 2000 by default
+        DB_ASYNC - add asyncio database manager app.async_db with the same credentials, requires aiopg
         """
         for key in dir(self.settings_module):
             if key.isupper() and key in [
@@ -126,6 +141,17 @@ class AuthPerms:
                 "LANGUAGES_INFORMATION",
                 "DB_MINIMUM_CONNECTIONS",
                 "DB_MAXIMUM_CONNECTIONS",
+                "DB_MAXIMUM_OVERFLOW",
+                "DB_POOL_TIMEOUT",
+                "DB_CONNECTION_MAX_AGE",
+                "DB_INSTRUMENTATION",
+                "DB_SLOW_QUERY_MS",
+                "DB_STATS_ENDPOINT",
+                "DB_PREPARED_STATEMENTS",
+                "DB_REPLICAS",
+                "DB_REPLICA_COOLDOWN",
+                "DB_FETCH_SIZE",
+                "DB_ASYNC",
                 "DEPENDED_SERVICES",
                 "REDIRECT_URL",
                 "SERVICE_DOMAIN",
@@ -334,39 +360,42 @@ class AuthPerms:
 
         app.config.update(self.base_args)
 
+    def get_setting(self, app, key, default=None):
+        """
+        Setting from app config, then from parsed variables, then the default.
+        """
+        return app.config.get(key, self.base_args.get(key, default))
+
     def configure_db(self, app):
         """
         Configure database manager and add it as app attribute named db.
         """
-        min_connections = app.config.get(
-            "DB_MINIMUM_CONNECTIONS", self.base_args.get("DB_MINIMUM_CONNECTIONS", 1)
-        )
-        max_connections = app.config.get(
-            "DB_MAXIMUM_CONNECTIONS", self.base_args.get("DB_MAXIMUM_CONNECTIONS", 10)
+        pool_settings = dict(
+            min_connection=self.get_setting(app, "DB_MINIMUM_CONNECTIONS", 1),
+            max_connections=self.get_setting(app, "DB_MAXIMUM_CONNECTIONS", 10),
+            max_overflow=self.get_setting(app, "DB_MAXIMUM_OVERFLOW", 0),
+            pool_timeout=self.get_setting(app, "DB_POOL_TIMEOUT", 30),
+            connection_max_age=self.get_setting(app, "DB_CONNECTION_MAX_AGE", 3600),
+            prepared_statements=self.get_setting(app, "DB_PREPARED_STATEMENTS", True),
+            replicas=self.get_setting(app, "DB_REPLICAS"),
+            replica_cooldown=self.get_setting(app, "DB_REPLICA_COOLDOWN", 30),
+            fetch_size=self.get_setting(app, "DB_FETCH_SIZE", 2000),
         )
         if self.database_credentials:
             DatabaseManager(
-                database=self.database_credentials,
-                min_connection=min_connections,
-                max_connections=max_connections,
+                database=self.database_credentials, **pool_settings
             ).init_app(app=app)
         elif self.database_credentials_dsn:
             DatabaseManager(
-                dsn=self.database_credentials_dsn,
-                min_connection=min_connections,
-                max_connections=max_connections,
+                dsn=self.database_credentials_dsn, **pool_settings
             ).init_app(app=app)
         elif self.base_args.get("DATABASE"):
             DatabaseManager(
-                database=self.base_args.get("DATABASE"),
-                min_connection=min_connections,
-                max_connections=max_connections,
+                database=self.base_args.get("DATABASE"), **pool_settings
             ).init_app(app=app)
         elif self.base_args.get("DATABASE_URI"):
             DatabaseManager(
-                dsn=self.base_args.get("DATABASE_URI"),
-                min_connection=min_connections,
-                max_connections=max_connections,
+                dsn=self.base_args.get("DATABASE_URI"), **pool_settings
             ).init_app(app=app)
         else:
             raise AuthPermsDataError(
@@ -379,12 +408,38 @@ class AuthPerms:
                 "\n DATABASE_URI - kwargs argument with database credentials in string."
             )
 
+        if self.get_setting(app, "DB_ASYNC"):
+            AsyncDatabaseManager(
+                database=app.db.DATABASE,
+                dsn=app.db.DSN,
+                min_connection=pool_settings["min_connection"],
+                max_connections=pool_settings["max_connections"],
+                pool_timeout=pool_settings["pool_timeout"],
+                prepared_statements=pool_settings["prepared_statements"],
+            ).init_app(app=app)
+
         if self.base_args.get("DATABASE"):
             self.base_args.pop("DATABASE")
 
         if self.base_args.get("DATABASE_URI"):
             self.base_args.pop("DATABASE_URI")
 
+    def configure_instrumentation(self, app):
+        """
+        Add query instrumentation to database manager and statistics endpoint if they are enabled in settings.
+        """
+        if not self.get_setting(app, "DB_INSTRUMENTATION"):
+            return
+
+        QueryInstrumentation(
+            app=app,
+            slow_query_ms=float(self.get_setting(app, "DB_SLOW_QUERY_MS") or 100),
+        )
+        if self.get_setting(app, "DB_STATS_ENDPOINT"):
+            app.add_url_rule(
+                "/db_stats/", view_func=DatabaseStatsView.as_view("db_stats")
+            )
+
     def table_exists(self, table_name):
         """
         Check if table with received table_name exists in database.
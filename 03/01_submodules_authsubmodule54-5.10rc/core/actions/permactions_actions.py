@@ -1,10 +1,12 @@
 import json
-from typing import Dict, List, Optional, Tuple, Union
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
 
 from flask import current_app as app
 
 from ..actor import Actor
-from ..utils import create_response_message
+from ..utils import (create_response_message, decode_page_cursor,
+                     encode_page_cursor, is_valid_uuid)
 
 
 class GetGroupPermsAction:
@@ -73,20 +75,64 @@ class GetActorPermsAction:
 
 
 class GetDefaultPermsAction:
-    def execute(self) -> Union[Dict, List]:
-        default_permactions = app.db.fetchall("""SELECT * FROM default_permaction""",)
+    def __init__(self, limit: int = None, after: str = None) -> None:
+        """
+        :param limit: permactions on the page, all of them if not set
+        :param after: cursor of the page before, first page if not set
+        """
+        self.limit = limit
+        self.after = after
+        self.next_cursor: Optional[str] = None
+
+    def execute(self) -> List[Dict]:
+        if not self.limit:
+            default_permactions = app.db.fetchall(
+                """SELECT * FROM default_permaction"""
+            )
+            return default_permactions
+
+        # Keyset pagination on (created, primary key), newest first
+        query = "SELECT * FROM default_permaction"
+        values = []
+        if self.after:
+            created, permaction_uuid, service_uuid = decode_page_cursor(self.after, 3)
+            if not is_valid_uuid(permaction_uuid) or not is_valid_uuid(service_uuid):
+                raise ValueError("Invalid page cursor")
+            query += " WHERE (created, permaction_uuid, service_uuid) < (%s, %s::uuid, %s::uuid)"
+            values += [datetime.fromisoformat(created), permaction_uuid, service_uuid]
+        query += (
+            " ORDER BY created DESC, permaction_uuid DESC, service_uuid DESC LIMIT %s"
+        )
+        values.append(self.limit + 1)
+
+        default_permactions = app.db.fetchall(query, values)
+        if len(default_permactions) > self.limit:
+            default_permactions = default_permactions[: self.limit]
+            last = default_permactions[-1]
+            self.next_cursor = encode_page_cursor(
+                last.get("created"),
+                last.get("permaction_uuid"),
+                last.get("service_uuid"),
+            )
+
         return default_permactions
 
 
 class GetAllPermsAction:
-    def __init__(self, actor_uuid) -> None:
+    def __init__(
+        self, actor_uuid, default_limit: int = None, default_after: str = None
+    ) -> None:
         self.actor_perms: Optional[List] = None
         self.groups_perms: Optional[List] = None
         self.default_perms: Optional[List] = None
         self.perms = dict()
         self.actor_uuid = actor_uuid
+        self.default_limit = default_limit
+        self.default_after = default_after
         self.actor = Actor.objects.get(uuid=self.actor_uuid)
-        self.groups = [group.uuid for group in self.actor.get_groups()]
+        # Fetched with one query, views reuse them instead of get_groups() again
+        self.actor_groups = self.actor.get_groups()
+        self.groups = [group.uuid for group in self.actor_groups]
 
     def execute(self) -> Dict:
         self.get_actor_perms()
@@ -107,8 +153,10 @@ class GetAllPermsAction:
             self.perms["groups"] = self.groups_perms
 
     def get_default_perms(self) -> None:
-        self.default_perms = GetDefaultPermsAction().execute()
+        action = GetDefaultPermsAction(self.default_limit, self.default_after)
+        self.default_perms = action.execute()
         self.perms["default"] = self.default_perms
+        self.perms["default_next"] = action.next_cursor
 
 
 class BasePermactionAction:
@@ -2,13 +2,21 @@
 Base actor class with manager. This class is used to get actor object like ORM. Usage:
 Actor.objects.get(key=value) - get single actor by sent params
 Actor.objects.filter(key=value) - get list of actors by sent kwargs arguments
+Actor.objects.get_many(uuids) - get actors by list of uuids with one query, and uuids that were not found
+Actor.objects.iterate(key=value) - the same as filter, but actors are streamed with a server-side cursor
+Actor.objects.page(limit=50, after=cursor, actor_type=value) - one page of actors and cursor of the next page
 Actor.objects.exists(key=value) - is actor with params sent in kwargs exists.
 Actor.objects.get_by_session(session_token=session_token) - get by session token
+await Actor.async_objects.get_by_session(session_token=session_token) - the same with app.async_db, there are
+async get, filter and exists as well
 """
 
 import json
+import threading
 from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 from urllib.parse import urljoin
+from uuid import UUID
 
 import requests
 from flask import current_app as app
@@ -16,9 +24,10 @@ from flask_babel import gettext as _
 from psycopg2 import sql
 from psycopg2.extras import RealDictRow
 
-from .utils import (create_response_message, get_auth_domain,
-                    get_language_header, get_static_group, json_dumps,
-                    sign_data, verify_signature)
+from .utils import (create_response_message, decode_page_cursor,
+                    encode_page_cursor, escape_like, get_auth_domain,
+                    get_language_header, get_static_group, is_valid_uuid,
+                    json_dumps, sign_data, verify_signature)
 
 
 class ActorNotFound(Exception):
@@ -43,15 +52,83 @@ class MultipleObjectsReturned(Exception):
             super().__init__(message)
 
 
+class QueryCache:
+    """
+    Composed queries of managers by table, selected columns and lookups. There are few distinct lookup
+    shapes in the code, so after warm up queries are only looked up and just the values are built per call.
+    """
+
+    def __init__(self, maxsize: int = 256) -> None:
+        self.maxsize = maxsize
+        self.queries: Dict[tuple, Tuple[sql.Composed, tuple]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key: tuple) -> Optional[Tuple[sql.Composed, tuple]]:
+        entry = self.queries.get(key)
+        with self.lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return entry
+
+    def put(self, key: tuple, entry: Tuple[sql.Composed, tuple]) -> None:
+        # lookups come from code, a full cache means something builds them dynamically
+        if len(self.queries) < self.maxsize:
+            self.queries[key] = entry
+
+    def stats(self) -> dict:
+        with self.lock:
+            calls = self.hits + self.misses
+            return dict(
+                size=len(self.queries),
+                hits=self.hits,
+                misses=self.misses,
+                hit_rate=self.hits / calls if calls else 0.0,
+            )
+
+    def clear(self) -> None:
+        with self.lock:
+            self.queries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+query_cache = QueryCache()
+
+
 # TODO: Move base manager out of actor.py
 class BaseManager:
     def __init__(self, table_name, *args, **kwargs):
         self.table_name = table_name
 
     def compile_query(self, *args, **kwargs):
+        # Composables have no hash, their repr is stable
+        key = ("select", self.table_name, tuple(map(repr, args)), tuple(kwargs))
+        entry = query_cache.get(key)
+        if entry is None:
+            entry = self._compile_query(*args, **kwargs)
+            query_cache.put(key, entry)
+
+        query, lookups = entry
+        return query, self.lookup_values(lookups, kwargs)
+
+    def exists_query(self, *args, **kwargs):
+        key = ("exists", self.table_name, (), tuple(kwargs))
+        entry = query_cache.get(key)
+        if entry is None:
+            entry = self._exists_query(**kwargs)
+            query_cache.put(key, entry)
+
+        query, lookups = entry
+        return query, self.lookup_values(lookups, kwargs)
+
+    def _compile_query(self, *args, **kwargs):
 
         appends_list = list()
-        values = dict()
+        lookups = list()
 
         if not args:
             query_string = "SELECT * FROM {} "
@@ -63,25 +140,25 @@ class BaseManager:
         if kwargs:
             query_string += "WHERE "
 
-        for k, v in kwargs.items():
+        for k in kwargs:
 
-            query_fragment, appends, value = self.parse_keyword(k, v)
+            query_fragment, appends, attribute, operator = self.parse_lookup(k)
             query_string += query_fragment
             query_string += " AND "
             appends_list += appends
-            values.update(value)
+            lookups.append((k, attribute, operator))
 
         else:
             query_string = query_string.rstrip("AND ")
 
         query = sql.SQL(query_string).format(*appends_list)
 
-        return query, values
+        return query, tuple(lookups)
 
-    def exists_query(self, *args, **kwargs):
+    def _exists_query(self, **kwargs):
 
         appends_list = list()
-        values = dict()
+        lookups = list()
         query_string = "SELECT EXISTS(SELECT 1 FROM {} "
 
         appends_list.append(sql.Identifier(self.table_name))
@@ -89,14 +166,14 @@ class BaseManager:
         if kwargs:
             query_string += "WHERE "
 
-        for k, v in kwargs.items():
+        for k in kwargs:
 
-            query_fragment, appends, value = self.parse_keyword(k, v)
+            query_fragment, appends, attribute, operator = self.parse_lookup(k)
 
             query_string += query_fragment
             query_string += " AND "
             appends_list += appends
-            values.update(value)
+            lookups.append((k, attribute, operator))
 
         else:
             query_string = query_string.rstrip("AND ")
@@ -105,41 +182,71 @@ class BaseManager:
 
         query = sql.SQL(query_string).format(*appends_list)
 
-        return query, values
+        return query, tuple(lookups)
 
     @staticmethod
-    def parse_keyword(attribute, value):
+    def parse_lookup(lookup):
+        """
+        Split lookup like uuid__in into query fragment with its composables, attribute name and operator
+        """
 
-        elements = attribute.split("__")
+        elements = lookup.split("__")
 
         if len(elements) == 1:
             return (
                 "{}={}",
-                [sql.Identifier(attribute), sql.Placeholder(attribute)],
-                {attribute: value},
+                [sql.Identifier(lookup), sql.Placeholder(lookup)],
+                lookup,
+                None,
             )
 
         elif len(elements) == 2:
 
+            attribute = elements[0]
             if elements[1] == "in":
-                attribute = elements[0]
                 return (
                     "{} IN {}",
                     [sql.Identifier(attribute), sql.Placeholder(attribute)],
-                    {attribute: tuple(value)},
+                    attribute,
+                    "in",
                 )
 
             elif elements[1] == "contains":
-                value = "%" + value + "%"
-                attribute = elements[0]
                 return (
                     "{} LIKE {}",
                     [sql.Identifier(attribute), sql.Placeholder(attribute)],
-                    {attribute: value},
+                    attribute,
+                    "contains",
                 )
 
         raise FieldError("Unsupported lookup")
 
+    @staticmethod
+    def lookup_values(lookups, kwargs):
+        """
+        Query parameters of lookups made by parse_lookup
+        """
+        values = dict()
+        for lookup, attribute, operator in lookups:
+            value = kwargs[lookup]
+            if operator == "in":
+                value = tuple(value)
+            elif operator == "contains":
+                value = "%" + value + "%"
+            values[attribute] = value
+        return values
+
+    @staticmethod
+    def parse_keyword(attribute, value):
+        query_fragment, appends, name, operator = BaseManager.parse_lookup(attribute)
+        return (
+            query_fragment,
+            appends,
+            BaseManager.lookup_values(
+                [(attribute, name, operator)], {attribute: value}
+            ),
+        )
+
 
 class ActorManager(BaseManager):
     def get(self, **kwargs):
@@ -154,9 +261,7 @@ class ActorManager(BaseManager):
 
         query, values = self.compile_query(**kwargs)
 
-        with app.db.get_cursor() as cur:
-            cur.execute(query, values)
-            actor = cur.fetchall()
+        actor = app.db.fetchall(query, values)
 
         if not actor:
             raise ActorNotFound
@@ -171,9 +276,7 @@ class ActorManager(BaseManager):
 
         query, values = self.compile_query(**kwargs)
 
-        with app.db.get_cursor() as cur:
-            cur.execute(query, values)
-            actors = cur.fetchall()
+        actors = app.db.fetchall(query, values)
 
         if not actors:
             return []
@@ -181,13 +284,113 @@ class ActorManager(BaseManager):
         else:
             return [Actor(actor) for actor in actors]
 
+    def get_many(self, uuids: Iterable[str]) -> Tuple[List["Actor"], List[str]]:
+        """
+        Get actors by uuids with one query instead of get() for every uuid
+        :param uuids: actor uuids
+        :return: found actors in order of uuids and uuids without actor, invalid uuids are missing as well
+        """
+        uuids = list(uuids)
+        keys = {}
+        for uuid in uuids:
+            try:
+                keys[uuid] = str(UUID(str(uuid)))
+            except ValueError:
+                keys[uuid] = None
+
+        valid = list({key for key in keys.values() if key})
+        rows = []
+        if valid:
+            rows = app.db.fetchall(
+                "SELECT * FROM actor WHERE uuid = ANY(%s::uuid[])", [valid]
+            )
+        actors_by_uuid = {str(row.get("uuid")): Actor(row) for row in rows}
+
+        actors = []
+        missing = []
+        for uuid in uuids:
+            actor = actors_by_uuid.get(keys[uuid])
+            if actor is None:
+                missing.append(uuid)
+            else:
+                actors.append(actor)
+
+        return actors, missing
+
+    def iterate(self, fetch_size: int = None, **kwargs) -> Iterator["Actor"]:
+        """
+        Iterate actors matching kwargs like filter() without loading all of them in memory.
+        Exhaust or close the iterator to release the database connection.
+        :param fetch_size: rows fetched per round trip, DB_FETCH_SIZE by default
+        """
+        query, values = self.compile_query(**kwargs)
+        for actor in app.db.iterate(query, values, fetch_size=fetch_size):
+            yield Actor(actor)
+
+    def page(
+        self,
+        limit: int = 50,
+        after: str = None,
+        actor_type: str = None,
+        group: str = None,
+        email: str = None,
+    ) -> Tuple[List["Actor"], Optional[str]]:
+        """
+        Page of actors, newest first, with keyset pagination on (created, uuid). Pages are read by index
+        from the position of the cursor, so every page costs the same however far it is.
+        :param limit: actors on the page
+        :param after: cursor of the page before, first page if not set
+        :param actor_type: only actors of the type, or of any of comma separated types
+        :param group: only members of the group with the uuid
+        :param email: only actors with email starting with it, case insensitive
+        :return: actors and cursor of the next page, None on the last page
+        :raise ValueError: on invalid cursor or group uuid
+        """
+        conditions = []
+        values = []
+        if actor_type:
+            conditions.append("actor_type = ANY(%s)")
+            values.append(actor_type.split(","))
+
+        if group:
+            if not is_valid_uuid(group):
+                raise ValueError("Invalid group uuid")
+            conditions.append("uinfo->'groups' ? %s")
+            values.append(group)
+
+        if email:
+            conditions.append("lower(uinfo->>'email') LIKE %s")
+            values.append(escape_like(email.lower()) + "%")
+
+        if after:
+            created, uuid = decode_page_cursor(after, 2)
+            if not is_valid_uuid(uuid):
+                raise ValueError("Invalid page cursor")
+            conditions.append("(created, uuid) < (%s, %s::uuid)")
+            values += [datetime.fromisoformat(created), uuid]
+
+        query = "SELECT * FROM actor"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY created DESC, uuid DESC LIMIT %s"
+        # one more row tells if there is a next page
+        values.append(limit + 1)
+
+        actors = app.db.fetchall(query, values)
+        next_cursor = None
+        if len(actors) > limit:
+            actors = actors[:limit]
+            next_cursor = encode_page_cursor(
+                actors[-1].get("created"), actors[-1].get("uuid")
+            )
+
+        return [Actor(actor) for actor in actors], next_cursor
+
     def exists(self, **kwargs):
 
         query, values = self.exists_query(**kwargs)
 
-        with app.db.get_cursor() as cur:
-            cur.execute(query, values)
-            exists = cur.fetchone().get("exists")
+        exists = app.db.fetchone(query, values).get("exists")
 
         return exists
 
@@ -204,24 +407,94 @@ class ActorManager(BaseManager):
             raise ValueError("Invalid session_token")
 
         else:
-            with app.db.get_cursor() as cur:
-                cur.execute(
-                    "SELECT A.* FROM actor A INNER JOIN service_session_token S ON S.uuid = A.uuid "
-                    "WHERE S.session_token=%s",
-                    (session_token,),
-                )
-                actor = cur.fetchone()
+            # Session could be created right before, replicas may not have it yet
+            actor = app.db.fetchone(
+                "SELECT A.* FROM actor A INNER JOIN service_session_token S ON S.uuid = A.uuid "
+                "WHERE S.session_token=%s",
+                (session_token,),
+                prepared="auth_actor_by_session",
+                primary_on_miss=True,
+            )
+
+            if not actor:
+                raise ActorNotFound
 
-                if not actor:
-                    raise ActorNotFound
+            else:
+                return Actor(actor)
 
-                else:
-                    return Actor(actor)
+
+class AsyncActorManager(BaseManager):
+    """
+    ActorManager for asyncio services, queries go through app.async_db (AsyncDatabaseManager)
+    """
+
+    async def get(self, **kwargs):
+        if not kwargs:
+            raise ValueError("No filter parameters provided")
+
+        query, values = self.compile_query(**kwargs)
+
+        async with app.async_db.get_cursor() as cur:
+            await cur.execute(query, values)
+            actor = await cur.fetchall()
+
+        if not actor:
+            raise ActorNotFound
+
+        if len(actor) > 1:
+            raise MultipleObjectsReturned
+
+        else:
+            return Actor(actor[0])
+
+    async def filter(self, **kwargs):
+
+        query, values = self.compile_query(**kwargs)
+
+        async with app.async_db.get_cursor() as cur:
+            await cur.execute(query, values)
+            actors = await cur.fetchall()
+
+        return [Actor(actor) for actor in actors]
+
+    async def exists(self, **kwargs):
+
+        query, values = self.exists_query(**kwargs)
+
+        async with app.async_db.get_cursor() as cur:
+            await cur.execute(query, values)
+            exists = (await cur.fetchone()).get("exists")
+
+        return exists
+
+    @staticmethod
+    async def get_by_session(session_token=None):
+        """
+        Get actor by session token
+        :param session_token:
+        :return: Actor
+        """
+
+        if not session_token:
+            raise ValueError("Invalid session_token")
+
+        actor = await app.async_db.fetchone(
+            "SELECT A.* FROM actor A INNER JOIN service_session_token S ON S.uuid = A.uuid "
+            "WHERE S.session_token=%s",
+            (session_token,),
+            prepared="auth_actor_by_session",
+        )
+
+        if not actor:
+            raise ActorNotFound
+
+        return Actor(actor)
 
 
 class Actor:
 
     objects = ActorManager(table_name="actor")
+    async_objects = AsyncActorManager(table_name="actor")
 
     def __init__(self, actor: RealDictRow):
         self.uuid = actor.get("uuid")
@@ -243,9 +516,11 @@ class Actor:
         return json.loads(
             json.dumps(
                 self,
-                default=lambda o: datetime.strftime(o, "%Y-%m-%d %H:%M:%S")
-                if isinstance(o, datetime)
-                else o.__dict__,
+                default=lambda o: (
+                    datetime.strftime(o, "%Y-%m-%d %H:%M:%S")
+                    if isinstance(o, datetime)
+                    else o.__dict__
+                ),
             )
         )
 
@@ -296,7 +571,9 @@ class Actor:
         """
         if self.actor_type in ("user", "classic_user"):
             groups = self.uinfo.get("groups") if self.uinfo.get("groups") else []
-            list_of_groups = [self.objects.get(uuid=group) for group in groups]
+            list_of_groups, missing = self.objects.get_many(groups)
+            if missing:
+                raise ActorNotFound(f"No groups found: {', '.join(map(str, missing))}")
             return list_of_groups
         return []
 
@@ -306,12 +583,9 @@ class Actor:
         :return: list of actors
         """
         if self.actor_type == "group":
-            query = """SELECT uuid, uinfo FROM actor WHERE %s in (SELECT jsonb_array_elements_text(uinfo->'groups'))"""
+            query = """SELECT * FROM actor WHERE uinfo->'groups' ? %s"""
             values = [self.uuid]
-            with app.db.get_cursor() as cur:
-                cur.execute(query, values)
-                users = [Actor(user) for user in cur.fetchall()]
-            list_of_users = [self.objects.get(uuid=user.uuid) for user in users]
+            list_of_users = [Actor(user) for user in app.db.fetchall(query, values)]
             return list_of_users
         return []
 
@@ -415,9 +689,7 @@ class PermissionManager(BaseManager):
 
         query, values = self.compile_query(**kwargs)
 
-        with app.db.get_cursor() as cur:
-            cur.execute(query, values)
-            permission = cur.fetchall()
+        permission = app.db.fetchall(query, values)
 
         if not permission:
             raise ActorNotFound
@@ -432,9 +704,7 @@ class PermissionManager(BaseManager):
 
         query, values = self.compile_query(**kwargs)
 
-        with app.db.get_cursor() as cur:
-            cur.execute(query, values)
-            permissions = cur.fetchall()
+        permissions = app.db.fetchall(query, values)
 
         if not permissions:
             return []
@@ -442,6 +712,16 @@ class PermissionManager(BaseManager):
         else:
             return [Permission(permission) for permission in permissions]
 
+    def iterate(self, fetch_size: int = None, **kwargs) -> Iterator["Permission"]:
+        """
+        Iterate permissions matching kwargs like filter() without loading all of them in memory.
+        Exhaust or close the iterator to release the database connection.
+        :param fetch_size: rows fetched per round trip, DB_FETCH_SIZE by default
+        """
+        query, values = self.compile_query(**kwargs)
+        for permission in app.db.iterate(query, values, fetch_size=fetch_size):
+            yield Permission(permission)
+
 
 class Permission:
 
@@ -1,10 +1,11 @@
 from flask import current_app as app
-from flask import (g, jsonify, make_response, redirect, render_template,
-                   request, session, url_for)
+from flask import (Response, g, jsonify, make_response, redirect,
+                   render_template, request, session, stream_with_context,
+                   url_for)
 from flask.views import MethodView
 from flask_cors import cross_origin
 from psycopg2 import errors
-from werkzeug.exceptions import NotFound
+from werkzeug.exceptions import BadRequest, NotFound
 
 from .actions.actor_actions import CreateActorAction, DeleteActorAction
 from .actions.permactions_actions import (DeletePermactionAction,
@@ -16,6 +17,46 @@ from .actor import Actor, ActorNotFound
 from .decorators import admin_only, standalone_only, token_required
 from .utils import create_response_message, get_current_actor
 
+# Rows on one page of admin panel listings
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def stream_template(template_name: str, **context) -> Response:
+    """
+    Render template into a streamed response. Iterators in the context, like Actor.objects.iterate(),
+    are consumed while the page is sent, so neither the page nor all their rows are in memory at once.
+    """
+    app.update_template_context(context)
+    template = app.jinja_env.get_template(template_name)
+    stream = template.stream(context)
+    stream.enable_buffering(5)
+    return Response(stream_with_context(stream))
+
+
+def get_actors_page():
+    """
+    Page of actors by request args after, limit, actor_type, group and email
+    :return: actors, cursor of the next page and filters of the page
+    """
+    filters = {
+        key: request.args.get(key)
+        for key in ("actor_type", "group", "email")
+        if request.args.get(key)
+    }
+    try:
+        limit = int(request.args.get("limit", PAGE_SIZE))
+        if not 1 <= limit <= MAX_PAGE_SIZE:
+            raise ValueError("limit should be from 1 to %d" % MAX_PAGE_SIZE)
+
+        actors, next_cursor = Actor.objects.page(
+            limit=limit, after=request.args.get("after"), **filters
+        )
+    except ValueError as e:
+        raise BadRequest(str(e))
+
+    return actors, next_cursor, filters
+
 
 class AdminView(MethodView):
     """
@@ -62,9 +103,19 @@ class AdminActorsView(MethodView):
         Get page with list of actors
         @subm_flow  Get page with list of actors
         """
-        actors = Actor.objects.filter()
+        actors, next_cursor, filters = get_actors_page()
         groups = Actor.objects.filter(actor_type="group")
-        return render_template("admin_panel/actors.html", actors=actors, groups=groups)
+        # Group names of every row are taken from here, not with query per actor
+        groups_by_uuid = {group.uuid: group for group in groups}
+        # Members of a new group are searched by the form in admin_actors_list, not listed here
+        return stream_template(
+            "admin_panel/actors.html",
+            actors=actors,
+            groups=groups,
+            groups_by_uuid=groups_by_uuid,
+            next_cursor=next_cursor,
+            filters=filters,
+        )
 
     @standalone_only
     @admin_only
@@ -106,6 +157,31 @@ class AdminActorsView(MethodView):
         return make_response(jsonify(response), status)
 
 
+class AdminActorsListView(MethodView):
+    """
+    @GET Get page of actors in JSON@
+    """
+
+    @standalone_only
+    @admin_only
+    @cross_origin()
+    def get(self):
+        """
+        Get page of actors in JSON with the same args as actors page: after, limit, actor_type, group, email.
+        Response has actors and next, the cursor of the next page or null on the last page.
+        @subm_flow
+        """
+        actors, next_cursor, filters = get_actors_page()
+        result = []
+        for actor in actors:
+            actor = actor.to_dict()
+            if actor.get("uinfo"):
+                actor["uinfo"].pop("password", None)
+            result.append(actor)
+
+        return make_response(jsonify(dict(actors=result, next=next_cursor)), 200)
+
+
 class AdminActorView(MethodView):
     """
     @GET Get page with actor detail based on uuid@
@@ -134,11 +210,19 @@ class AdminActorView(MethodView):
                 uinfo.pop("password")
 
         # perms = actor.get_permissions()
-        perms = GetAllPermsAction(actor.uuid).execute()
-        actor_groups = {group.uuid: group for group in actor.get_groups()}
+        try:
+            action = GetAllPermsAction(
+                actor.uuid,
+                default_limit=PAGE_SIZE,
+                default_after=request.args.get("perms_after"),
+            )
+            perms = action.execute()
+        except ValueError as e:
+            raise BadRequest(str(e))
+        actor_groups = {group.uuid: group for group in action.actor_groups}
         groups = Actor.objects.filter(actor_type="group")
-        actors = Actor.objects.filter()
-        return render_template(
+        actors = Actor.objects.iterate()
+        return stream_template(
             "admin_panel/actor.html",
             actor=actor,
             perms=perms,
@@ -175,10 +259,18 @@ class AdminProfileView(MethodView):
         @subm_flow
         """
         actor = get_current_actor()
-        actor_groups = {group.uuid: group for group in actor.get_groups()}
         if not hasattr(g, "actor"):
             setattr(g, "actor", actor)
-        perms = GetAllPermsAction(actor.uuid).execute()
+        try:
+            action = GetAllPermsAction(
+                actor.uuid,
+                default_limit=PAGE_SIZE,
+                default_after=request.args.get("perms_after"),
+            )
+            perms = action.execute()
+        except ValueError as e:
+            raise BadRequest(str(e))
+        actor_groups = {group.uuid: group for group in action.actor_groups}
         return render_template(
             "admin_panel/profile.html", perms=perms, actor_groups=actor_groups
         )
@@ -1970,9 +1970,10 @@ class SaveSession(MethodView):
         session_token = request.json.get("session_token")
 
         if app.db.fetchone(
-            """SELECT EXISTS(SELECT 1 FROM service_session_token WHERE session_token = %s)""",
+            """SELECT session_token FROM service_session_token WHERE session_token = %s""",
             [session_token],
-        ).get("exists"):
+            primary_on_miss=True,
+        ):
             session["session_token"] = session_token
         else:
             print("Unknown session token - %s" % session_token)
@@ -2009,9 +2010,10 @@ class GetSession(MethodView):
 
         if temporary_session:
             if app.db.fetchone(
-                """SELECT EXISTS(SELECT 1 FROM temporary_session WHERE temporary_session = %s)""",
+                """SELECT temporary_session FROM temporary_session WHERE temporary_session = %s""",
                 [temporary_session],
-            ).get("exists"):
+                primary_on_miss=True,
+            ):
                 session_token = get_session_token_by_auxiliary(temporary_session)
                 if session_token:
                     app.db.execute(
@@ -2499,9 +2501,10 @@ class AuthSSOAuthorizationView(MethodView):
             if temporary_sessions.get("temporary_session", None):
                 temporary_session = temporary_sessions.pop("temporary_session")
                 if app.db.fetchone(
-                    """SELECT EXISTS(SELECT 1 FROM temporary_session WHERE temporary_session = %s)""",
+                    """SELECT temporary_session FROM temporary_session WHERE temporary_session = %s""",
                     [temporary_session],
-                ).get("exists"):
+                    primary_on_miss=True,
+                ):
                     session_token = get_session_token_by_auxiliary(temporary_session)
                     if session_token:
                         app.db.execute(
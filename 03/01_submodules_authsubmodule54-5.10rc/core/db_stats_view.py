@@ -0,0 +1,31 @@
+"""
+Debug view with database statistics. Registered on /db_stats/ only if DB_STATS_ENDPOINT and DB_INSTRUMENTATION are set.
+"""
+
+from flask import current_app as app
+from flask import jsonify, make_response, request
+from flask.views import MethodView
+
+from .actor import query_cache
+from .decorators import admin_only
+
+
+class DatabaseStatsView(MethodView):
+    """
+    @GET Get per endpoint query counts, slowest statements, connection pool metrics and manager query cache hits@
+    @DELETE Reset collected statistics@
+    """
+
+    @admin_only
+    def get(self):
+        limit = request.args.get("limit", 50, type=int)
+        stats = app.db.instrumentation.snapshot(limit=limit)
+        stats["pool"] = app.db.pool_metrics()
+        stats["query_cache"] = query_cache.stats()
+        return make_response(jsonify(stats), 200)
+
+    @admin_only
+    def delete(self):
+        app.db.instrumentation.reset()
+        query_cache.clear()
+        return make_response(jsonify({}), 200)
@@ -24,6 +24,19 @@ class DatabaseError(Exception):
         self.status_code = status_code
 
 
+class PoolTimeout(DatabaseError):
+    """
+    No database connection became available in the pool before the timeout
+    """
+
+    def __init__(
+        self,
+        message: str = _("Database connection pool timeout."),
+        status_code: int = 503,
+    ) -> None:
+        super().__init__(message=message, status_code=status_code)
+
+
 class Apt54Expired(HTTPException):
     """*454* `Apt54Expired`
 
@@ -0,0 +1,267 @@
+"""
+Database query instrumentation. Enabled with DB_INSTRUMENTATION setting. Usage:
+QueryInstrumentation(app) - wraps every DatabaseManager cursor, counts queries and DB time of the request in
+g.db_queries and g.db_time, logs slow queries and collects per endpoint and per query aggregates.
+app.db.instrumentation.snapshot() - aggregates, also available on /db_stats/ if DB_STATS_ENDPOINT is set.
+"""
+
+import hashlib
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, Type
+
+from flask import g, has_request_context, request
+from psycopg2 import sql
+from psycopg2.extensions import cursor as cursor_type
+
+logger = logging.getLogger("auth_perms.db")
+
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+PLACEHOLDER = re.compile(r"%\(\w+\)s|%s")
+NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+VALUES_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def normalize_sql(query: str) -> str:
+    """
+    Replace literals and placeholders with ? and collapse whitespace, so the same statement with different
+    parameters has the same text.
+    """
+    query = STRING_LITERAL.sub("?", query)
+    query = PLACEHOLDER.sub("?", query)
+    query = NUMBER_LITERAL.sub("?", query)
+    query = VALUES_LIST.sub("(?)", query)
+    return WHITESPACE.sub(" ", query).strip()
+
+
+def fingerprint(normalized_query: str) -> str:
+    """
+    Short parameter-free identifier of the statement
+    """
+    return hashlib.md5(normalized_query.lower().encode()).hexdigest()[:16]
+
+
+class InstrumentedCursorMixin:
+    """
+    Cursor mixin that reports duration of every executed statement to the instrumentation.
+    Named server-side cursors only declare the query on execute, their fetches are timed as well.
+    """
+
+    instrumentation = None
+    # fingerprint of the last executed statement
+    fingerprint = None
+
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            self.fingerprint = self.instrumentation.record(
+                self, query, time.perf_counter() - started
+            )
+
+    def executemany(self, query, vars_list):
+        started = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            self.fingerprint = self.instrumentation.record(
+                self, query, time.perf_counter() - started
+            )
+
+    def _timed_fetch(self, fetch, *args):
+        if not self.name:
+            return fetch(*args)
+
+        started = time.perf_counter()
+        try:
+            return fetch(*args)
+        finally:
+            self.instrumentation.record_fetch(self, time.perf_counter() - started)
+
+    def fetchone(self):
+        return self._timed_fetch(super().fetchone)
+
+    def fetchmany(self, size=None):
+        return self._timed_fetch(super().fetchmany, size)
+
+    def fetchall(self):
+        return self._timed_fetch(super().fetchall)
+
+    def __iter__(self):
+        if not self.name:
+            return super().__iter__()
+        return self._iterate_named()
+
+    def _iterate_named(self):
+        # itersize rows per round trip like the iteration of psycopg2, through the timed fetchmany
+        while True:
+            rows = self.fetchmany(self.itersize)
+            if not rows:
+                return
+            yield from rows
+
+
+class QueryInstrumentation:
+    """
+    Collects query counts and timings of the database manager of the app
+    """
+
+    def __init__(self, app=None, slow_query_ms: float = 100.0, n_plus_one: int = 10):
+        """
+        :param slow_query_ms: queries running longer are logged with warning level
+        :param n_plus_one: requests running the same statement this many times are logged as possible N+1
+        """
+        self.slow_query_ms = slow_query_ms
+        self.n_plus_one = n_plus_one
+        self.lock = threading.Lock()
+        self.endpoints: Dict[str, dict] = {}
+        self.queries: Dict[str, dict] = {}
+        self.cursor_factories: Dict[Type[cursor_type], Type[cursor_type]] = {}
+        if app:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.db.instrumentation = self
+        app.after_request(self._after_request)
+
+    def cursor_factory(self, base: Type[cursor_type]) -> Type[cursor_type]:
+        """
+        Instrumented subclass of the cursor class, created once per class
+        """
+        base = base or cursor_type
+        factory = self.cursor_factories.get(base)
+        if factory is None:
+            factory = type(
+                "Instrumented" + base.__name__,
+                (InstrumentedCursorMixin, base),
+                {"instrumentation": self},
+            )
+            self.cursor_factories[base] = factory
+        return factory
+
+    def record(self, cursor, query, duration: float) -> str:
+        if isinstance(query, sql.Composable):
+            query = query.as_string(cursor)
+        elif isinstance(query, bytes):
+            query = query.decode()
+
+        normalized = normalize_sql(query)
+        query_fingerprint = fingerprint(normalized)
+
+        if has_request_context():
+            g.db_queries = g.get("db_queries", 0) + 1
+            g.db_time = g.get("db_time", 0.0) + duration
+            if "db_statements" not in g:
+                g.db_statements = Counter()
+            g.db_statements[query_fingerprint] += 1
+
+        with self.lock:
+            stats = self.queries.get(query_fingerprint)
+            if stats is None:
+                stats = self.queries[query_fingerprint] = dict(
+                    fingerprint=query_fingerprint,
+                    query=normalized,
+                    calls=0,
+                    total_time=0.0,
+                    max_time=0.0,
+                )
+            stats["calls"] += 1
+            stats["total_time"] += duration
+            stats["max_time"] = max(stats["max_time"], duration)
+
+        if duration * 1000 >= self.slow_query_ms:
+            logger.warning(
+                "Slow query %.1f ms [%s] %s",
+                duration * 1000,
+                query_fingerprint,
+                normalized,
+            )
+
+        return query_fingerprint
+
+    def record_fetch(self, cursor, duration: float) -> None:
+        """
+        Fetch from a named server-side cursor. The time is added to the DB time of the request and to the
+        statement that declared the cursor, but fetches are not counted as queries, so a long scan doesn't
+        look like N+1.
+        """
+        if has_request_context():
+            g.db_time = g.get("db_time", 0.0) + duration
+
+        with self.lock:
+            stats = self.queries.get(cursor.fingerprint)
+            if stats is not None:
+                stats["total_time"] += duration
+
+        if duration * 1000 >= self.slow_query_ms:
+            logger.warning(
+                "Slow fetch %.1f ms [%s] from cursor %s",
+                duration * 1000,
+                cursor.fingerprint,
+                cursor.name,
+            )
+
+    def _after_request(self, response):
+        queries = g.get("db_queries", 0)
+        db_time = g.get("db_time", 0.0)
+        endpoint = request.endpoint or request.path
+
+        with self.lock:
+            stats = self.endpoints.get(endpoint)
+            if stats is None:
+                stats = self.endpoints[endpoint] = dict(
+                    requests=0, queries=0, db_time=0.0, max_queries=0, max_db_time=0.0
+                )
+            stats["requests"] += 1
+            stats["queries"] += queries
+            stats["db_time"] += db_time
+            stats["max_queries"] = max(stats["max_queries"], queries)
+            stats["max_db_time"] = max(stats["max_db_time"], db_time)
+
+        for query_fingerprint, count in g.get("db_statements", Counter()).items():
+            if count >= self.n_plus_one:
+                logger.info(
+                    "Possible N+1 on %s: [%s] %s executed %d times",
+                    endpoint,
+                    query_fingerprint,
+                    self.queries.get(query_fingerprint, {}).get("query"),
+                    count,
+                )
+
+        response.headers.add(
+            "Server-Timing", 'db;dur=%.1f;desc="%d queries"' % (db_time * 1000, queries)
+        )
+        return response
+
+    def snapshot(self, limit: int = 50) -> dict:
+        """
+        Per endpoint aggregates and the statements with the largest total time
+        :param limit: number of statements
+        """
+        with self.lock:
+            endpoints = {
+                endpoint: dict(
+                    stats,
+                    average_queries=stats["queries"] / stats["requests"],
+                    average_db_time=stats["db_time"] / stats["requests"],
+                )
+                for endpoint, stats in self.endpoints.items()
+            }
+            queries = sorted(
+                (dict(stats) for stats in self.queries.values()),
+                key=lambda stats: stats["total_time"],
+                reverse=True,
+            )[:limit]
+        return dict(endpoints=endpoints, queries=queries)
+
+    def reset(self) -> None:
+        with self.lock:
+            self.endpoints.clear()
+            self.queries.clear()
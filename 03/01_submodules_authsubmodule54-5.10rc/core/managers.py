@@ -1,19 +1,89 @@
+import asyncio
+import itertools
+import logging
+import random
 import re
-from contextlib import contextmanager
-from typing import AnyStr, Iterable, List, Optional
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+from functools import lru_cache, partial
+from typing import AnyStr, Callable, Iterable, Iterator, List, Optional, Tuple
 
 import psycopg2.extras
-from flask import (_request_ctx_stack, current_app, has_request_context,
+from flask import (_request_ctx_stack, current_app, g, has_request_context,
                    request, session)
-from psycopg2 import OperationalError, pool
+from psycopg2 import errors, sql
 from psycopg2.extensions import connection as connection_type
 from psycopg2.extensions import cursor as cursor_type
 from psycopg2.extras import RealDictCursor, RealDictRow
-from psycopg2.pool import PoolError, SimpleConnectionPool
 
 from .actor import Actor
-from .exceptions import DatabaseError
+from .exceptions import DatabaseError, PoolTimeout
 from .mixins import AnonymousUserMixin, UserMixin
+from .pool import ConnectionPool, ConnectionRecord
+
+try:
+    import aiopg
+except ImportError:
+    # optional, only AsyncDatabaseManager needs it
+    aiopg = None
+
+logger = logging.getLogger("auth_perms.db")
+
+STATEMENT_NAME = re.compile(r"[a-z_][a-z0-9_]*")
+PREPARED_PLACEHOLDER = re.compile(r"%s((?:::[\w\[\]]+)?)|%%")
+
+
+@lru_cache(maxsize=256)
+def prepared_statement(query: str) -> Tuple[str, str]:
+    """
+    Split query with %s placeholders into PREPARE body with $1..$n parameters and EXECUTE arguments.
+    Placeholder casts like %s::uuid[] are kept on both sides, so the parameter types are the same as with plain
+    execute.
+    :return: statement body and comma separated %s arguments
+    """
+    arguments = []
+
+    def replace(match):
+        if match.group(0) == "%%":
+            return "%"
+        arguments.append("%s" + match.group(1))
+        return "$%d%s" % (len(arguments), match.group(1))
+
+    body = PREPARED_PLACEHOLDER.sub(replace, query).strip().rstrip(";")
+    return body, ", ".join(arguments)
+
+
+READ_QUERY = re.compile(r"\s*SELECT\b", re.IGNORECASE)
+# prefixes on purpose, functions like insert_or_update_perms() change data too
+WRITE_KEYWORD = re.compile(
+    r"\b(?:INSERT|UPDATE|DELETE)|\bFOR\s+SHARE\b|\b(?:nextval|setval)\b", re.IGNORECASE
+)
+
+
+@lru_cache(maxsize=2048)
+def is_read_query(query: str) -> bool:
+    """
+    Plain SELECT that doesn't change data, so it may run on a replica
+    """
+    return bool(READ_QUERY.match(query)) and not WRITE_KEYWORD.search(query)
+
+
+def query_text(query) -> str:
+    """
+    Query text for is_read_query. Only SQL parts of sql.Composed are kept, identifiers and literals are
+    replaced with %s like the values of a plain query, so a table or value name can't look like a keyword.
+    """
+    if isinstance(query, str):
+        return query
+    if isinstance(query, bytes):
+        return query.decode()
+    if isinstance(query, sql.Composed):
+        return "".join(query_text(part) for part in query.seq)
+    if isinstance(query, sql.SQL):
+        return query.string
+    return "%s"
 
 
 # TODO: choose between this variant or .utils :467 user_context_processor()
@@ -83,8 +153,17 @@ class UserManager(object):
 class DatabaseManager(object):
     """
     Base database manager.
-    Creates pool with connections (default 10), automatically closing connection, create new connection
-    if pool is empty, base methods like execute, fetchone, fetchall.
+    Creates thread-safe pool with connections (default 10), waits for a free connection if pool is empty,
+    base methods like execute, fetchone, fetchall.
+    Every method call takes its own autocommit connection, inside transaction() they all use the connection
+    of the transaction.
+    With replicas, plain SELECTs of fetchone, fetchall and get_cursor(readonly=True) in a request go to a random
+    healthy replica until the request writes anything, after that the request reads from the primary and sees
+    its own writes. A replica that fails is out of rotation for replica_cooldown seconds.
+    Rows written by an earlier request and read right after it, like sessions and salts, are read with
+    primary_on_miss=True: a miss on the replica is read again from the primary, so replica lag can't hide
+    a new row. A deleted row, like a session after logout, can still be found on a replica for the
+    replication lag. primary=True always reads from the primary.
     """
 
     def __init__(
@@ -93,6 +172,13 @@ class DatabaseManager(object):
         dsn=None,
         min_connection: int = 1,
         max_connections: int = 10,
+        max_overflow: int = 0,
+        pool_timeout: float = 30.0,
+        connection_max_age: Optional[float] = 3600.0,
+        prepared_statements: bool = True,
+        replicas: Optional[List[str]] = None,
+        replica_cooldown: float = 30.0,
+        fetch_size: int = 2000,
     ) -> None:
         if not database and not dsn:
             raise DatabaseError("Database credentials or DSN is required")
@@ -103,13 +189,43 @@ class DatabaseManager(object):
         if dsn:
             self.validate_database_dsn(dsn)
 
+        for replica in replicas or []:
+            self.validate_database_dsn(replica)
+
         self.DATABASE = database
         self.DSN = dsn
         self.pool = self.create_pool(
-            min_connection=min_connection, max_connections=max_connections
+            min_connection=min_connection,
+            max_connections=max_connections,
+            max_overflow=max_overflow,
+            pool_timeout=pool_timeout,
+            connection_max_age=connection_max_age,
         )
-        self.connection = self.create_connection()
+        # replica connections are opened on demand, a replica being down doesn't stop the app
+        self.replica_pools = [
+            self.create_pool(
+                min_connection=0,
+                max_connections=max_connections,
+                max_overflow=max_overflow,
+                pool_timeout=pool_timeout,
+                connection_max_age=connection_max_age,
+                dsn=replica,
+            )
+            for replica in replicas or []
+        ]
+        self.replica_cooldown = replica_cooldown
+        # monotonic time until which the replica is out of rotation
+        self._replica_down_until = [0.0] * len(self.replica_pools)
         self.cursor = None
+        # rows of a server-side cursor fetched per round trip by iterate()
+        self.fetch_size = fetch_size
+        self._cursor_names = itertools.count()
+        # connection of the current transaction() of the thread
+        self._local = threading.local()
+        # disable when connections go through a proxy in transaction mode, like pgbouncer
+        self.prepared_statements = prepared_statements
+        # QueryInstrumentation, set when DB_INSTRUMENTATION is enabled
+        self.instrumentation = None
 
     def init_app(self, app):
         app.db = self
@@ -155,17 +271,19 @@ class DatabaseManager(object):
         if not db_name:
             raise DatabaseError("There is no port in db_name")
 
-    @staticmethod
     def _get_cursor(
-        connection: connection_type, cursor_factory: cursor_type
+        self, connection: connection_type, cursor_factory: cursor_type, name: str = None
     ) -> cursor_type:
         """
         Create cursor by connection
         :param connection: connection
         :param cursor_factory: type of needed cursor
+        :param name: name of server-side cursor, client-side cursor if not set
         :return: cursor
         """
-        cursor = connection.cursor(cursor_factory=cursor_factory)
+        if self.instrumentation:
+            cursor_factory = self.instrumentation.cursor_factory(cursor_factory)
+        cursor = connection.cursor(name=name, cursor_factory=cursor_factory)
         return cursor
 
     def close_connections(self) -> None:
@@ -173,6 +291,51 @@ class DatabaseManager(object):
         Close all connections in pool
         """
         self.pool.closeall()
+        for pool in self.replica_pools:
+            pool.closeall()
+
+    def _replica_index(self, connection: connection_type) -> Optional[int]:
+        for index, pool in enumerate(self.replica_pools):
+            if pool.record(connection) is not None:
+                return index
+        return None
+
+    def _pool_of(self, connection: connection_type) -> ConnectionPool:
+        if self.replica_pools and self.pool.record(connection) is None:
+            index = self._replica_index(connection)
+            if index is not None:
+                return self.replica_pools[index]
+        return self.pool
+
+    def _replica_failed(self, index: int) -> None:
+        self._replica_down_until[index] = time.monotonic() + self.replica_cooldown
+        logger.warning(
+            "Replica %d is out of rotation for %.0f s", index, self.replica_cooldown
+        )
+
+    def _replica_connection(self) -> Optional[connection_type]:
+        """
+        Connection of a random healthy replica, None when the read should go to the primary
+        """
+        if not self.replica_pools or not has_request_context() or g.get("db_primary"):
+            return None
+
+        now = time.monotonic()
+        healthy = [
+            index
+            for index, down_until in enumerate(self._replica_down_until)
+            if down_until <= now
+        ]
+        random.shuffle(healthy)
+        for index in healthy:
+            try:
+                return self.replica_pools[index].getconn()
+            except PoolTimeout:
+                continue
+            except DatabaseError:
+                self._replica_failed(index)
+
+        return None
 
     def put_connection(
         self, connection: connection_type, key=None, close: bool = False
@@ -183,30 +346,48 @@ class DatabaseManager(object):
         :param key:
         :param close: Flag if need close connection
         """
-        try:
-            self.pool.putconn(connection)
-        except Exception as e:
-            print("Error put connection")
-            connection.close()
+        if connection is getattr(self._local, "connection", None):
+            # returned by transaction() when it ends
+            return
 
-    def get_connection(self, autocommit: bool = True, key=None) -> connection_type:
+        self._pool_of(connection).putconn(connection, close=close)
+
+    def get_connection(
+        self,
+        autocommit: bool = True,
+        key=None,
+        readonly: bool = False,
+        primary: bool = False,
+    ) -> connection_type:
         """
         Getting connection object
         :param autocommit: boolean if connection is autocommit
         :param key:
+        :param readonly: connection is used only for reading, it may be a replica connection
+        :param primary: read from the primary, other reads of the request still go to replicas
         :return: connection
         """
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            return connection
+
+        connection = self._replica_connection() if readonly and not primary else None
+        if connection is None:
+            connection = self.pool.getconn()
+            if not readonly and has_request_context():
+                # the rest of the request reads from the primary and sees this write
+                g.db_primary = True
         try:
-            connection = self.pool.getconn(key=key)
-        except PoolError:
-            connection = self.create_connection()
-        except OperationalError:
-            connection = self.connection
-        connection.autocommit = autocommit
+            connection.autocommit = autocommit
+        except Exception:
+            self.put_connection(connection, close=True)
+            raise
         return connection
 
-    def create_connection(self) -> connection_type:
-        if self.DATABASE:
+    def create_connection(self, dsn: str = None) -> connection_type:
+        if dsn:
+            conn = psycopg2.connect(dsn)
+        elif self.DATABASE:
 
             port = self.DATABASE.get("PORT") or "5432"
             self.DATABASE.update(PORT=port)
@@ -226,15 +407,51 @@ class DatabaseManager(object):
         self,
         cursor_factory: Optional[cursor_type] = RealDictCursor,
         autocommit: bool = True,
+        readonly: bool = False,
+        primary: bool = False,
     ):
+        connection = self.get_connection(
+            autocommit=autocommit, readonly=readonly, primary=primary
+        )
         try:
-            connection = self.get_connection(autocommit=autocommit)
             cur = self._get_cursor(connection, cursor_factory=cursor_factory)
-            yield cur
-        except PoolError:
-            pass
-        else:
-            cur.close()
+            try:
+                yield cur
+            finally:
+                cur.close()
+        except psycopg2.OperationalError:
+            # the block can't be retried, but a replica that went away leaves the rotation
+            replica = self._replica_index(connection)
+            if replica is not None and connection.closed:
+                self._replica_failed(replica)
+            raise
+        finally:
+            self.put_connection(connection)
+
+    @contextmanager
+    def transaction(self):
+        """
+        Unit of work. One connection is taken for the block and used by execute, fetchone, fetchall, cur and
+        get_cursor called inside it in the same thread. Statements are committed once when the block ends
+        and rolled back if it raises. Nested transaction() calls join the outer one.
+        Usage:
+            with app.db.transaction():
+                app.db.execute(...)
+                app.db.fetchone(...)
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            yield connection
+            return
+
+        connection = self.get_connection(autocommit=False)
+        self._local.connection = connection
+        try:
+            yield connection
+            connection.commit()
+        finally:
+            self._local.connection = None
+            # the pool rolls back a transaction left open by an exception
             self.put_connection(connection)
 
     @property
@@ -243,14 +460,23 @@ class DatabaseManager(object):
         cursor_factory: Optional[cursor_type] = RealDictCursor,
         autocommit: bool = True,
     ) -> cursor_type:
+        return self._checkout_cursor(cursor_factory, autocommit)
 
+    def _checkout_cursor(
+        self,
+        cursor_factory: Optional[cursor_type] = RealDictCursor,
+        autocommit: bool = True,
+        readonly: bool = False,
+        primary: bool = False,
+    ) -> cursor_type:
+        connection = self.get_connection(
+            autocommit=autocommit, readonly=readonly, primary=primary
+        )
         try:
-            connection = self.get_connection(autocommit=autocommit)
-            cursor = self._get_cursor(connection, cursor_factory=cursor_factory)
-        except PoolError:
-            connection = self.create_connection()
-            connection.autocommit = autocommit
             cursor = self._get_cursor(connection, cursor_factory=cursor_factory)
+        except Exception:
+            self.put_connection(connection)
+            raise
 
         return cursor
 
@@ -260,83 +486,460 @@ class DatabaseManager(object):
             self.put_connection(cursor.connection)
 
     def create_pool(
-        self, min_connection: int, max_connections: int
-    ) -> SimpleConnectionPool:
+        self,
+        min_connection: int,
+        max_connections: int,
+        max_overflow: int = 0,
+        pool_timeout: float = 30.0,
+        connection_max_age: Optional[float] = 3600.0,
+        dsn: str = None,
+    ) -> ConnectionPool:
         """
         Creates postgres connection pool
+        :param dsn: database of the pool, DATABASE or DSN of the manager by default
         """
-        if self.DATABASE:
-            port = self.DATABASE.get("PORT") or "5432"
-            con_pool = psycopg2.pool.SimpleConnectionPool(
-                minconn=min_connection,
-                maxconn=max_connections,
-                user=self.DATABASE.get("USER"),
-                password=self.DATABASE.get("PASSWORD"),
-                host=self.DATABASE.get("HOST"),
-                port=port,
-                database=self.DATABASE.get("NAME"),
-            )
-        elif self.DSN:
-            con_pool = psycopg2.pool.SimpleConnectionPool(
-                minconn=min_connection, maxconn=max_connections, dsn=self.DSN
-            )
-        else:
+        if not self.DATABASE and not self.DSN:
             raise DatabaseError("There is no any database credentials")
 
-        return con_pool
+        return ConnectionPool(
+            connect=partial(self.create_connection, dsn),
+            min_connections=min_connection,
+            max_connections=max_connections,
+            max_overflow=max_overflow,
+            timeout=pool_timeout,
+            max_age=connection_max_age,
+        )
 
-    def fetchall(self, query: AnyStr, values: Iterable = None) -> List[RealDictRow]:
+    def pool_metrics(self) -> dict:
         """
-        Fetch all records matching query from db
-        :param query: SQL query string
+        Connection pool metrics: connections in use, idle, overflow, waiters and checkout wait times,
+        the same for every replica under replicas key
+        """
+        metrics = self.pool.metrics()
+        if self.replica_pools:
+            now = time.monotonic()
+            metrics["replicas"] = [
+                dict(pool.metrics(), healthy=down_until <= now)
+                for pool, down_until in zip(
+                    self.replica_pools, self._replica_down_until
+                )
+            ]
+        return metrics
+
+    @staticmethod
+    def _prepare(
+        cursor: cursor_type, record: ConnectionRecord, name: str, body: str
+    ) -> None:
+        if not STATEMENT_NAME.fullmatch(name):
+            raise DatabaseError("Invalid prepared statement name %s" % name)
+
+        cursor.execute("PREPARE %s AS %s" % (name, body))
+        record.prepared.add(name)
+
+    def execute_prepared(
+        self, cursor: cursor_type, name: str, query: str, values: Iterable = None
+    ) -> None:
+        """
+        Execute query as named server-side prepared statement. Statement is prepared on the first use on every
+        pooled connection, then only EXECUTE is sent and postgres skips parsing and planning.
+        Statements lost by the server, for example after a connection reset by a proxy, are prepared again.
+        Connections not taken from the pool and disabled DB_PREPARED_STATEMENTS fall back to plain execute.
+        :param cursor: cursor of a pooled connection
+        :param name: statement name, lowercase identifier unique for the query
+        :param query: SQL query string with %s placeholders
         :param values: values to populate query string
-        :return: matched records from DB
         """
+        record = (
+            self._pool_of(cursor.connection).record(cursor.connection)
+            if self.prepared_statements
+            else None
+        )
+        if record is None:
+            cursor.execute(query, values)
+            return
 
-        cur = self.cur
+        body, arguments = prepared_statement(query)
+        execute_query = (
+            "EXECUTE %s (%s)" % (name, arguments) if arguments else "EXECUTE " + name
+        )
+        if name not in record.prepared:
+            self._prepare(cursor, record, name, body)
 
         try:
-            cur.execute(query, values)
-            result = cur.fetchall()
-            self.close_cursor(cur)
-        except Exception as e:
+            cursor.execute(execute_query, values)
+        except errors.InvalidSqlStatementName:
+            record.prepared.discard(name)
+            # failed statement aborts the transaction, retry only in autocommit mode
+            if not cursor.connection.autocommit:
+                raise
+            self._prepare(cursor, record, name, body)
+            cursor.execute(execute_query, values)
+        except errors.FeatureNotSupported:
+            # cached plan must not change result type, table was altered after PREPARE
+            if not cursor.connection.autocommit:
+                raise
+            cursor.execute("DEALLOCATE %s" % name)
+            record.prepared.discard(name)
+            self._prepare(cursor, record, name, body)
+            cursor.execute(execute_query, values)
+
+    def _execute(
+        self, cursor: cursor_type, query: AnyStr, values: Iterable, prepared: str
+    ) -> None:
+        if prepared:
+            self.execute_prepared(cursor, prepared, query, values)
+        else:
+            cursor.execute(query, values)
+
+    def _fetch(
+        self,
+        query: AnyStr,
+        values: Iterable,
+        prepared: str,
+        fetch: Callable[[cursor_type], object],
+        primary: bool = False,
+        primary_on_miss: bool = False,
+    ):
+        """
+        Run query on a replica if it is a plain SELECT, otherwise on the primary, and fetch the result
+        """
+        readonly = is_read_query(query_text(query))
+        cur = self._checkout_cursor(readonly=readonly, primary=primary)
+
+        try:
+            self._execute(cur, query, values, prepared)
+            result = fetch(cur)
+            if result or not primary_on_miss:
+                return result
+            if self._replica_index(cur.connection) is None:
+                return result
+            # the row may be written shortly before and not replicated yet
+            primary = True
+        except psycopg2.OperationalError:
+            replica = self._replica_index(cur.connection)
+            if replica is None or not cur.connection.closed:
+                raise
+            # replica went away in the middle of the query, read again from another replica or the primary
+            self._replica_failed(replica)
+        finally:
             self.close_cursor(cur)
-            raise e
 
-        return result
+        return self._fetch(query, values, prepared, fetch, primary, primary_on_miss)
 
-    def fetchone(self, query: AnyStr, values: Iterable = None) -> RealDictRow:
+    def iterate(
+        self,
+        query: AnyStr,
+        values: Iterable = None,
+        fetch_size: int = None,
+        cursor_factory: Optional[cursor_type] = RealDictCursor,
+    ) -> Iterator[RealDictRow]:
+        """
+        Iterate records matching query with a named server-side cursor, only fetch_size rows are in memory at
+        once. The connection is held until the iterator is exhausted or closed. Read queries run on a replica
+        if there are replicas.
+        :param query: SQL query string
+        :param values: values to populate query string
+        :param fetch_size: rows fetched per round trip, fetch_size of the manager by default
+        :return: iterator of matched records
+        """
+        # server-side cursors live in a transaction
+        connection = self.get_connection(
+            autocommit=False, readonly=is_read_query(query_text(query))
+        )
+        try:
+            cur = self._get_cursor(
+                connection,
+                cursor_factory=cursor_factory,
+                name="auth_cursor_%d" % next(self._cursor_names),
+            )
+            try:
+                cur.itersize = fetch_size or self.fetch_size
+                cur.execute(query, values)
+                yield from cur
+            finally:
+                cur.close()
+        finally:
+            # the pool ends the read transaction
+            self.put_connection(connection)
+
+    def fetchall(
+        self,
+        query: AnyStr,
+        values: Iterable = None,
+        prepared: str = None,
+        primary: bool = False,
+        primary_on_miss: bool = False,
+    ) -> List[RealDictRow]:
+        """
+        Fetch all records matching query from db
+        :param query: SQL query string
+        :param values: values to populate query string
+        :param prepared: name of server-side prepared statement for the query, see execute_prepared
+        :param primary: read from the primary even with replicas
+        :param primary_on_miss: read again from the primary if a replica has no records, for rows written
+            by an earlier request
+        :return: matched records from DB
+        """
+        return self._fetch(
+            query,
+            values,
+            prepared,
+            lambda cur: cur.fetchall(),
+            primary,
+            primary_on_miss,
+        )
+
+    def fetchone(
+        self,
+        query: AnyStr,
+        values: Iterable = None,
+        prepared: str = None,
+        primary: bool = False,
+        primary_on_miss: bool = False,
+    ) -> RealDictRow:
         """
         Fetch one record matching query from db
         :param query: SQL query string
         :param values: values to populate query string
+        :param prepared: name of server-side prepared statement for the query, see execute_prepared
+        :param primary: read from the primary even with replicas
+        :param primary_on_miss: read again from the primary if a replica has no record, for rows written
+            by an earlier request
         :return: matched records from DB
         """
+        return self._fetch(
+            query,
+            values,
+            prepared,
+            lambda cur: cur.fetchone(),
+            primary,
+            primary_on_miss,
+        )
+
+    def execute(
+        self, query: AnyStr, values: Iterable = None, prepared: str = None
+    ) -> None:
+        """
+        Execute query
+        :param query: SQL query string
+        :param values: values to populate query string
+        :param prepared: name of server-side prepared statement for the query, see execute_prepared
+        """
 
         cur = self.cur
 
         try:
-            cur.execute(query, values)
-            result = cur.fetchone()
+            self._execute(cur, query, values, prepared)
             self.close_cursor(cur)
         except Exception as e:
             self.close_cursor(cur)
             raise e
 
-        return result
 
-    def execute(self, query: AnyStr, values: Iterable = None) -> None:
+class AsyncDatabaseManager(object):
+    """
+    Asyncio counterpart of DatabaseManager built on aiopg for services running on an event loop.
+    Coroutine versions of execute, fetchone, fetchall and async get_cursor, records are RealDictRow as well.
+    Pool is created on the first query in the running event loop, connections are in autocommit mode.
+    Usage:
+        actor = await app.async_db.fetchone("SELECT * FROM actor WHERE uuid=%s", [uuid])
+    """
+
+    def __init__(
+        self,
+        database=None,
+        dsn=None,
+        min_connection: int = 1,
+        max_connections: int = 10,
+        pool_timeout: float = 30.0,
+        prepared_statements: bool = True,
+    ) -> None:
+        if aiopg is None:
+            raise DatabaseError("aiopg is required for AsyncDatabaseManager")
+
+        if not database and not dsn:
+            raise DatabaseError("Database credentials or DSN is required")
+
+        if database:
+            DatabaseManager.validate_database_dict(database)
+
+        if dsn:
+            DatabaseManager.validate_database_dsn(dsn)
+
+        self.DATABASE = database
+        self.DSN = dsn
+        self.min_connection = min_connection
+        self.max_connections = max_connections
+        self.pool_timeout = pool_timeout
+        self.prepared_statements = prepared_statements
+        self.pool = None
+        # created in the running event loop, python 3.9 locks are bound to a loop
+        self._pool_lock = None
+        # names of statements prepared on every pooled connection, forgotten with the connection
+        self._prepared = weakref.WeakKeyDictionary()
+
+    def init_app(self, app):
+        app.async_db = self
+
+    def get_dsn(self) -> str:
+        if self.DATABASE:
+            return (
+                "dbname={NAME} user={USER} password={PASSWORD} host={HOST} "
+                "port={PORT}".format(
+                    **dict(self.DATABASE, PORT=self.DATABASE.get("PORT") or "5432")
+                )
+            )
+
+        return self.DSN
+
+    async def create_pool(self):
         """
-        Execute query
+        Creates aiopg connection pool once
+        """
+        if self.pool is None:
+            if self._pool_lock is None:
+                self._pool_lock = asyncio.Lock()
+            async with self._pool_lock:
+                if self.pool is None:
+                    try:
+                        self.pool = await aiopg.create_pool(
+                            self.get_dsn(),
+                            minsize=self.min_connection,
+                            maxsize=self.max_connections,
+                        )
+                    except psycopg2.Error as e:
+                        raise DatabaseError("Could not connect to database: %s" % e)
+
+        return self.pool
+
+    async def close_connections(self) -> None:
+        """
+        Close all connections in pool
+        """
+        if self.pool is not None:
+            self.pool.close()
+            await self.pool.wait_closed()
+            self.pool = None
+
+    def pool_metrics(self) -> dict:
+        """
+        Connection pool metrics: connections in use and idle
+        """
+        if self.pool is None:
+            return dict(size=0, idle=0, in_use=0, max_connections=self.max_connections)
+
+        return dict(
+            size=self.pool.size,
+            idle=self.pool.freesize,
+            in_use=self.pool.size - self.pool.freesize,
+            max_connections=self.max_connections,
+        )
+
+    @asynccontextmanager
+    async def get_cursor(self, cursor_factory: Optional[cursor_type] = RealDictCursor):
+        pool = await self.create_pool()
+        try:
+            connection = await asyncio.wait_for(pool.acquire(), self.pool_timeout)
+        except asyncio.TimeoutError:
+            raise PoolTimeout()
+
+        try:
+            cur = await connection.cursor(cursor_factory=cursor_factory)
+            try:
+                yield cur
+            finally:
+                cur.close()
+        finally:
+            await pool.release(connection)
+
+    async def _prepare(self, cursor, prepared: set, name: str, body: str) -> None:
+        if not STATEMENT_NAME.fullmatch(name):
+            raise DatabaseError("Invalid prepared statement name %s" % name)
+
+        await cursor.execute("PREPARE %s AS %s" % (name, body))
+        prepared.add(name)
+
+    async def execute_prepared(
+        self, cursor, name: str, query: str, values: Iterable = None
+    ) -> None:
+        """
+        Execute query as named server-side prepared statement, see DatabaseManager.execute_prepared.
+        Pooled aiopg connections are in autocommit mode, so lost or outdated statements are always prepared
+        again.
+        :param cursor: aiopg cursor from get_cursor
+        :param name: statement name, lowercase identifier unique for the query
+        :param query: SQL query string with %s placeholders
+        :param values: values to populate query string
+        """
+        if not self.prepared_statements:
+            await cursor.execute(query, values)
+            return
+
+        prepared = self._prepared.setdefault(cursor.connection, set())
+        body, arguments = prepared_statement(query)
+        execute_query = (
+            "EXECUTE %s (%s)" % (name, arguments) if arguments else "EXECUTE " + name
+        )
+        if name not in prepared:
+            await self._prepare(cursor, prepared, name, body)
+
+        try:
+            await cursor.execute(execute_query, values)
+        except errors.InvalidSqlStatementName:
+            prepared.discard(name)
+            await self._prepare(cursor, prepared, name, body)
+            await cursor.execute(execute_query, values)
+        except errors.FeatureNotSupported:
+            # cached plan must not change result type, table was altered after PREPARE
+            await cursor.execute("DEALLOCATE %s" % name)
+            prepared.discard(name)
+            await self._prepare(cursor, prepared, name, body)
+            await cursor.execute(execute_query, values)
+
+    async def _execute(
+        self, cursor, query: AnyStr, values: Iterable, prepared: str
+    ) -> None:
+        if prepared:
+            await self.execute_prepared(cursor, prepared, query, values)
+        else:
+            await cursor.execute(query, values)
+
+    async def fetchall(
+        self, query: AnyStr, values: Iterable = None, prepared: str = None
+    ) -> List[RealDictRow]:
+        """
+        Fetch all records matching query from db
         :param query: SQL query string
         :param values: values to populate query string
+        :param prepared: name of server-side prepared statement for the query, see execute_prepared
+        :return: matched records from DB
         """
+        async with self.get_cursor() as cur:
+            await self._execute(cur, query, values, prepared)
+            return await cur.fetchall()
 
-        cur = self.cur
+    async def fetchone(
+        self, query: AnyStr, values: Iterable = None, prepared: str = None
+    ) -> RealDictRow:
+        """
+        Fetch one record matching query from db
+        :param query: SQL query string
+        :param values: values to populate query string
+        :param prepared: name of server-side prepared statement for the query, see execute_prepared
+        :return: matched records from DB
+        """
+        async with self.get_cursor() as cur:
+            await self._execute(cur, query, values, prepared)
+            return await cur.fetchone()
 
-        try:
-            cur.execute(query, values)
-            self.close_cursor(cur)
-        except Exception as e:
-            self.close_cursor(cur)
-            raise e
+    async def execute(
+        self, query: AnyStr, values: Iterable = None, prepared: str = None
+    ) -> None:
+        """
+        Execute query
+        :param query: SQL query string
+        :param values: values to populate query string
+        :param prepared: name of server-side prepared statement for the query, see execute_prepared
+        """
+        async with self.get_cursor() as cur:
+            await self._execute(cur, query, values, prepared)
@@ -0,0 +1,31 @@
+from . import base
+
+
+class Migration(base.BaseMigration):
+    """
+    Create indexes for keyset pagination of actors and default permactions in admin panel.
+    Pages are ordered by (created, uuid), filters are by actor type, group membership and email prefix.
+    Indexes are built CONCURRENTLY, so actor and permaction writes aren't blocked on large tables.
+    """
+
+    table_name = "listing_indexes"
+    separate_statements = True
+    forwards_query = f"""
+
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS actor_created_uuid_idx ON actor(created, uuid);
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS actor_type_created_uuid_idx
+            ON actor(actor_type, created, uuid);
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS actor_groups_idx ON actor USING gin ((uinfo->'groups'));
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS actor_email_idx
+            ON actor(lower(uinfo->>'email') text_pattern_ops);
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS default_permaction_created_idx
+            ON default_permaction(created, permaction_uuid, service_uuid);
+        """
+
+    backwards_query = f"""
+        DROP INDEX CONCURRENTLY IF EXISTS actor_created_uuid_idx;
+        DROP INDEX CONCURRENTLY IF EXISTS actor_type_created_uuid_idx;
+        DROP INDEX CONCURRENTLY IF EXISTS actor_groups_idx;
+        DROP INDEX CONCURRENTLY IF EXISTS actor_email_idx;
+        DROP INDEX CONCURRENTLY IF EXISTS default_permaction_created_idx;
+    """
@@ -82,17 +82,28 @@ class BaseMigration:
     table_name = None
     forwards_query = None
     backwards_query = None
+    # execute statements of the queries one by one, for statements not allowed in a transaction block
+    # like CREATE INDEX CONCURRENTLY, several statements in one execute run in one transaction
+    separate_statements = False
+
+    def execute(self, query):
+        with app.db.get_cursor() as cur:
+            if not self.separate_statements:
+                cur.execute(query)
+                return
+
+            for statement in query.split(";"):
+                if statement.strip():
+                    cur.execute(statement)
 
     def forwards(self):
         if not self.forwards_query:
             raise ValueError("forwards_query can not be None or empty")
 
-        with app.db.get_cursor() as cur:
-            cur.execute(self.forwards_query)
+        self.execute(self.forwards_query)
 
     def backwards(self):
         if not self.backwards_query:
             raise ValueError("backwards_query can not be None or empty")
 
-        with app.db.get_cursor() as cur:
-            cur.execute(self.backwards_query)
+        self.execute(self.backwards_query)
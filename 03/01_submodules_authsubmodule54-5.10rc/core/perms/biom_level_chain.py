@@ -57,6 +57,7 @@ class BiomLevelPermactionChain(BasePerms):
                 AND APA.permaction_uuid=%s;
         """,
             (self.user.uuid, self.service_uuid, self.permaction_uuid),
+            prepared="auth_actor_permaction",
         )
 
         if not result:
@@ -79,6 +80,7 @@ class BiomLevelPermactionChain(BasePerms):
                     self.permaction_uuid,
                     self.user.uinfo.get("groups"),
                 ),
+                prepared="auth_group_permaction",
             )
 
         if not result:
@@ -92,6 +94,7 @@ class BiomLevelPermactionChain(BasePerms):
                     AND permaction_uuid=%s
             """,
                 (self.service_uuid, self.permaction_uuid),
+                prepared="auth_default_permaction",
             )
 
         return result
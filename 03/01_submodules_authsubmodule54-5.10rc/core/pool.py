@@ -0,0 +1,270 @@
+"""
+Thread-safe pool of database connections used by DatabaseManager. Usage:
+pool = ConnectionPool(connect=create_connection, min_connections=1, max_connections=10)
+connection = pool.getconn() - blocks until a connection is free or the timeout is reached
+pool.putconn(connection) - returns the connection, always call it in finally
+pool.metrics() - current pool state and wait times
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Optional, Set
+
+from psycopg2 import Error as Psycopg2Error
+from psycopg2.extensions import (TRANSACTION_STATUS_IDLE,
+                                 TRANSACTION_STATUS_UNKNOWN)
+from psycopg2.extensions import connection as connection_type
+
+from .exceptions import DatabaseError, PoolTimeout
+
+
+class ConnectionRecord:
+    """
+    Pool bookkeeping of one open connection
+    """
+
+    def __init__(self, connection: connection_type) -> None:
+        self.connection = connection
+        self.created = time.monotonic()
+        self.last_used = self.created
+        # names of server-side prepared statements, they live as long as the connection
+        self.prepared: Set[str] = set()
+
+
+class ConnectionPool:
+    """
+    Pool with blocking checkout. Up to max_connections connections are kept open, when all of them are in use
+    up to max_overflow extra connections are opened and closed again on return, after that getconn() waits
+    for a returned connection up to timeout seconds and raises PoolTimeout.
+    Connections older than max_age seconds are recycled, connections idle for more than validate_after seconds
+    are checked with SELECT 1 before checkout, broken ones are replaced.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], connection_type],
+        min_connections: int = 1,
+        max_connections: int = 10,
+        max_overflow: int = 0,
+        timeout: float = 30.0,
+        max_age: Optional[float] = 3600.0,
+        validate_after: float = 5.0,
+    ) -> None:
+        if max_connections < 1 or not 0 <= min_connections <= max_connections:
+            raise DatabaseError(
+                "Pool needs 0 <= min_connections <= max_connections and max_connections >= 1"
+            )
+
+        self._connect = connect
+        self.min_connections = min_connections
+        self.max_connections = max_connections
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.max_age = max_age
+        self.validate_after = validate_after
+
+        self._condition = threading.Condition()
+        self._idle: Deque[ConnectionRecord] = deque()
+        self._records: Dict[int, ConnectionRecord] = {}
+        # connections being opened are counted before connect() returns
+        self._opening = 0
+        self._closed = False
+
+        self._waiters = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._recycled = 0
+        self._wait_time = 0.0
+        self._max_wait_time = 0.0
+
+        for _ in range(min_connections):
+            record = self._open()
+            self._records[id(record.connection)] = record
+            self._idle.append(record)
+
+    @property
+    def size(self) -> int:
+        return len(self._records) + self._opening
+
+    def record(self, connection: connection_type) -> Optional[ConnectionRecord]:
+        """
+        Bookkeeping of a connection taken from this pool, None for unknown connections
+        """
+        record = self._records.get(id(connection))
+        if record is None or record.connection is not connection:
+            return None
+        return record
+
+    def _open(self) -> ConnectionRecord:
+        try:
+            connection = self._connect()
+        except Psycopg2Error as e:
+            raise DatabaseError("Could not connect to database: %s" % e)
+
+        return ConnectionRecord(connection)
+
+    def _discard(self, record: ConnectionRecord) -> None:
+        """
+        Close the connection and free its place in the pool, call without holding the lock
+        """
+        with self._condition:
+            self._records.pop(id(record.connection), None)
+            self._condition.notify()
+        try:
+            record.connection.close()
+        except Psycopg2Error:
+            pass
+
+    def _is_usable(self, record: ConnectionRecord) -> bool:
+        connection = record.connection
+        now = time.monotonic()
+        if connection.closed:
+            return False
+
+        if self.max_age is not None and now - record.created > self.max_age:
+            with self._condition:
+                self._recycled += 1
+            return False
+
+        if connection.get_transaction_status() == TRANSACTION_STATUS_UNKNOWN:
+            return False
+
+        if now - record.last_used > self.validate_after:
+            try:
+                connection.autocommit = True
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+            except Psycopg2Error:
+                return False
+
+        return True
+
+    def getconn(self, timeout: Optional[float] = None) -> connection_type:
+        """
+        Take a connection from the pool
+        :param timeout: seconds to wait for a free connection, pool timeout by default
+        :return: connection
+        """
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+
+        while True:
+            record = None
+            with self._condition:
+                while True:
+                    if self._closed:
+                        raise DatabaseError("Connection pool is closed")
+
+                    if self._idle:
+                        record = self._idle.pop()
+                        break
+
+                    if self.size < self.max_connections + self.max_overflow:
+                        self._opening += 1
+                        break
+
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeout()
+
+                    self._waiters += 1
+                    try:
+                        self._condition.wait(remaining)
+                    finally:
+                        self._waiters -= 1
+
+            if record is None:
+                try:
+                    record = self._open()
+                finally:
+                    with self._condition:
+                        self._opening -= 1
+                        if record is not None:
+                            self._records[id(record.connection)] = record
+                        else:
+                            self._condition.notify()
+            elif not self._is_usable(record):
+                self._discard(record)
+                continue
+
+            waited = time.monotonic() - started
+            with self._condition:
+                self._checkouts += 1
+                self._wait_time += waited
+                self._max_wait_time = max(self._max_wait_time, waited)
+            return record.connection
+
+    def putconn(self, connection: connection_type, close: bool = False) -> None:
+        """
+        Return a connection to the pool. Open transactions are rolled back, overflow and broken connections are
+        closed.
+        :param connection: connection taken with getconn()
+        :param close: close the connection instead of keeping it in the pool
+        """
+        record = self.record(connection)
+        if record is None:
+            connection.close()
+            return
+
+        if not close and not connection.closed:
+            if connection.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+                try:
+                    connection.rollback()
+                except Psycopg2Error:
+                    close = True
+
+        with self._condition:
+            keep = (
+                not close
+                and not connection.closed
+                and not self._closed
+                and len(self._records) <= self.max_connections
+            )
+            if keep:
+                record.last_used = time.monotonic()
+                self._idle.append(record)
+                self._condition.notify()
+                return
+
+        self._discard(record)
+
+    def closeall(self) -> None:
+        """
+        Close idle connections and close connections in use when they are returned
+        """
+        with self._condition:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._condition.notify_all()
+
+        for record in idle:
+            self._discard(record)
+
+    def metrics(self) -> dict:
+        """
+        Current pool state
+        :return: dict with connections count, waiters and checkout wait times in seconds
+        """
+        with self._condition:
+            idle = len(self._idle)
+            return dict(
+                size=self.size,
+                idle=idle,
+                in_use=self.size - idle,
+                overflow=max(0, self.size - self.max_connections),
+                max_connections=self.max_connections,
+                max_overflow=self.max_overflow,
+                waiters=self._waiters,
+                checkouts=self._checkouts,
+                timeouts=self._timeouts,
+                recycled=self._recycled,
+                wait_time_total=self._wait_time,
+                wait_time_max=self._max_wait_time,
+                wait_time_average=(
+                    self._wait_time / self._checkouts if self._checkouts else 0.0
+                ),
+            )
@@ -1,7 +1,7 @@
 from . import auth_submodule
 from .actor_view import ActorView, GetActorsViewByEmail
-from .admin_view import (AdminActorsView, AdminActorView, AdminPermissionView,
-                         AdminProfileView, AdminView)
+from .admin_view import (AdminActorsListView, AdminActorsView, AdminActorView,
+                         AdminPermissionView, AdminProfileView, AdminView)
 from .auth_view import (AboutView, APT54View, AuthorizationView,
                         AuthQRCodeAuthorizationView, AuthSSOAuthorizationView,
                         AuthSSOGenerationView, ClientAuthView, GetQRCodeView,
@@ -89,6 +89,10 @@ auth_submodule.add_url_rule(
 auth_submodule.add_url_rule(
     "/auth_admin/actors/", view_func=AdminActorsView.as_view("admin_actors")
 )
+auth_submodule.add_url_rule(
+    "/auth_admin/actors/list/",
+    view_func=AdminActorsListView.as_view("admin_actors_list"),
+)  # Page of actors in JSON
 auth_submodule.add_url_rule(
     "/auth_admin/actor/<uuid>/", view_func=AdminActorView.as_view("admin_actor")
 )
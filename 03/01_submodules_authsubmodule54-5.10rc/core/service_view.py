@@ -66,6 +66,7 @@ class BaseServiceCommunication:
         apt54 = app.db.fetchone(
             """SELECT apt54 FROM service_session_token WHERE uuid = %s AND service_uuid = %s""",
             [app.config["SERVICE_UUID"], self.service.uuid],
+            primary_on_miss=True,
         )
 
         if not apt54:
@@ -114,6 +115,7 @@ class BaseServiceCommunication:
             """SELECT session_token, apt54 FROM service_session_token WHERE uuid = %s 
         AND service_uuid = %s ORDER BY created DESC""",
             [app.config["SERVICE_UUID"], self.service.uuid],
+            primary_on_miss=True,
         )
 
         if not session_token:
@@ -361,13 +363,14 @@ class GetAndUpdateGroups(BaseServiceCommunication):
             "DO UPDATE SET uinfo = EXCLUDED.uinfo WHERE actor.uuid = EXCLUDED.uuid"
         )
         values = [json_dumps(actors)]
-        app.db.execute(query, values)
-        if not self.data:
-            # Need to delete groups that not in list. Cause we got all groups
-            groups_uuid = [value.get("uuid") for value in actors]
-            query = "DELETE FROM actor WHERE actor_type = 'group' AND NOT (uuid = ANY(%s::uuid[]))"
-            values = [groups_uuid]
+        with app.db.transaction():
             app.db.execute(query, values)
+            if not self.data:
+                # Need to delete groups that not in list. Cause we got all groups
+                groups_uuid = [value.get("uuid") for value in actors]
+                query = "DELETE FROM actor WHERE actor_type = 'group' AND NOT (uuid = ANY(%s::uuid[]))"
+                values = [groups_uuid]
+                app.db.execute(query, values)
 
         return actors
 
@@ -392,26 +395,28 @@ class GetAndUpdatePermissions(BaseServiceCommunication):
 
         content = json.loads(response.content)
         permissions = content.get("permissions")
-        if not self.data and permissions:
-            # Need to remove old perms, cause they may be deleted on auth
-            groups = [value.get("actor_id") for value in permissions]
-            query = "DELETE FROM permissions WHERE actor_id = ANY(%s::uuid[])"
-            values = [groups]
-            app.db.execute(query, values)
-
-        if permissions:
-            actors = content.get("actors")
-            query = (
-                "INSERT INTO actor SELECT * FROM jsonb_populate_recordset(null::actor, jsonb %s) ON "
-                "CONFLICT(uuid) DO UPDATE SET secondary_keys = EXCLUDED.secondary_keys, "
-                "uinfo= EXCLUDED.uinfo"
-            )
-            values = [json_dumps(actors)]
-            app.db.execute(query, values)
-
-            query = """SELECT * FROM insert_or_update_perms(%s::jsonb)"""
-            values = [json_dumps(permissions)]
-            app.db.execute(query, values)
+        # Old perms are removed and new ones inserted at once, readers never see the table half updated
+        with app.db.transaction():
+            if not self.data and permissions:
+                # Need to remove old perms, cause they may be deleted on auth
+                groups = [value.get("actor_id") for value in permissions]
+                query = "DELETE FROM permissions WHERE actor_id = ANY(%s::uuid[])"
+                values = [groups]
+                app.db.execute(query, values)
+
+            if permissions:
+                actors = content.get("actors")
+                query = (
+                    "INSERT INTO actor SELECT * FROM jsonb_populate_recordset(null::actor, jsonb %s) ON "
+                    "CONFLICT(uuid) DO UPDATE SET secondary_keys = EXCLUDED.secondary_keys, "
+                    "uinfo= EXCLUDED.uinfo"
+                )
+                values = [json_dumps(actors)]
+                app.db.execute(query, values)
+
+                query = """SELECT * FROM insert_or_update_perms(%s::jsonb)"""
+                values = [json_dumps(permissions)]
+                app.db.execute(query, values)
 
         return permissions
 
@@ -182,12 +182,13 @@ class ProcessForcedSynchroniationDataView(MethodView):
                 apa_data = self.get_data_from_zip(
                     request.files.get("actor_permactions")
                 )
-                perms_sync("actor", apa_data)
-
                 gpa_data = self.get_data_from_zip(
                     request.files.get("group_permactions")
                 )
-                perms_sync("group", gpa_data)
+                # Both tables are replaced in one commit, checks never see emptied permactions
+                with app.db.transaction():
+                    perms_sync("actor", apa_data)
+                    perms_sync("group", gpa_data)
 
                 response = dict(message="Success.")
                 status_code = 200
@@ -1,3 +1,4 @@
+import base64
 import hashlib
 import json
 import random
@@ -101,6 +102,48 @@ def json_dumps(data, **kwargs):
     return json.dumps(data, cls=APIJSONEncoder, **kwargs)
 
 
+def encode_page_cursor(*values) -> str:
+    """
+    Opaque cursor of keyset pagination, made of the sort key of the last row on the page.
+    Datetimes keep microseconds, unlike json_dumps, so no row is skipped or repeated.
+    """
+    data = json.dumps(
+        [
+            value.isoformat() if isinstance(value, datetime) else str(value)
+            for value in values
+        ]
+    )
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip("=")
+
+
+def decode_page_cursor(cursor: str, size: int) -> List[str]:
+    """
+    Sort key values of the cursor made by encode_page_cursor
+    :param size: number of values in the sort key
+    :raise ValueError: if cursor is malformed
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        raise ValueError("Invalid page cursor")
+
+    if (
+        not isinstance(values, list)
+        or len(values) != size
+        or not all(isinstance(value, str) for value in values)
+    ):
+        raise ValueError("Invalid page cursor")
+
+    return values
+
+
+def escape_like(value: str) -> str:
+    """
+    Escape LIKE wildcards, so value is matched literally
+    """
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
 def json_encoder(obj):
     """
     Simple json encoder to prevent errors for the datetime objects passed to
@@ -173,12 +216,16 @@ def get_user_salt(user_info: dict, salt_for: str = None):
             """SELECT salt FROM salt_temp WHERE qr_token = %s AND uuid = %s AND salt_for=%s AND 
         created > timezone('utc', now()) ORDER BY created DESC LIMIT 1""",
             [user_info.get("qr_token"), user_info.get("uuid"), salt_for],
+            prepared="auth_salt_by_qr_token_and_uuid",
+            primary_on_miss=True,
         )
         if not salt:
             salt = app.db.fetchone(
                 """SELECT salt FROM salt_temp WHERE qr_token = %s AND uuid IS NULL AND salt_for=%s 
             AND created > timezone('utc', now()) ORDER BY created DESC LIMIT 1""",
                 [user_info.get("qr_token"), salt_for],
+                prepared="auth_salt_by_qr_token",
+                primary_on_miss=True,
             )
 
             if not salt:
@@ -193,6 +240,7 @@ def get_user_salt(user_info: dict, salt_for: str = None):
         query = """SELECT salt FROM salt_temp WHERE pub_key=%s AND salt_for=%s 
         AND created > timezone('utc', now()) ORDER BY created DESC LIMIT 1"""
         values = [user_info.get("pub_key"), salt_for]
+        prepared = "auth_salt_by_pub_key"
     elif user_info.get("uuid", None):
         if not is_valid_uuid(user_info.get("uuid", None)):
             return None
@@ -200,10 +248,11 @@ def get_user_salt(user_info: dict, salt_for: str = None):
         query = """SELECT salt FROM salt_temp WHERE uuid=%s::uuid AND salt_for=%s 
         AND created > timezone('utc', now()) ORDER BY created DESC LIMIT 1"""
         values = [user_info.get("uuid"), salt_for]
+        prepared = "auth_salt_by_uuid"
     else:
         return None
 
-    salt = app.db.fetchone(query, values)
+    salt = app.db.fetchone(query, values, prepared=prepared, primary_on_miss=True)
     if not salt:
         return None
 
@@ -429,27 +478,28 @@ def create_session(
     uuid = (
         apt54["user_data"].get("uuid") if apt54.get("user_data") else apt54.get("uuid")
     )
-    actor = Actor.objects.get(uuid=uuid)
-    # Return error response message if user is banned.
-    if actor.is_banned:
-        response = create_response_message(
-            message=_(
-                "You are in ban group. "
-                "Please contact the administrator to set you role."
-            ),
-            error=True,
-        )
-        return response
+    with app.db.transaction():
+        actor = Actor.objects.get(uuid=uuid)
+        # Return error response message if user is banned.
+        if actor.is_banned:
+            response = create_response_message(
+                message=_(
+                    "You are in ban group. "
+                    "Please contact the administrator to set you role."
+                ),
+                error=True,
+            )
+            return response
 
-    # Session creating
-    while True:
-        session_token = dict(session_token=generate_random_string(KEY_CHARS))
+        # Session creating
+        while True:
+            session_token = dict(session_token=generate_random_string(KEY_CHARS))
 
-        if app.db.fetchone(
-            """SELECT EXISTS(SELECT 1 FROM service_session_token WHERE session_token=%s)""",
-            [session_token.get("dession_token")],
-        ).get("exists"):
-            continue
+            if not app.db.fetchone(
+                """SELECT EXISTS(SELECT 1 FROM service_session_token WHERE session_token=%s)""",
+                [session_token.get("session_token")],
+            ).get("exists"):
+                break
 
         app.db.execute(
             """INSERT INTO service_session_token(session_token, uuid, apt54, auxiliary_token, service_uuid) 
@@ -463,10 +513,11 @@ def create_session(
             ],
         )
 
-        if depended_info:
-            make_session_in_depended_services(depended_info, session_token)
+    # Requests to other services are sent after commit, without holding the connection
+    if depended_info:
+        make_session_in_depended_services(depended_info, session_token)
 
-        return session_token.get("session_token")
+    return session_token.get("session_token")
 
 
 def make_session_in_depended_services(depended_info, session_token):
@@ -513,6 +564,8 @@ def get_session(session_token: str):
     service_session_token = app.db.fetchone(
         """SELECT * FROM service_session_token WHERE session_token=%s""",
         [session_token],
+        prepared="auth_session_by_token",
+        primary_on_miss=True,
     )
 
     return service_session_token
@@ -528,6 +581,7 @@ def get_session_token_by_auxiliary(auxiliary_token: str = None):
         """SELECT session_token FROM service_session_token 
     WHERE auxiliary_token=%s""",
         [auxiliary_token],
+        primary_on_miss=True,
     )
 
     return service_session_token
@@ -608,10 +662,11 @@ def create_actor(apt54: dict):
     query = """INSERT INTO actor SELECT * FROM jsonb_populate_record(null::actor, jsonb %s::jsonb) RETURNING uuid"""
     values = [json_dumps(data)]
     try:
-        actor_uuid = app.db.fetchone(query, values)
-        query = """SELECT * FROM actor WHERE uuid = %s"""
-        values = [actor_uuid.get("uuid")]
-        actor = app.db.fetchone(query, values)
+        with app.db.transaction():
+            actor_uuid = app.db.fetchone(query, values)
+            query = """SELECT * FROM actor WHERE uuid = %s"""
+            values = [actor_uuid.get("uuid")]
+            actor = app.db.fetchone(query, values)
     except Exception as e:
         print("Exception on creating actor! %s" % e)
         actor = None
@@ -711,6 +766,7 @@ def get_static_group(group_name: str):
     group = app.db.fetchone(
         """SELECT uuid FROM actor WHERE actor_type='group' AND uinfo->>'group_name'=%s""",
         [group_name],
+        prepared="auth_static_group",
     )
     return group
 
@@ -752,7 +808,9 @@ def get_user_sid(qr_token: str):
     @subm_flow
     """
     sid = app.db.fetchone(
-        """SELECT actor_sid FROM salt_temp WHERE qr_token = %s""", [qr_token]
+        """SELECT actor_sid FROM salt_temp WHERE qr_token = %s""",
+        [qr_token],
+        primary_on_miss=True,
     )
 
     if not sid:
@@ -818,6 +876,7 @@ def get_temporary_session(temporary_session_token=None):
         """SELECT * FROM temporary_session WHERE temporary_session = %s 
     ORDER BY created DESC LIMIT 1 """,
         [temporary_session_token],
+        primary_on_miss=True,
     )
 
     return temporary_session
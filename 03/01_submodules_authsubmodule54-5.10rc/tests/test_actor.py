@@ -0,0 +1,93 @@
+from unittest import mock
+from uuid import uuid4
+
+from auth_perms.core import actor as actor_module
+from auth_perms.core.actor import Actor, BaseManager, QueryCache, query_cache
+from auth_perms.core.base_test import BaseTest
+
+
+class QueryCacheTest(BaseTest):
+    def test_compile_query_is_cached_by_lookup_shape(self):
+        """the same lookups reuse the composed query with new values"""
+        query_cache.clear()
+        manager = BaseManager(table_name="actor")
+        try:
+            query, values = manager.compile_query(uuid="first")
+            assert values == {"uuid": "first"}
+            assert query_cache.stats()["misses"] == 1
+
+            cached_query, values = manager.compile_query(uuid="second")
+            assert cached_query is query
+            assert values == {"uuid": "second"}
+            assert query_cache.stats()["hits"] == 1
+
+            # other lookups, operators, tables and query kinds are separate entries
+            in_query, values = manager.compile_query(uuid__in=["first", "second"])
+            assert in_query is not query
+            assert values == {"uuid": ("first", "second")}
+            service_manager = BaseManager(table_name="service")
+            assert service_manager.compile_query(uuid="first")[0] is not query
+            assert manager.exists_query(uuid="first")[0] is not query
+            assert (
+                manager.compile_query(uuid="first", actor_type="group")[0] is not query
+            )
+            assert query_cache.stats()["size"] == 5
+        finally:
+            query_cache.clear()
+
+    def test_query_cache_maxsize(self):
+        """a full cache keeps its entries and still counts lookups"""
+        cache = QueryCache(maxsize=1)
+        cache.put(("select", "actor"), "first")
+        cache.put(("select", "service"), "second")
+
+        assert cache.get(("select", "actor")) == "first"
+        assert cache.get(("select", "service")) is None
+        assert cache.stats() == dict(size=1, hits=1, misses=1, hit_rate=0.5)
+
+
+class GetManyTest(BaseTest):
+    def test_get_many(self):
+        """one query for all valid uuids, actors in requested order"""
+        first, second, unknown = (str(uuid4()) for _ in range(3))
+        app = mock.MagicMock()
+        app.db.fetchall.return_value = [
+            dict(uuid=second, actor_type="group"),
+            dict(uuid=first, actor_type="user"),
+        ]
+        with mock.patch.object(actor_module, "app", app):
+            actors, missing = Actor.objects.get_many(
+                [first, unknown, "not a uuid", second.upper(), first]
+            )
+
+        app.db.fetchall.assert_called_once()
+        query, (uuids,) = app.db.fetchall.call_args[0]
+        assert "ANY(%s::uuid[])" in query
+        # every valid uuid once
+        assert sorted(uuids) == sorted([first, second, unknown])
+        assert [actor.uuid for actor in actors] == [first, second, first]
+        assert missing == [unknown, "not a uuid"]
+
+    def test_get_many_without_valid_uuids(self):
+        """no query when no uuid is valid"""
+        app = mock.MagicMock()
+        with mock.patch.object(actor_module, "app", app):
+            assert Actor.objects.get_many(["not a uuid"]) == ([], ["not a uuid"])
+        app.db.fetchall.assert_not_called()
+
+
+class PageTest(BaseTest):
+    def test_page_of_several_actor_types(self):
+        """comma separated actor types are one condition, e.g. users for the group form"""
+        app = mock.MagicMock()
+        app.db.fetchall.return_value = [dict(uuid=str(uuid4()), actor_type="user")]
+        with mock.patch.object(actor_module, "app", app):
+            actors, next_cursor = Actor.objects.page(
+                limit=20, actor_type="classic_user,user", email="Ann"
+            )
+
+        query, values = app.db.fetchall.call_args[0]
+        assert "actor_type = ANY(%s)" in query
+        assert values == [["classic_user", "user"], "ann%", 21]
+        assert len(actors) == 1
+        assert next_cursor is None
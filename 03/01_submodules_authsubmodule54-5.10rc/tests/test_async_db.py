@@ -0,0 +1,63 @@
+import asyncio
+from unittest import mock
+
+from psycopg2 import errors
+
+from auth_perms.core import managers
+from auth_perms.core.base_test import BaseTest
+
+QUERY = "SELECT * FROM actor WHERE uuid=%s::uuid"
+PREPARE = ("PREPARE auth_actor AS SELECT * FROM actor WHERE uuid=$1::uuid", None)
+EXECUTE = ("EXECUTE auth_actor (%s::uuid)", ["uuid"])
+
+
+class Connection:
+    pass
+
+
+class Cursor:
+    """aiopg cursor recording executed statements, lost_statement drops the next EXECUTE once"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.executed = []
+        self.lost_statement = False
+
+    async def execute(self, query, values=None):
+        self.executed.append((query, values))
+        if query.startswith("EXECUTE") and self.lost_statement:
+            self.lost_statement = False
+            raise errors.InvalidSqlStatementName()
+
+
+def create_manager(**kwargs):
+    # the pool is created on the first query only, cursors here are not from it
+    with mock.patch.object(managers, "aiopg", mock.MagicMock()):
+        return managers.AsyncDatabaseManager(dsn="dbname=auth user=auth", **kwargs)
+
+
+class AsyncPreparedStatementTest(BaseTest):
+    def test_execute_prepared(self):
+        """statement is prepared once per connection and again when lost"""
+        manager = create_manager()
+        cur = Cursor(Connection())
+
+        async def run():
+            await manager.execute_prepared(cur, "auth_actor", QUERY, ["uuid"])
+            await manager.execute_prepared(cur, "auth_actor", QUERY, ["uuid"])
+            cur.lost_statement = True
+            await manager.execute_prepared(cur, "auth_actor", QUERY, ["uuid"])
+
+        asyncio.run(run())
+        assert cur.executed == [PREPARE, EXECUTE, EXECUTE, EXECUTE, PREPARE, EXECUTE]
+
+        other = Cursor(Connection())
+        asyncio.run(manager.execute_prepared(other, "auth_actor", QUERY, ["uuid"]))
+        assert other.executed == [PREPARE, EXECUTE]
+
+    def test_execute_prepared_disabled(self):
+        """DB_PREPARED_STATEMENTS off runs the plain query"""
+        manager = create_manager(prepared_statements=False)
+        cur = Cursor(Connection())
+        asyncio.run(manager.execute_prepared(cur, "auth_actor", QUERY, ["uuid"]))
+        assert cur.executed == [(QUERY, ["uuid"])]
@@ -0,0 +1,40 @@
+import base64
+import json
+from datetime import datetime
+from uuid import uuid4
+
+from auth_perms.core.base_test import BaseTest
+from auth_perms.core.utils import decode_page_cursor, encode_page_cursor
+
+
+def encode(data) -> str:
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).decode()
+
+
+class PageCursorTest(BaseTest):
+    def test_page_cursor(self):
+        """cursor round trip keeps microseconds"""
+        created = datetime(2021, 3, 4, 5, 6, 7, 891011)
+        uuid = uuid4()
+        cursor = encode_page_cursor(created, uuid)
+
+        # urlsafe without padding, so it can go to a query string as is
+        assert "=" not in cursor
+        values = decode_page_cursor(cursor, 2)
+        assert values == [created.isoformat(), str(uuid)]
+        assert datetime.fromisoformat(values[0]) == created
+
+    def test_invalid_page_cursor(self):
+        """malformed, wrong sized and non string cursors are rejected"""
+        for cursor in [
+            "not a cursor",
+            "",
+            encode_page_cursor("2021-03-04"),
+            encode({"created": "2021-03-04"}),
+            encode(["2021-03-04", 1]),
+        ]:
+            try:
+                decode_page_cursor(cursor, 2)
+            except ValueError:
+                continue
+            raise AssertionError("Cursor %r is accepted" % cursor)